@@ -0,0 +1,104 @@
+"""Throughput and latency of small messages with and without batching.
+
+The publisher runs in another process and sends 100-byte messages, as
+fast as possible for the throughput and at 1 kHz for the latency. The
+latency is measured with the monotonic clock shared by the processes.
+
+Usage: python benchmarks/batching_benchmark.py [--messages 20000]
+"""
+
+import argparse
+import multiprocessing as mp
+import statistics
+import struct
+import threading
+import time
+from typing import List
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.log import set_log_level
+from pylancom.utils.serialization import BytesDecoder
+
+BATCH_SIZES = [0, 1024, 4096, 16384]
+MESSAGE_SIZE = 100
+TIMESTAMP = struct.Struct("!d")
+
+
+def publish(
+    batch_size: int, num_messages: int, rate: float, topic: str
+) -> None:
+    set_log_level("WARNING")
+    node = LanComNode("BatchPublisher", "127.0.0.1")
+    publisher = Publisher(topic, batch_size=batch_size, node=node)
+    while not node.has_subscriber(publisher.topic_bytes):
+        time.sleep(0.01)
+    time.sleep(0.2)
+    padding = bytes(MESSAGE_SIZE - TIMESTAMP.size)
+    start = time.monotonic()
+    for i in range(num_messages):
+        if rate > 0:
+            delay = start + i / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        publisher.publish_bytes(TIMESTAMP.pack(time.monotonic()) + padding)
+    time.sleep(1.0)
+    node.close()
+
+
+def run(
+    node: LanComNode, batch_size: int, num_messages: int, rate: float
+) -> None:
+    topic = f"batch/{batch_size}/{rate}"
+    latencies: List[float] = []
+    done = threading.Event()
+
+    def receive(msg: bytes) -> None:
+        (sent,) = TIMESTAMP.unpack_from(msg)
+        latencies.append(time.monotonic() - sent)
+        if len(latencies) == num_messages:
+            done.set()
+
+    subscriber = Subscriber(topic, BytesDecoder, receive, node=node)
+    ctx = mp.get_context("spawn")
+    process = ctx.Process(
+        target=publish, args=(batch_size, num_messages, rate, topic)
+    )
+    process.start()
+    while not latencies:
+        time.sleep(0.001)
+    start = time.monotonic()
+    done.wait(num_messages / (rate or 1000) + 10.0)
+    duration = time.monotonic() - start
+    process.join()
+    subscriber.shutdown()
+    samples = sorted(latency * 1000 for latency in latencies)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    mode = "max rate" if rate == 0 else f"{rate:.0f} Hz"
+    print(
+        f"{batch_size:>8}{mode:>10}{len(samples):>10}"
+        f"{len(samples) / duration:>12.0f}"
+        f"{statistics.median(samples):>10.2f}{p99:>10.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=1000.0)
+    args = parser.parse_args()
+    set_log_level("WARNING")
+    node = LanComNode("BatchSubscriber", "127.0.0.1")
+    print(
+        f"{'batch':>8}{'mode':>10}{'received':>10}{'msg/s':>12}"
+        f"{'p50 ms':>10}{'p99 ms':>10}"
+    )
+    for batch_size in BATCH_SIZES:
+        run(node, batch_size, args.messages, 0)
+    for batch_size in BATCH_SIZES:
+        run(node, batch_size, int(args.rate * 2), args.rate)
+    node.close()
+
+
+if __name__ == "__main__":
+    main()
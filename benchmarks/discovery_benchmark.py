@@ -0,0 +1,86 @@
+"""Time until many nodes on localhost have discovered each other.
+
+Every node gets its own discovery port, and therefore its own map of the
+nodes as if it ran in its own process. The unicast mode gives every node
+the full peer list, the registry mode one registry for all of them.
+
+Usage: python benchmarks/discovery_benchmark.py [--nodes 50]
+"""
+
+import argparse
+import time
+from typing import List
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.registry import Registry
+from pylancom.utils.log import set_log_level
+
+BASE_PORT = 7900
+
+
+def converge(nodes: List[LanComNode], timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if all(len(node.nodes_map.nodes_info) == len(nodes) for node in nodes):
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    return float("nan")
+
+
+def unicast(num_nodes: int, timeout: float) -> None:
+    ports = [BASE_PORT + i for i in range(num_nodes)]
+    peers = [f"127.0.0.1:{port}" for port in ports]
+    start = time.perf_counter()
+    nodes = [
+        LanComNode(
+            f"Node{i}",
+            "127.0.0.1",
+            multicast=False,
+            peers=peers,
+            multicast_port=port,
+        )
+        for i, port in enumerate(ports)
+    ]
+    started = time.perf_counter() - start
+    print(f"{'unicast':<10}{started:>10.3f}{converge(nodes, timeout):>12.3f}")
+    for node in reversed(nodes):
+        node.close()
+
+
+def registry(num_nodes: int, timeout: float) -> None:
+    registry_node = LanComNode(
+        "Registry", "127.0.0.1", multicast_port=BASE_PORT - 1
+    )
+    server = Registry(registry_node, port=BASE_PORT - 2)
+    start = time.perf_counter()
+    nodes = [
+        LanComNode(
+            f"Node{i}",
+            "127.0.0.1",
+            multicast=False,
+            registry=f"127.0.0.1:{BASE_PORT - 2}",
+            multicast_port=BASE_PORT + i,
+        )
+        for i in range(num_nodes)
+    ]
+    started = time.perf_counter() - start
+    print(f"{'registry':<10}{started:>10.3f}{converge(nodes, timeout):>12.3f}")
+    for node in reversed(nodes):
+        node.close()
+    server.close()
+    registry_node.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    set_log_level("WARNING")
+    print(f"{'s':<10}{'start':>10}{'converge':>12}")
+    unicast(args.nodes, args.timeout)
+    registry(args.nodes, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Import time of the package and its light modules.
+
+Runs `python -X importtime` in fresh interpreters. Point `--root` at
+another checkout (e.g. a `git worktree` of an older commit) to compare
+before and after a change.
+
+Usage: python benchmarks/import_benchmark.py [--root .] [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+MODULES = [
+    "pylancom",
+    "pylancom.lancom_type",
+    "pylancom.utils.serialization",
+    "pylancom.nodes.lancom_node",
+]
+HEAVY_MODULES = ["asyncio", "zmq", "msgpack", "colorama"]
+
+
+def import_time(root: str, module: str) -> int:
+    """Returns the cumulative import time of `module` in microseconds."""
+    env = dict(os.environ, PYTHONPATH=root)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise RuntimeError(f"{module} is missing from the import times")
+
+
+def loaded_modules(root: str, module: str) -> Tuple[int, List[str]]:
+    env = dict(os.environ, PYTHONPATH=root)
+    code = (
+        f"import sys, {module}; print(len(sys.modules)); "
+        f"print(' '.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    count, heavy = result.stdout.splitlines()
+    return int(count), heavy.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default=".")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    print(f"{'module':<32}{'ms':>8}{'modules':>9}  heavy dependencies")
+    for module in MODULES:
+        times = [import_time(root, module) for _ in range(args.runs)]
+        count, heavy = loaded_modules(root, module)
+        print(
+            f"{module:<32}{statistics.median(times) / 1000:>8.1f}"
+            f"{count:>9}  {' '.join(heavy) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
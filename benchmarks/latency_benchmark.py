@@ -0,0 +1,145 @@
+"""Round-trip latency of services and topics across the event loop modes.
+
+The services run in another process on the asyncio loop, on uvloop when
+it is installed and on the busy poll thread, and are called with a plain
+blocking REQ socket. The topic latency is the one of messages published
+at 1 kHz by another process to a subscriber on the loop or busy polled,
+measured with the monotonic clock shared by the processes.
+
+Usage: python benchmarks/latency_benchmark.py [--requests 5000]
+"""
+
+import argparse
+import importlib.util
+import multiprocessing as mp
+import statistics
+import struct
+import threading
+import time
+from typing import List
+
+import zmq
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Service, Subscriber
+from pylancom.utils.log import set_log_level
+from pylancom.utils.serialization import BytesDecoder, BytesEncoder
+
+TIMESTAMP = struct.Struct("!d")
+
+
+def echo(msg: bytes) -> bytes:
+    return msg
+
+
+def serve(mode: str, ports: mp.Queue, stop: mp.Event) -> None:
+    set_log_level("WARNING")
+    node = LanComNode(
+        "EchoServer",
+        "127.0.0.1",
+        multicast_port=7910,
+        event_loop="uvloop" if mode == "uvloop" else "asyncio",
+    )
+    service = Service(
+        "echo",
+        BytesDecoder,
+        BytesEncoder,
+        echo,
+        busy_poll=mode == "busy poll",
+        node=node,
+    )
+    ports.put(service.info["port"])
+    stop.wait()
+    node.close()
+
+
+def report(name: str, latencies: List[float]) -> None:
+    samples = sorted(latency * 1e6 for latency in latencies)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{name:>24}{len(samples):>10}"
+        f"{statistics.median(samples):>10.0f}{p99:>10.0f}"
+    )
+
+
+def run_service(mode: str, num_requests: int) -> None:
+    ctx = mp.get_context("spawn")
+    ports, stop = ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=serve, args=(mode, ports, stop))
+    process.start()
+    port = ports.get(timeout=10.0)
+    sock = zmq.Context.instance().socket(zmq.REQ)
+    sock.connect(f"tcp://127.0.0.1:{port}")
+    latencies = []
+    for i in range(num_requests + 100):
+        start = time.perf_counter()
+        sock.send_multipart([b"echo", bytes(100)])
+        sock.recv_multipart()
+        # the first requests warm up the connection
+        if i >= 100:
+            latencies.append(time.perf_counter() - start)
+    sock.close()
+    stop.set()
+    process.join()
+    report(f"service, {mode}", latencies)
+
+
+def publish(num_messages: int, rate: float) -> None:
+    set_log_level("WARNING")
+    node = LanComNode("TimestampPublisher", "127.0.0.1", multicast_port=7911)
+    publisher = Publisher("timestamps", node=node)
+    while not node.has_subscriber(publisher.topic_bytes):
+        time.sleep(0.01)
+    time.sleep(0.2)
+    start = time.monotonic()
+    for i in range(num_messages):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        publisher.publish_bytes(TIMESTAMP.pack(time.monotonic()))
+    time.sleep(0.5)
+    node.close()
+
+
+def run_topic(busy_poll: bool, num_messages: int, rate: float) -> None:
+    node = LanComNode("TimestampSubscriber", "127.0.0.1", multicast_port=7911)
+    latencies: List[float] = []
+    done = threading.Event()
+
+    def receive(msg: bytes) -> None:
+        (sent,) = TIMESTAMP.unpack(msg)
+        latencies.append(time.monotonic() - sent)
+        if len(latencies) == num_messages:
+            done.set()
+
+    Subscriber(
+        "timestamps", BytesDecoder, receive, busy_poll=busy_poll, node=node
+    )
+    ctx = mp.get_context("spawn")
+    process = ctx.Process(target=publish, args=(num_messages, rate))
+    process.start()
+    done.wait(num_messages / rate + 10.0)
+    process.join()
+    node.close()
+    report(f"topic, {'busy poll' if busy_poll else 'asyncio'}", latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000.0)
+    args = parser.parse_args()
+    set_log_level("WARNING")
+    modes = ["asyncio", "busy poll"]
+    if importlib.util.find_spec("uvloop") is not None:
+        modes.insert(1, "uvloop")
+    print(f"{'mode':>24}{'samples':>10}{'p50 us':>10}{'p99 us':>10}")
+    for mode in modes:
+        run_service(mode, args.requests)
+    # one process per runtime, the subscribers share this one
+    run_topic(False, int(args.rate * 2), args.rate)
+    run_topic(True, int(args.rate * 2), args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Throughput of a CPU-bound service with thread vs process workers.
+
+Usage: python benchmarks/process_service_benchmark.py [--requests 64]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pylancom
+from pylancom.nodes.lancom_socket import Service, ServiceProxy
+from pylancom.nodes.process_service import ProcessService
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+
+def burn(msg: str) -> str:
+    total = 0
+    for i in range(int(msg)):
+        total += i * i
+    return str(total)
+
+
+def wait_for_service(node: pylancom.LanComNode, name: str) -> None:
+    while node.nodes_map.get_service_info(name) is None:
+        time.sleep(0.05)
+
+
+def run(name: str, num_requests: int, concurrency: int, work: int) -> float:
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        start = time.perf_counter()
+        results = list(
+            clients.map(
+                lambda _: ServiceProxy.request(
+                    name, StrEncoder, StrDecoder, str(work)
+                ),
+                range(num_requests),
+            )
+        )
+        elapsed = time.perf_counter() - start
+    assert all(r == burn(str(work)) for r in results), "bad response"
+    return num_requests / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--work", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    node = pylancom.init_node("ProcessServiceBenchmark", "127.0.0.1")
+    services = [Service("burn_threads", StrDecoder, StrEncoder, burn)]
+    wait_for_service(node, "burn_threads")
+    baseline = run("burn_threads", args.requests, args.concurrency, args.work)
+    print(f"{'mode':<12}{'req/s':>10}{'speedup':>10}")
+    print(f"{'threads':<12}{baseline:>10.1f}{1.0:>10.2f}")
+    for num_workers in args.workers:
+        name = f"burn_{num_workers}_processes"
+        service = ProcessService(
+            name, StrDecoder, StrEncoder, burn, num_workers=num_workers
+        )
+        services.append(service)
+        wait_for_service(node, name)
+        # warm up the workers before measuring
+        run(name, num_workers, num_workers, 1)
+        throughput = run(name, args.requests, args.concurrency, args.work)
+        print(
+            f"{f'{num_workers} procs':<12}{throughput:>10.1f}"
+            f"{throughput / baseline:>10.2f}"
+        )
+    for service in services:
+        service.shutdown()
+    node.stop_node()
+
+
+if __name__ == "__main__":
+    main()
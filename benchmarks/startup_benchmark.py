@@ -0,0 +1,129 @@
+"""Node startup, shutdown and startup-to-first-message times.
+
+Usage: python benchmarks/startup_benchmark.py [--nodes 100]
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import statistics
+import threading
+import time
+from typing import List
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import BytesDecoder
+
+
+def summary(name: str, samples: List[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(
+        f"{name:<28}{statistics.median(samples_ms):>10.2f}"
+        f"{p95:>10.2f}{samples_ms[-1]:>10.2f}"
+    )
+
+
+def start_and_close(num_nodes: int) -> None:
+    starts, closes = [], []
+    for i in range(num_nodes):
+        start = time.perf_counter()
+        node = LanComNode(f"StartupNode{i}", "127.0.0.1")
+        starts.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        node.close()
+        closes.append(time.perf_counter() - start)
+    summary("start", starts)
+    summary("close", closes)
+
+
+def first_local_message(num_runs: int) -> None:
+    samples = []
+    for _ in range(num_runs):
+        received = threading.Event()
+        start = time.perf_counter()
+        with LanComNode("Publisher", "127.0.0.1") as pub_node:
+            with LanComNode("Subscriber", "127.0.0.1") as sub_node:
+                publisher = Publisher("startup", node=pub_node)
+                Subscriber(
+                    "startup",
+                    BytesDecoder,
+                    lambda _: received.set(),
+                    node=sub_node,
+                )
+                while not received.is_set():
+                    publisher.publish_bytes(b"ping")
+                    received.wait(0.001)
+                samples.append(time.perf_counter() - start)
+    summary("first message, same process", samples)
+
+
+async def first_message_async(num_runs: int) -> None:
+    samples = []
+    for _ in range(num_runs):
+        received = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        async with LanComNode("Node", "127.0.0.1", autostart=False) as node:
+            publisher = Publisher("startup", node=node)
+            Subscriber(
+                "startup",
+                BytesDecoder,
+                lambda _: loop.call_soon_threadsafe(received.set),
+                node=node,
+            )
+            while not received.is_set():
+                await node.run_on_loop(publisher.send_bytes_async(b"ping"))
+                await asyncio.sleep(0.001)
+            samples.append(time.perf_counter() - start)
+    summary("first message, async with", samples)
+
+
+def publish_forever(ready: mp.Event) -> None:
+    node = LanComNode("RemotePublisher", "127.0.0.1")
+    publisher = Publisher("startup_remote", node=node)
+    ready.set()
+    while True:
+        publisher.publish_bytes(b"ping")
+        time.sleep(0.001)
+
+
+def first_remote_message(num_runs: int) -> None:
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    process = ctx.Process(target=publish_forever, args=(ready,), daemon=True)
+    process.start()
+    ready.wait()
+    samples = []
+    for _ in range(num_runs):
+        received = threading.Event()
+        start = time.perf_counter()
+        with LanComNode("Subscriber", "127.0.0.1") as node:
+            Subscriber(
+                "startup_remote",
+                BytesDecoder,
+                lambda _: received.set(),
+                node=node,
+            )
+            received.wait()
+            samples.append(time.perf_counter() - start)
+    process.terminate()
+    summary("first message, other process", samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--remote-runs", type=int, default=5)
+    args = parser.parse_args()
+    print(f"{'ms':<28}{'median':>10}{'p95':>10}{'max':>10}")
+    start_and_close(args.nodes)
+    first_local_message(args.runs)
+    asyncio.run(first_message_async(args.runs))
+    first_remote_message(args.remote_runs)
+
+
+if __name__ == "__main__":
+    main()
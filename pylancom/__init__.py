@@ -1,18 +1,50 @@
-# Add these lines at the top of your pylancom/__init__.py
-import asyncio
-import platform
+"""PyLanCom, communication between the nodes of a local network.
+
+The submodules are imported on first use (PEP 562), so that light pieces
+like `pylancom.utils.serialization` or `pylancom.lancom_type` do not
+pull in zmq, asyncio and the node runtime.
+"""
+
+import importlib
+import sys
+from typing import TYPE_CHECKING, Any, List
+
+from .config import __VERSION__ as __version__
 
 # Fix for Windows event loop to avoid ZMQ warnings
-if platform.system() == "Windows":
+if sys.platform == "win32":
+    import asyncio
+
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())  # type: ignore
 
-# from pylancom.abstract_node import AbstractNode
-from .config import __VERSION__ as __version__
-from .nodes.lancom_node import LanComNode
-from .utils.log import logger
+if TYPE_CHECKING:
+    from .nodes.lancom_node import LanComNode
+    from .utils.log import logger
+
+# attribute name -> module providing it
+LAZY_ATTRIBUTES = {
+    "LanComNode": ".nodes.lancom_node",
+    "logger": ".utils.log",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(LAZY_ATTRIBUTES[name], __name__)
+    value = getattr(module, name)
+    # cache it, the next lookups do not go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + list(LAZY_ATTRIBUTES))
+
 
+def init_node(node_name: str, node_ip: str) -> "LanComNode":
+    from .nodes.lancom_node import LanComNode
 
-def init_node(node_name: str, node_ip: str) -> LanComNode:
     if LanComNode.instance is not None:
         return LanComNode.instance
     return LanComNode(node_name, node_ip)
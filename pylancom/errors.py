@@ -0,0 +1,22 @@
+class LanComError(Exception):
+    """Base class of the errors raised by PyLanCom."""
+
+
+class RequestTimeoutError(LanComError):
+    """The request got no response in time."""
+
+
+class DeadlineExceededError(RequestTimeoutError):
+    """The overall deadline of the request has passed."""
+
+
+class ServiceError(LanComError):
+    """The service failed while handling the request."""
+
+
+class ServiceNotFoundError(LanComError):
+    """No node provides the requested service."""
+
+
+class ReceiveTimeoutError(LanComError):
+    """No message was received in time."""
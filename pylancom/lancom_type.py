@@ -1,27 +1,46 @@
 from enum import Enum
-from typing import List, TypedDict
+from typing import TYPE_CHECKING, Any, List, TypedDict
 
-import zmq
-import zmq.asyncio
+if TYPE_CHECKING:
+    from zmq.asyncio import Socket as AsyncSocket
 
 IPAddress = str
 Port = int
 TopicName = str
 ServiceName = str
-AsyncSocket = zmq.asyncio.Socket
 HashIdentifier = str
 ComponentType = str
 
 
+def __getattr__(name: str) -> Any:
+    # zmq is only imported by the code using sockets
+    if name == "AsyncSocket":
+        import zmq.asyncio
+
+        return zmq.asyncio.Socket
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class NodeReqType(Enum):
     PING = "PING"
     NODE_INFO = "NODE_INFO"
+    SNAPSHOT = "SNAPSHOT"
+    RETRANSMIT = "RETRANSMIT"
+    THROTTLE = "THROTTLE"
+    PROFILE = "PROFILE"
+
+
+class RegistryReqType(Enum):
+    REGISTER = "REGISTER"
+    UNREGISTER = "UNREGISTER"
+    QUERY = "QUERY"
 
 
 class LanComMsg(Enum):
     SUCCESS = "SUCCESS"
     ERROR = "ERROR"
     TIMEOUT = "TIMEOUT"
+    EXPIRED = "EXPIRED"
     EMPTY = "EMPTY"
 
 
@@ -40,6 +59,29 @@ class SocketInfo(TypedDict):
     port: Port
 
 
+class PublisherInfo(SocketInfo, total=False):
+    # number of latched messages a late subscriber receives
+    latch: int
+    # size of the retransmit ring of a reliable publisher
+    reliable: int
+    # the QoS class when it is not "normal"
+    qos: str
+    # set by a relay forwarding the publisher with the socketID relayOf
+    # from the ip relayFrom into relayNetwork, through the nodes relayPath
+    relayOf: HashIdentifier
+    relayFrom: IPAddress
+    relayNetwork: str
+    relayPath: List[HashIdentifier]
+
+
+class ServiceInfo(SocketInfo, total=False):
+    # clients may cache the responses for cacheTTL seconds
+    cacheTTL: float
+    cacheVersion: str
+    # the QoS class when it is not "normal"
+    qos: str
+
+
 class NodeInfo(TypedDict):
     name: str
     nodeID: HashIdentifier
@@ -47,5 +89,5 @@ class NodeInfo(TypedDict):
     ip: IPAddress
     type: str
     port: int
-    publishers: List[SocketInfo]
-    services: List[SocketInfo]
+    publishers: List[PublisherInfo]
+    services: List[ServiceInfo]
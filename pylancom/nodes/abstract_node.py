@@ -4,13 +4,10 @@ import abc
 import asyncio
 import concurrent.futures
 import platform
-import socket
-import struct
-import time
-import traceback
-from asyncio import AbstractEventLoop, get_running_loop
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Coroutine, Dict, List, Optional, Union, cast
+import threading
+from asyncio import AbstractEventLoop
+from typing import Any, Coroutine, List, Optional, Set, Union, cast
+from weakref import WeakSet
 
 import msgpack
 import zmq
@@ -18,64 +15,27 @@ import zmq.asyncio
 from zmq.asyncio import Context as AsyncContext
 
 from ..config import __COMPATIBILITY__
+from ..errors import LanComError
 from ..lancom_type import (
+    HashIdentifier,
     IPAddress,
     LanComMsg,
     NodeInfo,
     NodeReqType,
     Port,
-    SocketInfo,
-    TopicName,
 )
 from ..utils.log import logger
-from ..utils.msg import send_bytes_request
-
-
-class NodesMap:
-    def __init__(self):
-        self.nodes_info: Dict[str, NodeInfo] = {}
-        self.nodes_info_id: Dict[str, int] = {}
-        self.nodes_heartbeat: Dict[str, str] = {}
-        self.publishers_dict: Dict[str, SocketInfo] = {}
-        self.services_dict: Dict[str, SocketInfo] = {}
-
-    def check_node(self, node_id: str) -> bool:
-        return node_id in self.nodes_info
-
-    def check_info(self, node_id: str, info_id: int) -> bool:
-        return self.nodes_info_id.get(node_id, "") == info_id
-
-    def check_heartbeat(self, node_id: str, info_id: int) -> bool:
-        return self.check_node(node_id) and self.check_info(node_id, info_id)
-
-    def update_node(self, node_id: str, node_info: NodeInfo):
-        if node_id not in self.nodes_info:
-            logger.debug(f"Node {node_info['name']} has been registered")
-        for pub_info in node_info["publishers"]:
-            if pub_info["socketID"] not in self.publishers_dict:
-                self.publishers_dict[pub_info["socketID"]] = pub_info
-        for service_info in node_info["services"]:
-            if service_info["socketID"] not in self.services_dict:
-                self.services_dict[service_info["socketID"]] = service_info
-        self.nodes_info[node_id] = node_info
-        self.nodes_info_id[node_id] = node_info["infoID"]
-
-    def remove_node(self, node_id: str) -> None:
-        self.nodes_info.pop(node_id, None)
-        self.nodes_info_id.pop(node_id, None)
-
-    def get_publisher_info(self, topic_name: TopicName) -> List[SocketInfo]:
-        publishers: List[SocketInfo] = []
-        for pub_info in self.publishers_dict.values():
-            if pub_info["name"] == topic_name:
-                publishers.append(pub_info)
-        return publishers
-
-    def get_service_info(self, service_name: str) -> Optional[SocketInfo]:
-        for service in self.services_dict.values():
-            if service["name"] == service_name:
-                return service
-        return None
+from ..utils.msg import (
+    get_heartbeat_header,
+    parse_heartbeat,
+    send_bytes_request,
+)
+from ..utils.name_filter import NameFilter
+from .nodes_map import DeferredNode, NodesMap
+from .runtime import NodeRuntime
+
+# how long closing a node waits for the pending requests and messages
+DRAIN_TIMEOUT = 1.0
 
 
 class AbstractNode(abc.ABC):
@@ -85,27 +45,82 @@ class AbstractNode(abc.ABC):
         node_ip: IPAddress,
         multicast_addr: IPAddress = "224.0.0.1",
         multicast_port: int = 7720,
+        autostart: bool = True,
+        multicast: bool = True,
+        peers: Optional[List[str]] = None,
+        event_loop: Optional[str] = None,
     ) -> None:
+        """
+        `multicast_port` is the UDP port of the discovery, `peers` lists
+        the "ip" or "ip:port" addresses announced to by unicast, e.g. on
+        networks where multicast is not available (`multicast=False`).
+        The first node of the process picks the `event_loop`, see
+        `NodeRuntime.get`.
+        """
         super().__init__()
         self.node_name = node_name
         self.node_ip = node_ip
         self.multicast_addr = multicast_addr
         self.multicast_port = multicast_port
+        self.multicast = multicast
+        self.peers = peers or []
         # for running on Windows localhost, use a different multicast address
         if self.node_ip == "127.0.0.1" and platform.system() == "Windows":
             self.multicast_addr = "239.255.255.250"
-        self.zmq_context: AsyncContext = zmq.asyncio.Context()
-        self.executor = ThreadPoolExecutor(max_workers=10)
+        # the nodes of a process share the loop, context and discovery
+        self.runtime = NodeRuntime.get(event_loop)
+        self.zmq_context: AsyncContext = self.runtime.zmq_context
+        self.executor = self.runtime.executor
+        self.loop: Optional[AbstractEventLoop] = self.runtime.loop
         self.running = False
-        self.nodes_map = NodesMap()
-        self.loop: Optional[AbstractEventLoop] = None
-        # start spin task
-        self.executor.submit(self.spin_task)
-        while not self.running:
-            time.sleep(0.05)
+        self.stopped = threading.Event()
+        # the long running tasks and the sockets to clean up on close
+        self.loop_tasks: Set[concurrent.futures.Future] = set()
+        self.sockets: WeakSet[zmq.asyncio.Socket] = WeakSet()
+        self.busy_sockets: WeakSet[zmq.Socket] = WeakSet()
+        self.discovery = self.runtime.get_group(
+            self.multicast_addr, self.multicast_port, multicast
+        )
+        self.nodes_map: NodesMap = self.discovery.nodes_map
+        self.runtime.add_node(self)
+        if autostart:
+            self.start()
+
+    def __enter__(self) -> AbstractNode:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> AbstractNode:
+        if not self.running:
+            await self.run_on_loop(self.start_node())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if not self.stopped.is_set():
+            await self.run_on_loop(self.close_async(DRAIN_TIMEOUT))
+            self.leave_runtime()
+
+    async def run_on_loop(self, task: Coroutine) -> Any:
+        # the caller may run its own event loop in another thread
+        if asyncio.get_running_loop() is self.loop:
+            return await task
+        future = asyncio.run_coroutine_threadsafe(task, self.runtime.loop)
+        return await asyncio.wrap_future(future)
 
     def create_socket(self, socket_type: int) -> zmq.asyncio.Socket:
-        return self.zmq_context.socket(socket_type)
+        zmq_socket = self.zmq_context.socket(socket_type)
+        self.sockets.add(zmq_socket)
+        return zmq_socket
+
+    def create_busy_socket(self, socket_type: int) -> zmq.Socket:
+        """A plain socket for the busy poller, see `BusyPoller`."""
+        poller = self.runtime.get_busy_poller()
+        zmq_socket = poller.context.socket(socket_type)
+        self.busy_sockets.add(zmq_socket)
+        return zmq_socket
 
     def submit_loop_task(
         self,
@@ -117,97 +132,160 @@ class AbstractNode(abc.ABC):
         future = asyncio.run_coroutine_threadsafe(task, self.loop)
         if block:
             return future.result()
+        # cancelled when the node is closed
+        self.loop_tasks.add(future)
+        future.add_done_callback(self.loop_tasks.discard)
         return future
 
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self.runtime.thread
+
     def spin(self) -> None:
-        while self.running:
-            time.sleep(0.05)
+        """Blocks until the node is closed."""
+        self.stopped.wait()
 
-    def spin_task(self) -> None:
-        logger.info("Starting spin task")
-        try:
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            self.running = True
-            self.initialize_event_loop()
-            self.loop.run_forever()
-        except KeyboardInterrupt:
-            self.stop_node()
-        except Exception as e:
-            logger.error(f"Unexpected error in thread_task: {e}")
-            traceback.print_exc()
-            self.stop_node()
+    def start(self) -> None:
+        """Starts the node, it is ready to use once this returns."""
+        if self.running:
+            return
+        self.submit_loop_task(self.start_node(), True)
+
+    async def start_node(self) -> None:
+        # the loops started here only see the node running once its
+        # sockets have been created, both happen in this one step
+        self.running = True
+        self.initialize_event_loop()
+
+    def close(self, drain_timeout: float = DRAIN_TIMEOUT) -> None:
+        """Stops the node after draining its pending work.
+
+        The requests being handled get up to `drain_timeout` seconds to
+        complete and the queued messages as long to be sent.
+        """
+        if self.stopped.is_set():
+            return
+        future = asyncio.run_coroutine_threadsafe(
+            self.close_async(drain_timeout), self.runtime.loop
+        )
+        if self.in_loop_thread():
+            # closing from a callback, the loop cannot wait for itself
+            future.add_done_callback(lambda _: self.leave_runtime())
+            return
+        future.result()
+        self.leave_runtime()
 
     def stop_node(self):
+        self.close()
+
+    async def close_async(self, drain_timeout: float) -> None:
         self.running = False
-        try:
-            if self.loop is not None:
-                self.loop.call_soon_threadsafe(self.loop.stop)
-        except RuntimeError as e:
-            logger.error(f"One error occurred when stop server: {e}")
-        self.executor.shutdown(wait=False)
+        self.discovery.remove_node(self)
+        await self.drain(drain_timeout)
+        for future in list(self.loop_tasks):
+            future.cancel()
+        linger = int(drain_timeout * 1000)
+        for zmq_socket in list(self.sockets):
+            zmq_socket.close(linger=linger)
+        for busy_socket in list(self.busy_sockets):
+            self.runtime.get_busy_poller().unregister(busy_socket)
+
+    async def drain(self, timeout: float) -> None:
+        """Waits for the pending work of the node."""
+
+    def leave_runtime(self) -> None:
+        self.stopped.set()
+        self.runtime.remove_node(self)
 
     async def listen_loop(self):
-        """Asynchronously listens for multicast messages from other nodes."""
-        try:
-            logger.debug("Starting multicast listening")
-            _socket = socket.socket(
-                socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
-            )
-            _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            # _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            group = socket.inet_aton(self.multicast_addr)
-            _socket.setsockopt(
-                socket.IPPROTO_IP,
-                socket.IP_ADD_MEMBERSHIP,
-                struct.pack("4sL", group, socket.INADDR_ANY),
-            )
-            _socket.bind(("", self.multicast_port))
-            while self.running:
-                try:
-                    data, addr = await get_running_loop().run_in_executor(
-                        self.executor, _socket.recvfrom, 1024
-                    )
-                    await self.process_heartbeat(data, addr[0])
-                except Exception as e:
-                    logger.error(f"Error receiving multicast message: {e}")
-                    traceback.print_exc()
-                await asyncio.sleep(0.5)
-        except Exception as e:
-            logger.error(f"Listening loop error: {e}")
-            traceback.print_exc()
-        finally:
-            _socket.close()
-            logger.info("Multicast receiving has been stopped")
+        """Joins the multicast listener shared by the nodes of the process."""
+        self.discovery.add_peers(self.peers)
+        await self.discovery.add_node(self)
+
+    def announce(self) -> None:
+        """Sends the heartbeat of the node, called by the discovery."""
 
     async def process_heartbeat(self, data: bytes, ip: IPAddress) -> None:
-        """Processes received multicast messages and prints them."""
+        """Updates the map with the node announced by a heartbeat.
+
+        The info of a new node is taken from the heartbeat when it is
+        carried inline, otherwise fetched if the node may have a socket
+        of interest and deferred until it does.
+        """
         try:
-            if data[:6] != b"LANCOM":
+            header = get_heartbeat_header(data)
+            # the usual case, a known node which did not change
+            if self.nodes_map.heard(header):
                 return
-            if data[6:8] != __COMPATIBILITY__:
-                logger.warning(f"Incompatible version {data[6:9]}")
+            heartbeat = parse_heartbeat(data)
+            if heartbeat is None:
                 return
-            node_id = data[9:45].decode()
-            node_port = int.from_bytes(data[-6:-4], "big")
-            node_info_id = int.from_bytes(data[-4:], "big")
-            # add a new node to the map
-            if self.nodes_map.check_heartbeat(node_id, node_info_id):
+            if heartbeat.version[:2] != __COMPATIBILITY__:
+                logger.warning("Incompatible version %s", heartbeat.version)
                 return
-            node_info_bytes = await self.send_request(
-                NodeReqType.NODE_INFO.value,
-                ip,
-                node_port,
-                LanComMsg.EMPTY.value,
-            )
-            if node_info_bytes == LanComMsg.TIMEOUT.value.encode():
+            node_id = heartbeat.node_id
+            if self.nodes_map.check_heartbeat(node_id, heartbeat.info_id):
+                self.nodes_map.add_heartbeat(node_id, header)
+                return
+            names = NameFilter(heartbeat.names)
+            if heartbeat.node_info is not None:
+                node_info = cast(NodeInfo, msgpack.loads(heartbeat.node_info))
+            elif node_id in self.nodes_map.nodes_info or (
+                self.nodes_map.is_wanted(names)
+            ):
+                node_info = await self.fetch_node_info(
+                    node_id, ip, heartbeat.port
+                )
+            else:
+                self.nodes_map.defer_node(
+                    node_id,
+                    DeferredNode(ip, heartbeat.port, heartbeat.info_id, names),
+                )
+                self.nodes_map.add_heartbeat(node_id, header)
                 return
-            node_info = cast(NodeInfo, msgpack.loads(node_info_bytes))
             self.nodes_map.update_node(node_id, node_info)
-            return
+            self.nodes_map.add_heartbeat(node_id, header)
+        except LanComError as e:
+            # fetched again on the next heartbeat
+            logger.warning("Failed to fetch the node info: %s", e)
         except Exception as e:
-            logger.error(f"Error processing received message: {e}")
-            traceback.print_exc()
+            logger.error(
+                "Error processing received message: %s", e, exc_info=True
+            )
+
+    async def fetch_node_info(
+        self, node_id: HashIdentifier, ip: IPAddress, port: Port
+    ) -> NodeInfo:
+        local_node = self.runtime.local_nodes.get(node_id)
+        if local_node is not None:
+            # no need for a round trip to a node of this process
+            node_info_bytes = local_node.node_info_cbs(b"")
+        else:
+            node_info_bytes = await self.send_request(
+                NodeReqType.NODE_INFO.value, ip, port, LanComMsg.EMPTY.value
+            )
+        return cast(NodeInfo, msgpack.loads(node_info_bytes))
+
+    async def fetch_deferred(self, key: Optional[str] = None) -> None:
+        """Fetches the deferred nodes which may have the socket `key`.
+
+        See `NodesMap.take_deferred`, call it once the interest in the
+        socket has been registered so no heartbeat slips in between.
+        """
+        deferred = self.nodes_map.take_deferred(key)
+        results = await asyncio.gather(
+            *(
+                self.fetch_node_info(node_id, node.ip, node.port)
+                for node_id, node in deferred
+            ),
+            return_exceptions=True,
+        )
+        for (node_id, node), result in zip(deferred, results):
+            if isinstance(result, BaseException):
+                logger.warning("Failed to fetch the node info: %s", result)
+                # the next heartbeat of the node tries again
+                self.nodes_map.remove_node(node_id)
+            else:
+                self.nodes_map.update_node(node_id, result)
 
     async def send_request(
         self,
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict
+
+import zmq
+
+from ..utils.log import logger
+
+# handles the messages waiting on a socket, on the poller thread
+PollHandler = Callable[[zmq.Socket], None]
+
+
+class BusyPoller:
+    """Polls plain zmq sockets in a tight loop on a thread of its own.
+
+    A message on an asyncio socket wakes up the selector of the loop and
+    goes through pyzmq's asyncio integration, which costs tens of
+    microseconds per hop. The sockets registered here are polled without
+    sleeping instead and their handlers run on the poller thread as soon
+    as a message arrives, at the price of a busy CPU core while any
+    socket is registered.
+
+    The sockets are only used on the poller thread, `call` runs the
+    functions touching them there.
+    """
+
+    def __init__(self) -> None:
+        self.context = zmq.Context()
+        self.poller = zmq.Poller()
+        self.handlers: Dict[zmq.Socket, PollHandler] = {}
+        self.calls: Deque[Callable[[], None]] = deque()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="lancom-busy-poll", daemon=True
+        )
+        self.thread.start()
+
+    def run(self) -> None:
+        while self.running:
+            while self.calls:
+                self.run_call(self.calls.popleft())
+            if not self.handlers:
+                # nothing to poll, sleep until a socket is registered
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            for zmq_socket, _ in self.poller.poll(0):
+                handler = self.handlers.get(zmq_socket)
+                if handler is None:
+                    continue
+                try:
+                    handler(zmq_socket)
+                except Exception as e:
+                    logger.error(
+                        "Error from a busy polled socket: %s", e, exc_info=True
+                    )
+        for zmq_socket in list(self.handlers):
+            self.poller.unregister(zmq_socket)
+            zmq_socket.close(linger=0)
+        self.handlers.clear()
+        self.context.term()
+
+    @staticmethod
+    def run_call(call: Callable[[], None]) -> None:
+        try:
+            call()
+        except Exception as e:
+            logger.error("Error on the busy poll thread: %s", e, exc_info=True)
+
+    def call(self, function: Callable[[], None]) -> None:
+        """Runs `function` on the poller thread, from any thread."""
+        self.calls.append(function)
+        self.wakeup.set()
+
+    def register(self, zmq_socket: zmq.Socket, handler: PollHandler) -> None:
+        def add() -> None:
+            self.handlers[zmq_socket] = handler
+            self.poller.register(zmq_socket, zmq.POLLIN)
+
+        self.call(add)
+
+    def unregister(self, zmq_socket: zmq.Socket) -> None:
+        """Stops polling the socket and closes it."""
+
+        def remove() -> None:
+            if self.handlers.pop(zmq_socket, None) is not None:
+                self.poller.unregister(zmq_socket)
+            zmq_socket.close(linger=0)
+
+        self.call(remove)
+
+    def stop(self) -> None:
+        self.running = False
+        self.wakeup.set()
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
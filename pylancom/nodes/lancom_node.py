@@ -1,30 +1,98 @@
 from __future__ import annotations
 
 import asyncio
+import random
 import socket
-import traceback
-from typing import Callable, Dict, Optional, cast
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import msgpack
 import zmq.asyncio
 
-from ..lancom_type import IPAddress, LanComMsg, NodeInfo, NodeReqType
+from ..errors import DeadlineExceededError, LanComError
+from ..lancom_type import (
+    HashIdentifier,
+    IPAddress,
+    LanComMsg,
+    NodeInfo,
+    NodeReqType,
+    RegistryReqType,
+)
+from ..utils.cache import ResponseCache
 from ..utils.log import logger
 from ..utils.msg import (
     create_hash_identifier,
     create_heartbeat_message,
     get_socket_port,
+    send_bytes_request,
+    split_envelope,
+    unpack_deadline,
 )
+from ..utils.name_filter import NameFilter, service_key, topic_key
+from ..utils.profiler import MAX_PROFILE_DURATION, SamplingProfiler
+from ..utils.qos import QoS, configure_socket, higher_classes
+from ..utils.throttle import Throttle
 from .abstract_node import AbstractNode
+from .runtime import Waker
+
+if TYPE_CHECKING:
+    from .load_balancer import ServiceBalancer
+    from .process_service import ProcessService
+
+# the longest time a service callback may take, unless the service sets
+# its own
+SERVICE_TIMEOUT = 2.0
+# seconds between two polls of the registry, jittered
+REGISTRY_POLL_INTERVAL = 1.0
+
+ServiceCallback = Union[
+    Callable[[bytes], bytes], Callable[[bytes], Awaitable[bytes]]
+]
+
+# the last messages of a latched publisher as (seq, message)
+LatchedMessages = Deque[Tuple[int, bytes]]
 
 
 class LanComNode(AbstractNode):
     instance: Optional[LanComNode] = None
 
-    def __init__(self, node_name: str, node_ip: IPAddress) -> None:
-        if LanComNode.instance is not None:
-            raise Exception("LanComNode has been initialized")
-        LanComNode.instance = self
+    def __init__(
+        self,
+        node_name: str,
+        node_ip: IPAddress,
+        autostart: bool = True,
+        multicast: bool = True,
+        peers: Optional[List[str]] = None,
+        registry: Optional[str] = None,
+        multicast_port: int = 7720,
+        event_loop: Optional[str] = None,
+    ) -> None:
+        """
+        Several nodes may run in one process, the first one becomes the
+        default node of the sockets created without an explicit node.
+
+        The nodes discover each other with multicast heartbeats, unicast
+        heartbeats to the `peers` and, with the "ip:port" address of a
+        `Registry`, through the registry.
+
+        The first node of the process also picks the `event_loop` of the
+        nodes, "asyncio" or "uvloop".
+        """
+        if LanComNode.instance is None:
+            LanComNode.instance = self
         self.node_id = create_hash_identifier()
         # Initialize the NodeInfo message
         self.local_info = NodeInfo(
@@ -37,100 +105,520 @@ class LanComNode(AbstractNode):
             publishers=[],
             services=[],
         )
-        self.service_cbs: Dict[str, Callable[[bytes], bytes]] = {}
-        super().__init__(node_name, node_ip)
+        self.service_cbs: Dict[str, ServiceCallback] = {}
+        self.service_balancers: Dict[str, ServiceBalancer] = {}
+        # the services allowed more time than SERVICE_TIMEOUT
+        self.service_timeouts: Dict[str, float] = {}
+        # their worker processes are stopped with the node
+        self.process_services: Dict[str, ProcessService] = {}
+        self.response_cache = ResponseCache()
+        self.latched_messages: Dict[HashIdentifier, LatchedMessages] = {}
+        # prefixes of the topics subscribed by the remote subscribers
+        self.subscriptions: Set[bytes] = set()
+        # the requests being handled, waited for when closing
+        self.request_tasks: Set[asyncio.Task] = set()
+        # the sockets of the QoS classes, created on first use
+        self.pub_sockets: Dict[QoS, zmq.asyncio.Socket] = {}
+        self.service_sockets: Dict[QoS, zmq.asyncio.Socket] = {}
+        # the sockets whose loop runs, the ones created before the node
+        # starts get it from `start_node`
+        self.looping_sockets: Set[zmq.asyncio.Socket] = set()
+        self.qos_lock = threading.Lock()
+        # the service requests being handled per class, the lower classes
+        # are dispatched once the higher ones are done
+        self.active_requests: Dict[QoS, int] = {qos: 0 for qos in QoS}
+        # created on the loop thread by `start_node`
+        self.requests_done: asyncio.Condition
+        self.registry = registry
+        self.registry_waker = Waker()
+        self.registered_info_id = -1
+        # the nodes learned from the registry
+        self.registry_nodes: Set[HashIdentifier] = set()
+        self.announce_socket: Optional[socket.socket] = None
+        self.heartbeat = b""
+        self.heartbeat_info_id = -1
+        super().__init__(
+            node_name,
+            node_ip,
+            multicast_port=multicast_port,
+            autostart=autostart,
+            multicast=multicast,
+            peers=peers,
+            event_loop=event_loop,
+        )
 
-    def create_socket(self, socket_type: int) -> zmq.asyncio.Socket:
-        return self.zmq_context.socket(socket_type)
+    @staticmethod
+    def get_node(node: Optional[LanComNode] = None) -> LanComNode:
+        """Returns `node`, or the default node of the process."""
+        if node is not None:
+            return node
+        if LanComNode.instance is None:
+            raise ValueError("Lancom Node is not initialized")
+        return LanComNode.instance
 
-    async def multicast_loop(self):
-        """Asynchronously sends multicast messages to announce the node."""
-        try:
-            _socket = socket.socket(
-                socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
-            )
-            _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            # _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            _socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
-            _socket.setsockopt(
-                socket.IPPROTO_IP,
-                socket.IP_MULTICAST_IF,
-                socket.inet_aton(self.node_ip),
+    def create_announce_socket(self) -> socket.socket:
+        _socket = socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
+        )
+        _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        _socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        _socket.setsockopt(
+            socket.IPPROTO_IP,
+            socket.IP_MULTICAST_IF,
+            socket.inet_aton(self.node_ip),
+        )
+        _socket.setblocking(False)
+        return _socket
+
+    def create_heartbeat(self) -> bytes:
+        names = NameFilter()
+        for pub_info in self.local_info["publishers"]:
+            names.add(topic_key(pub_info["name"]))
+        for service_info in self.local_info["services"]:
+            names.add(service_key(service_info["name"]))
+        return create_heartbeat_message(
+            self.node_id,
+            self.local_info["port"],
+            self.local_info["infoID"],
+            names.to_bytes(),
+            self.node_info_cbs(b""),
+        )
+
+    def announce(self) -> None:
+        """Sends the heartbeat to the multicast group and the peers."""
+        # built again only when the info changes
+        if self.heartbeat_info_id != self.local_info["infoID"]:
+            self.heartbeat_info_id = self.local_info["infoID"]
+            self.heartbeat = self.create_heartbeat()
+        msg = self.heartbeat
+        if self.multicast and self.announce_socket is not None:
+            self.announce_socket.sendto(
+                msg, (self.multicast_addr, self.multicast_port)
             )
-            logger.debug(f"Multicast has been started at {self.node_ip}")
-            while self.running:
-                msg = create_heartbeat_message(
-                    self.node_id,
-                    self.local_info["port"],
-                    self.local_info["infoID"],
+        self.discovery.send_to_peers(msg)
+
+    async def registry_loop(self) -> None:
+        """Registers the node to the registry and polls the other nodes."""
+        addr = f"tcp://{self.registry}"
+        version = 0
+        while self.running:
+            try:
+                if self.registered_info_id != self.local_info["infoID"]:
+                    info_id = self.local_info["infoID"]
+                    await send_bytes_request(
+                        addr,
+                        RegistryReqType.REGISTER.value,
+                        cast(bytes, msgpack.dumps(self.local_info)),
+                    )
+                    self.registered_info_id = info_id
+                response = await send_bytes_request(
+                    addr,
+                    RegistryReqType.QUERY.value,
+                    cast(bytes, msgpack.dumps([self.node_id, version])),
                 )
-                _socket.sendto(msg, (self.multicast_addr, self.multicast_port))
-                await asyncio.sleep(1)  # Prevent excessive CPU usage
-        except Exception as e:
-            logger.error(f"Multicast error: {e}")
-            traceback.print_exc()
-        finally:
-            _socket.close()
-            logger.info("Multicast has been stopped")
+                version, registered, full, updated, removed = msgpack.loads(
+                    response
+                )
+                if not registered:
+                    # the registry restarted or dropped the node
+                    self.registered_info_id = -1
+                self.apply_registry_update(full, updated, removed)
+            except LanComError as e:
+                logger.warning(
+                    "Registry %s is not reachable: %s", self.registry, e
+                )
+            await self.registry_waker.sleep(
+                random.uniform(0.5, 1.0) * REGISTRY_POLL_INTERVAL
+            )
+
+    def shares_map(self, node_id: HashIdentifier) -> bool:
+        # the nodes of this process in the same map keep it up to date
+        local_node = self.runtime.local_nodes.get(node_id)
+        return (
+            local_node is not None and local_node.nodes_map is self.nodes_map
+        )
+
+    def apply_registry_update(
+        self,
+        full: bool,
+        updated: List[NodeInfo],
+        removed: List[HashIdentifier],
+    ) -> None:
+        if full:
+            # the registry lost track of the changes, resync everything
+            removed = list(
+                self.registry_nodes - {info["nodeID"] for info in updated}
+            )
+        for node_id in removed:
+            self.registry_nodes.discard(node_id)
+            if not self.shares_map(node_id):
+                self.nodes_map.remove_node(node_id)
+        for node_info in updated:
+            node_id = node_info["nodeID"]
+            if self.shares_map(node_id):
+                continue
+            self.registry_nodes.add(node_id)
+            if not self.nodes_map.check_heartbeat(
+                node_id, node_info["infoID"]
+            ):
+                self.nodes_map.update_node(node_id, node_info)
 
     async def service_loop(
         self,
         service_socket: zmq.asyncio.Socket,
-        services: Dict[str, Callable[[bytes], bytes]],
+        services: Dict[str, ServiceCallback],
+        qos: Optional[QoS] = None,
     ) -> None:
+        """Receives requests on a ROUTER socket and handles them concurrently.
+
+        Every request is dispatched as its own task so a slow callback does
+        not block the requests queued behind it. The requests of a `qos`
+        class are only dispatched while no request of a higher class is
+        being handled, the node requests are not held back.
+        """
         if self.loop is None:
             raise Exception("Event loop has not been initialized")
         while self.running:
             try:
-                name_bytes, request = await service_socket.recv_multipart()
+                frames = await service_socket.recv_multipart()
+                if qos is not None:
+                    await self.wait_for_priority(qos)
+                    self.active_requests[qos] += 1
             except Exception as e:
-                logger.error(f"Error occurred when receiving request: {e}")
-                traceback.print_exc()
-            service_name = name_bytes.decode()
-            if service_name not in services.keys():
-                logger.error(f"Service {service_name} is not available")
+                logger.error(
+                    "Error occurred when receiving request: %s",
+                    e,
+                    exc_info=True,
+                )
                 continue
-            try:
-                result = await asyncio.wait_for(
-                    self.loop.run_in_executor(
-                        self.executor, services[service_name], request
-                    ),
-                    timeout=2.0,
+            task = self.loop.create_task(
+                self.handle_request(service_socket, services, frames, qos)
+            )
+            self.request_tasks.add(task)
+            task.add_done_callback(self.request_tasks.discard)
+        logger.info("Service loop has been stopped")
+
+    async def wait_for_priority(self, qos: QoS) -> None:
+        higher = higher_classes(qos)
+        if not any(self.active_requests[h] for h in higher):
+            return
+        async with self.requests_done:
+            await self.requests_done.wait_for(
+                lambda: not any(self.active_requests[h] for h in higher)
+            )
+
+    async def handle_request(
+        self,
+        service_socket: zmq.asyncio.Socket,
+        services: Dict[str, ServiceCallback],
+        frames: List[bytes],
+        qos: Optional[QoS] = None,
+    ) -> None:
+        if qos is None:
+            await self.process_request(service_socket, services, frames)
+            return
+        try:
+            await self.process_request(service_socket, services, frames, qos)
+        finally:
+            self.active_requests[qos] -= 1
+            if self.active_requests[qos] == 0:
+                async with self.requests_done:
+                    self.requests_done.notify_all()
+
+    async def process_request(
+        self,
+        service_socket: zmq.asyncio.Socket,
+        services: Dict[str, ServiceCallback],
+        frames: List[bytes],
+        qos: Optional[QoS] = None,
+    ) -> None:
+        if self.loop is None:
+            raise Exception("Event loop has not been initialized")
+        envelope, body = split_envelope(frames)
+        if len(body) < 2:
+            logger.error("Received a request without a payload frame")
+            await self.send_response(
+                service_socket, envelope, LanComMsg.ERROR, b"Bad request"
+            )
+            return
+        name_bytes, request = body[0], body[1]
+        service_name = name_bytes.decode()
+        timeout = self.service_timeouts.get(service_name, SERVICE_TIMEOUT)
+        deadline: Optional[float] = None
+        if len(body) > 2:
+            deadline = time.monotonic() + unpack_deadline(body[2])
+            timeout = min(timeout, deadline - time.monotonic())
+        if service_name not in services.keys():
+            logger.error("Service %s is not available", service_name)
+            await self.send_response(
+                service_socket, envelope, LanComMsg.ERROR, b"Not available"
+            )
+            return
+        callback = services[service_name]
+        try:
+            if timeout <= 0:
+                raise DeadlineExceededError
+            if asyncio.iscoroutinefunction(callback):
+                task = callback(request)
+            else:
+                executor = self.executor
+                if qos is not None:
+                    executor = self.runtime.get_executor(qos)
+                task = self.loop.run_in_executor(
+                    executor,
+                    self.run_before_deadline,
+                    callback,
+                    request,
+                    deadline,
                 )
-                # result = services[service_name](request)
-                # logger.debug(service_name, result)
-                await service_socket.send(result)
-            except asyncio.TimeoutError:
-                logger.error("Timeout: callback function took too long")
-                await service_socket.send(LanComMsg.TIMEOUT.value)
+            result = await asyncio.wait_for(task, timeout=timeout)
+            await self.send_response(
+                service_socket, envelope, LanComMsg.SUCCESS, result
+            )
+        except DeadlineExceededError:
+            logger.warning("Dropped the expired request of %s", service_name)
+            await self.send_response(
+                service_socket, envelope, LanComMsg.EXPIRED
+            )
+        except asyncio.TimeoutError:
+            logger.error("Timeout: callback function took too long")
+            status = LanComMsg.TIMEOUT
+            if deadline is not None and time.monotonic() >= deadline:
+                status = LanComMsg.EXPIRED
+            await self.send_response(service_socket, envelope, status)
+        except Exception as e:
+            logger.error(
+                'One error occurred when processing the Service "%s": %s',
+                service_name,
+                e,
+                exc_info=True,
+            )
+            await self.send_response(
+                service_socket, envelope, LanComMsg.ERROR, str(e).encode()
+            )
+
+    @staticmethod
+    def run_before_deadline(
+        callback: Callable[[bytes], bytes],
+        request: bytes,
+        deadline: Optional[float],
+    ) -> bytes:
+        # the request may have waited in the executor queue for too long
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceededError
+        return callback(request)
+
+    @staticmethod
+    async def send_response(
+        service_socket: zmq.asyncio.Socket,
+        envelope: List[bytes],
+        status: LanComMsg,
+        payload: bytes = b"",
+    ) -> None:
+        await service_socket.send_multipart(
+            envelope + [status.value.encode(), payload]
+        )
+
+    def refresh_local_info(self) -> None:
+        """Publishes a change of the local sockets.
+
+        The remote nodes refetch the info on the next heartbeat, the
+        nodes of this process share the map and see it right away.
+        """
+        self.local_info["infoID"] += 1
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.local_info_changed)
+
+    def local_info_changed(self) -> None:
+        self.nodes_map.update_node(self.node_id, self.local_info)
+        self.discovery.reset_announce()
+        self.registry_waker.wake()
+
+    def has_subscriber(self, topic: bytes) -> bool:
+        return any(topic.startswith(prefix) for prefix in self.subscriptions)
+
+    async def subscription_loop(self, pub_socket: zmq.asyncio.Socket) -> None:
+        """Tracks the topics the remote subscribers are interested in."""
+        while self.running:
+            try:
+                frame = await pub_socket.recv()
             except Exception as e:
                 logger.error(
-                    f"One error occurred when processing the Service "
-                    f'"{service_name}": {e}'
+                    "Error occurred when receiving subscription: %s", e
                 )
-                traceback.print_exc()
-                await service_socket.send(LanComMsg.ERROR.value)
-        logger.info("Service loop has been stopped")
+                continue
+            # XPUB reports the first subscription and the last unsubscription
+            if frame[:1] == b"\x01":
+                self.subscriptions.add(frame[1:])
+            elif frame[:1] == b"\x00":
+                self.subscriptions.discard(frame[1:])
+                self.drop_throttles()
+
+    def drop_throttles(self) -> None:
+        for publisher in self.runtime.local_publishers.values():
+            if publisher.node is self and publisher.schedules:
+                publisher.drop_throttles()
+
+    def get_pub_socket(self, qos: QoS) -> zmq.asyncio.Socket:
+        """The publishing socket of a QoS class, from any thread."""
+        with self.qos_lock:
+            if qos not in self.pub_sockets:
+                pub_socket = self.create_socket(zmq.XPUB)
+                configure_socket(pub_socket, qos)
+                pub_socket.bind(f"tcp://{self.node_ip}:0")
+                self.pub_sockets[qos] = pub_socket
+                self.start_socket_loops()
+            return self.pub_sockets[qos]
+
+    def get_service_socket(self, qos: QoS) -> zmq.asyncio.Socket:
+        """The socket of the services of a QoS class, from any thread."""
+        with self.qos_lock:
+            if qos not in self.service_sockets:
+                service_socket = self.create_socket(zmq.ROUTER)
+                configure_socket(service_socket, qos)
+                service_socket.bind(f"tcp://{self.node_ip}:0")
+                self.service_sockets[qos] = service_socket
+                self.start_socket_loops()
+            return self.service_sockets[qos]
+
+    def start_socket_loops(self) -> None:
+        """Starts the loops of the QoS sockets, with `qos_lock` held.
+
+        The loops stop as soon as they see the node is not running, the
+        sockets created before `start` wait for it.
+        """
+        if not self.running:
+            return
+        for pub_socket in self.pub_sockets.values():
+            if pub_socket not in self.looping_sockets:
+                self.looping_sockets.add(pub_socket)
+                self.submit_loop_task(self.subscription_loop(pub_socket))
+        for qos, service_socket in self.service_sockets.items():
+            if service_socket not in self.looping_sockets:
+                self.looping_sockets.add(service_socket)
+                self.submit_loop_task(
+                    self.service_loop(service_socket, self.service_cbs, qos)
+                )
+
+    async def start_node(self) -> None:
+        # bound to the running loop before Python 3.10
+        self.requests_done = asyncio.Condition()
+        await super().start_node()
 
     def initialize_event_loop(self):
-        node_socket = self.create_socket(zmq.REP)
+        with self.qos_lock:
+            self.start_socket_loops()
+        node_socket = self.create_socket(zmq.ROUTER)
         node_socket.bind(f"tcp://{self.node_ip}:0")
         self.local_info["port"] = get_socket_port(node_socket)
-        self.pub_socket = self.create_socket(zmq.PUB)
-        self.pub_socket.bind(f"tcp://{self.node_ip}:0")
+        self.pub_socket = self.get_pub_socket(QoS.NORMAL)
         self.nodes_map.update_node(self.node_id, self.local_info)
+        self.runtime.local_nodes[self.node_id] = self
         node_service_cbs = {
-            NodeReqType.PING.value: lambda x: LanComMsg.SUCCESS.value,
+            NodeReqType.PING.value: self.ping_cbs,
             NodeReqType.NODE_INFO.value: self.node_info_cbs,
+            NodeReqType.SNAPSHOT.value: self.snapshot_cbs,
+            NodeReqType.RETRANSMIT.value: self.retransmit_cbs,
+            NodeReqType.THROTTLE.value: self.throttle_cbs,
+            NodeReqType.PROFILE.value: self.profile_cbs,
         }
         self.submit_loop_task(self.service_loop(node_socket, node_service_cbs))
-        self.service_socket = self.create_socket(zmq.REP)
-        self.service_socket.bind(f"tcp://{self.node_ip}:0")
-        self.submit_loop_task(
-            self.service_loop(self.service_socket, self.service_cbs)
-        )
-        self.submit_loop_task(self.multicast_loop())
+        self.service_socket = self.get_service_socket(QoS.NORMAL)
+        self.announce_socket = self.create_announce_socket()
+        if self.registry is not None:
+            self.submit_loop_task(self.registry_loop())
         super().initialize_event_loop()
 
+    async def drain(self, timeout: float) -> None:
+        if self.request_tasks:
+            await asyncio.wait(set(self.request_tasks), timeout=timeout)
+
+    async def close_async(self, drain_timeout: float) -> None:
+        if LanComNode.instance is self:
+            LanComNode.instance = None
+        runtime = self.runtime
+        runtime.local_nodes.pop(self.node_id, None)
+        for socket_id, publisher in list(runtime.local_publishers.items()):
+            if publisher.node is self:
+                runtime.local_publishers.pop(socket_id)
+        for services in runtime.local_services.values():
+            services[:] = [s for s in services if s.node is not self]
+        for balancer in self.service_balancers.values():
+            balancer.stop()
+        self.nodes_map.remove_node(self.node_id)
+        if self.registry is not None and self.registered_info_id >= 0:
+            try:
+                await send_bytes_request(
+                    f"tcp://{self.registry}",
+                    RegistryReqType.UNREGISTER.value,
+                    self.node_id.encode(),
+                    timeout=drain_timeout,
+                )
+            except LanComError as e:
+                logger.warning("Failed to unregister the node: %s", e)
+        await super().close_async(drain_timeout)
+        for service in self.process_services.values():
+            service.stop_workers()
+        if self.announce_socket is not None:
+            self.announce_socket.close()
+
+    def ping_cbs(self, request: bytes) -> bytes:
+        return LanComMsg.SUCCESS.value.encode()
+
     def node_info_cbs(self, request: bytes) -> bytes:
         return cast(bytes, msgpack.dumps(self.local_info))
+
+    async def snapshot_cbs(self, request: bytes) -> bytes:
+        # runs on the loop thread, where the latched messages are appended
+        messages = self.latched_messages.get(request.decode(), [])
+        return cast(bytes, msgpack.dumps(list(messages)))
+
+    async def retransmit_cbs(self, request: bytes) -> bytes:
+        # runs on the loop thread, where the retransmit ring is appended
+        pub_id, first, last = request.decode().rsplit(":", 2)
+        publisher = self.runtime.local_publishers.get(pub_id)
+        if publisher is None or publisher.node is not self:
+            raise ValueError(f"Publisher {pub_id} is not found")
+        messages = publisher.retransmit(int(first), int(last))
+        return cast(bytes, msgpack.dumps([publisher.seq, messages]))
+
+    async def throttle_cbs(self, request: bytes) -> bytes:
+        # runs on the loop thread, where the publishers send
+        pub_id, throttle = request.decode().split("|")
+        publisher = self.runtime.local_publishers.get(pub_id)
+        if publisher is None or publisher.node is not self:
+            raise ValueError(f"Publisher {pub_id} is not found")
+        publisher.add_throttle(Throttle.from_string(throttle))
+        return LanComMsg.SUCCESS.value.encode()
+
+    async def profile_cbs(self, request: bytes) -> bytes:
+        # sampled from the default executor of the loop, the workers of
+        # the services may all be busy
+        duration = min(float(request.decode()), MAX_PROFILE_DURATION)
+        loop = asyncio.get_running_loop()
+        profile = await loop.run_in_executor(
+            None, SamplingProfiler().run, duration
+        )
+        profile["callbacks"] = self.runtime.timings.snapshot()
+        profile["loop"] = self.runtime.lag_monitor.to_dict()
+        return cast(bytes, msgpack.dumps(profile))
+
+    async def request_profile(
+        self, ip: IPAddress, port: int, duration: float = 1.0
+    ) -> Dict:
+        """Profiles the process of the node at `ip`:`port`.
+
+        The stacks of its threads are sampled for `duration` seconds, at
+        most `MAX_PROFILE_DURATION`, and returned as a dictionary with
+        the "samples", the most frequent "stacks" and their count, the
+        "callbacks" timings as [calls, total, max] seconds and the lag of
+        the "loop".
+        """
+        response = await send_bytes_request(
+            f"tcp://{ip}:{port}",
+            NodeReqType.PROFILE.value,
+            str(duration).encode(),
+            timeout=min(duration, MAX_PROFILE_DURATION) + 1.0,
+        )
+        return msgpack.loads(response)
@@ -1,29 +1,199 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+import threading
 import time
-import traceback
+import uuid
 from asyncio import sleep as async_sleep
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from ipaddress import ip_address, ip_network
+from itertools import islice
 from json import dumps
-from typing import Callable, Dict, Optional, TypeVar, cast
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
+import msgpack
 import zmq
 import zmq.asyncio
 
+from ..errors import (
+    DeadlineExceededError,
+    LanComError,
+    ReceiveTimeoutError,
+    RequestTimeoutError,
+    ServiceError,
+)
 from ..lancom_type import (
     AsyncSocket,
     ComponentType,
     HashIdentifier,
+    IPAddress,
+    LanComMsg,
+    NodeReqType,
+    PublisherInfo,
+    ServiceInfo,
     SocketInfo,
     SocketTypeEnum,
 )
+from ..utils import netem
+from ..utils.cache import create_cache_key
 from ..utils.log import logger
 from ..utils.msg import (
+    BATCH_FLAG,
+    LATCHED_FLAG,
+    RELIABLE_FLAG,
     create_hash_identifier,
     get_socket_port,
-    send_bytes_request,
+    pack_message_header,
+    split_envelope,
+    unpack_deadline,
+    unpack_message_header,
 )
+from ..utils.name_filter import service_key, topic_key
+from ..utils.qos import QoS, configure_socket
+from ..utils.throttle import (
+    SendSchedule,
+    Throttle,
+    ThrottleMode,
+    is_throttled_topic,
+)
+from ..utils.topic_index import TopicPattern
 from .lancom_node import LanComNode
+from .load_balancer import BalanceStrategy, ServiceBalancer
+
+# (topic, message, encoder) handed over between the nodes of a process,
+# the encoder is None when the message is already encoded
+LocalMessage = Tuple[str, Any, Optional[Callable[[Any], bytes]]]
+# an asyncio.Queue of LocalMessage
+LocalInbox = asyncio.Queue
+# as many messages as the default zmq high water mark
+LOCAL_INBOX_SIZE = 1000
+# the longest time a batched message waits for the others
+BATCH_INTERVAL = 0.005
+# messages a subscriber without a callback keeps for its consumer
+BUFFER_SIZE = 100
+
+
+class DeliveryStats:
+    """Counters of a reliable topic.
+
+    A publisher counts the messages it retransmitted, a subscriber the
+    NACKs it sent, the messages they recovered and the lost ones.
+    """
+
+    def __init__(self) -> None:
+        self.retransmitted = 0
+        self.nacks = 0
+        self.recovered = 0
+        self.lost = 0
+
+
+class MessageBuffer:
+    """Messages of a subscriber waiting to be pulled by the application.
+
+    It is filled on the loop thread and read from any thread or event
+    loop, the oldest messages are dropped when it is full. The latest
+    message is also kept in a slot of its own, read without the lock.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.messages: Deque[Any] = deque(maxlen=size)
+        self.latest: Optional[Any] = None
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        # futures of the coroutines waiting for a message, on their loops
+        self.waiters: List[
+            Tuple[asyncio.AbstractEventLoop, asyncio.Future]
+        ] = []
+
+    def put(self, msg: Any) -> None:
+        self.latest = msg
+        with self.condition:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append(msg)
+            self.condition.notify()
+            waiters, self.waiters = self.waiters, []
+        self.wake(waiters)
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.messages or self.closed, timeout
+            ):
+                raise ReceiveTimeoutError(
+                    f"No message was received in {timeout} s"
+                )
+            if not self.messages:
+                raise LanComError("The subscriber has been shut down")
+            return self.messages.popleft()
+
+    async def get_async(self) -> Any:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self.messages:
+                    return self.messages.popleft()
+                if self.closed:
+                    raise StopAsyncIteration
+                future = loop.create_future()
+                self.waiters.append((loop, future))
+            await future
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, []
+        self.wake(waiters)
+
+    @staticmethod
+    def wake(waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, future in waiters:
+            if loop is running:
+                set_done(future)
+            else:
+                # a consumer on another thread
+                loop.call_soon_threadsafe(set_done, future)
+
+
+def set_done(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def relay_serves(pub_info: PublisherInfo, ip: IPAddress) -> bool:
+    """Whether a relay forwards its publisher into the network of `ip`."""
+    network = ip_network(pub_info["relayNetwork"])
+    return ip_address(ip) in network and (
+        ip_address(pub_info["relayFrom"]) not in network
+    )
+
+
+def put_local_message(inbox: LocalInbox, message: LocalMessage) -> None:
+    if inbox.full():
+        # drop the oldest message like a zmq socket would
+        inbox.get_nowait()
+    inbox.put_nowait(message)
 
 
 class AbstractLanComSocket(abc.ABC):
@@ -32,10 +202,9 @@ class AbstractLanComSocket(abc.ABC):
         name: str,
         component_type: ComponentType,
         with_local_namespace: bool,
+        node: Optional[LanComNode] = None,
     ) -> None:
-        if LanComNode.instance is None:
-            raise ValueError("Lancom Node is not initialized")
-        self.node: LanComNode = LanComNode.instance
+        self.node: LanComNode = LanComNode.get_node(node)
         if with_local_namespace:
             local_name = self.node.local_info["name"]
             self.name = f"{local_name}/{name}"
@@ -66,16 +235,88 @@ class AbstractLanComSocket(abc.ABC):
 
 
 class Publisher(AbstractLanComSocket):
-    def __init__(self, topic_name: str, with_local_namespace: bool = False):
+    def __init__(
+        self,
+        topic_name: str,
+        with_local_namespace: bool = False,
+        latch: int = 0,
+        msg_encoder: Optional[Callable[[Any], bytes]] = None,
+        reliable: int = 0,
+        batch_size: int = 0,
+        batch_interval: float = BATCH_INTERVAL,
+        qos: QoS = QoS.NORMAL,
+        node: Optional[LanComNode] = None,
+    ):
+        """
+        A latched publisher keeps its last `latch` messages, which new
+        subscribers receive right after they connect. `msg_encoder` is
+        used by `publish`, which hands the message object itself to the
+        subscribers running in the same process.
+
+        A reliable publisher keeps its last `reliable` messages in a
+        retransmit ring. The subscribers detect the missed messages by
+        their sequence numbers and NACK them, only the messages which
+        already left the ring are lost.
+
+        With `batch_size`, the messages to the other processes are packed
+        into one frame of about `batch_size` bytes, which is sent at the
+        latest `batch_interval` seconds after its first message.
+
+        The publishers of a `qos` class share a socket of their own, e.g.
+        the control topics do not queue behind the camera frames.
+        """
+        if batch_size > 0 and (latch > 0 or reliable > 0):
+            raise ValueError("Latched and reliable topics are not batched")
         super().__init__(
             topic_name,
             SocketTypeEnum.PUBLISHER.value,
             with_local_namespace,
+            node,
         )
-        self.set_up_socket(self.node.pub_socket)
+        self.set_up_socket(self.node.get_pub_socket(qos))
+        self.qos = qos
+        if qos is not QoS.NORMAL:
+            cast(PublisherInfo, self.info)["qos"] = qos.value
+        self.topic_bytes = self.name.encode()
+        self.latch = latch
+        self.reliable = reliable
+        self.flags = 0
+        self.seq = 0
+        if latch > 0:
+            cast(PublisherInfo, self.info)["latch"] = latch
+            self.flags |= LATCHED_FLAG
+            self.latched: Deque[Tuple[int, bytes]] = deque(maxlen=latch)
+            self.node.latched_messages[self.info["socketID"]] = self.latched
+        if reliable > 0:
+            cast(PublisherInfo, self.info)["reliable"] = reliable
+            self.flags |= RELIABLE_FLAG
+            self.ring: Deque[Tuple[int, bytes]] = deque(maxlen=reliable)
+            self.stats = DeliveryStats()
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        if batch_size > 0:
+            self.batch: List[bytes] = []
+            self.batch_bytes = 0
+            self.flush_task: Optional[Future] = None
+        if self.flags or batch_size > 0:
+            self.socket_id_bytes = uuid.UUID(self.info["socketID"]).bytes
+        self.msg_encoder = msg_encoder
+        # queues of the subscribers in this process
+        self.local_inboxes: List[LocalInbox] = []
+        # the throttle classes requested by the subscribers
+        self.schedules: Dict[Throttle, SendSchedule] = {}
+        self.throttled_inboxes: Dict[Throttle, List[LocalInbox]] = {}
+        self.node.runtime.local_publishers[self.info["socketID"]] = self
         self.node.local_info["publishers"].append(self.info)
-        self.node.local_info["infoID"] += 1
-        self.socket = self.node.pub_socket
+        self.node.refresh_local_info()
+
+    def publish(self, msg: Any) -> None:
+        """Publishes a message object encoded with `msg_encoder`.
+
+        The subscribers in the same process receive the object itself,
+        it must not be modified once published.
+        """
+        self.node.submit_loop_task(self.send_async(msg), True)
 
     def publish_bytes(self, bytes_msg: bytes) -> None:
         # in case the publish too much messages
@@ -88,11 +329,171 @@ class Publisher(AbstractLanComSocket):
         self.publish_string(dumps(data))
 
     def on_shutdown(self) -> None:
-        self.socket.close()
+        if self.batch_size > 0:
+            self.node.submit_loop_task(self.flush_batch())
+        # the socket is shared by the publishers of the node
+        self.node.runtime.local_publishers.pop(self.info["socketID"], None)
+        self.local_inboxes.clear()
+        if self.info in self.node.local_info["publishers"]:
+            self.node.local_info["publishers"].remove(self.info)
+            self.node.refresh_local_info()
+
+    def add_local_inbox(
+        self, inbox: LocalInbox, throttle: Optional[Throttle] = None
+    ) -> None:
+        # called on the loop thread, no message can slip in between
+        for _, msg in self.latched if self.latch > 0 else []:
+            put_local_message(inbox, (self.name, msg, None))
+        if throttle is None:
+            self.local_inboxes.append(inbox)
+            return
+        self.add_throttle(throttle)
+        self.throttled_inboxes.setdefault(throttle, []).append(inbox)
+
+    def remove_local_inbox(self, inbox: LocalInbox) -> None:
+        if inbox in self.local_inboxes:
+            self.local_inboxes.remove(inbox)
+        for inboxes in self.throttled_inboxes.values():
+            if inbox in inboxes:
+                inboxes.remove(inbox)
+        self.drop_throttles()
+
+    def add_throttle(self, throttle: Throttle) -> None:
+        """Starts sending the topic of a throttle class, on the loop."""
+        if throttle not in self.schedules:
+            self.schedules[throttle] = SendSchedule(throttle, self.name)
+
+    def drop_throttles(self) -> None:
+        """Stops the throttle classes nobody receives any more, on the loop."""
+        for throttle, schedule in list(self.schedules.items()):
+            if self.throttled_inboxes.get(throttle):
+                continue
+            if self.node.has_subscriber(schedule.topic_bytes):
+                continue
+            if schedule.flush is not None:
+                schedule.flush.cancel()
+            del self.schedules[throttle]
+            self.throttled_inboxes.pop(throttle, None)
+
+    async def send_async(self, msg: Any) -> None:
+        if self.msg_encoder is None:
+            raise ValueError(f"Publisher {self.name} has no message encoder")
+        await self.send_local((self.name, msg, self.msg_encoder))
+        # only encode when somebody outside of the process listens, the
+        # sequenced messages are kept for the subscribers to come
+        if self.flags or self.node.has_subscriber(self.topic_bytes):
+            await self.send_remote(self.msg_encoder(msg))
+        if self.schedules:
+            await self.send_throttled((self.name, msg, self.msg_encoder))
 
     async def send_bytes_async(self, bytes_msg: bytes) -> None:
-        # await self.socket.send(msg)
-        await self.socket.send_multipart([self.name.encode(), bytes_msg])
+        if not isinstance(bytes_msg, bytes):
+            # the local subscribers and the latched messages keep it, not
+            # a view into a buffer of the caller, e.g. a memory map
+            bytes_msg = bytes(bytes_msg)
+        await self.send_local((self.name, bytes_msg, None))
+        await self.send_remote(bytes_msg)
+        if self.schedules:
+            await self.send_throttled((self.name, bytes_msg, None))
+
+    async def send_throttled(self, message: LocalMessage) -> None:
+        now = time.monotonic()
+        for schedule in self.schedules.values():
+            if schedule.throttle.mode is not ThrottleMode.LATEST:
+                if schedule.accept(now):
+                    await self.send_schedule(schedule, message)
+            elif schedule.flush is None:
+                schedule.latest = message
+                delay = max(schedule.next_time - now, 0.0)
+                schedule.flush = self.node.submit_loop_task(
+                    self.flush_latest(schedule, delay)
+                )
+            else:
+                schedule.latest = message
+
+    async def flush_latest(self, schedule: SendSchedule, delay: float) -> None:
+        if delay > 0:
+            await async_sleep(delay)
+        schedule.flush = None
+        message, schedule.latest = schedule.latest, None
+        schedule.next_time = time.monotonic() + schedule.interval
+        if message is not None:
+            await self.send_schedule(schedule, message)
+
+    async def send_schedule(
+        self, schedule: SendSchedule, message: LocalMessage
+    ) -> None:
+        for inbox in self.throttled_inboxes.get(schedule.throttle, []):
+            put_local_message(inbox, message)
+        if self.node.has_subscriber(schedule.topic_bytes):
+            _, msg, encoder = message
+            bytes_msg = msg if encoder is None else encoder(msg)
+            await self.socket.send_multipart([schedule.topic_bytes, bytes_msg])
+
+    async def send_local(self, message: LocalMessage) -> None:
+        if self.reliable == 0:
+            for inbox in self.local_inboxes:
+                put_local_message(inbox, message)
+            return
+        # wait for the slow subscribers instead of dropping messages
+        for inbox in self.local_inboxes:
+            await inbox.put(message)
+
+    async def send_remote(self, bytes_msg: bytes) -> None:
+        if self.batch_size > 0:
+            await self.send_batched(bytes_msg)
+            return
+        if not self.flags:
+            await self.socket.send_multipart([self.topic_bytes, bytes_msg])
+            return
+        self.seq += 1
+        if self.latch > 0:
+            self.latched.append((self.seq, bytes_msg))
+        if self.reliable > 0:
+            self.ring.append((self.seq, bytes_msg))
+        header = pack_message_header(
+            self.flags, self.socket_id_bytes, self.seq
+        )
+        await self.socket.send_multipart([self.topic_bytes, bytes_msg, header])
+
+    async def send_batched(self, bytes_msg: bytes) -> None:
+        self.batch.append(bytes_msg)
+        self.batch_bytes += len(bytes_msg)
+        if self.batch_bytes >= self.batch_size:
+            if self.flush_task is not None:
+                self.flush_task.cancel()
+                self.flush_task = None
+            await self.flush_batch()
+        elif self.flush_task is None:
+            self.flush_task = self.node.submit_loop_task(self.flush_later())
+
+    async def flush_later(self) -> None:
+        await async_sleep(self.batch_interval)
+        self.flush_task = None
+        await self.flush_batch()
+
+    async def flush_batch(self) -> None:
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        self.batch_bytes = 0
+        self.seq += 1
+        header = pack_message_header(
+            BATCH_FLAG, self.socket_id_bytes, self.seq
+        )
+        await self.socket.send_multipart(
+            [self.topic_bytes, msgpack.dumps(batch), header]
+        )
+
+    def retransmit(self, first: int, last: int) -> List[Tuple[int, bytes]]:
+        """Returns the messages from `first` to `last` still in the ring."""
+        if not self.ring:
+            return []
+        start = max(first - self.ring[0][0], 0)
+        stop = max(last - self.ring[0][0] + 1, start)
+        messages = list(islice(self.ring, start, stop))
+        self.stats.retransmitted += len(messages)
+        return messages
 
 
 MessageT = TypeVar("MessageT", bytes, str, dict)
@@ -106,11 +507,14 @@ class Streamer(Publisher):
         fps: int,
         msg_encoder: Callable[[MessageT], bytes],
         start_streaming: bool = False,
+        node: Optional[LanComNode] = None,
     ):
-        super().__init__(topic_name)
+        super().__init__(topic_name, node=node)
         self.running = False
         self.dt: float = 1 / fps
-        self.update_func = update_func
+        self.update_func = self.node.runtime.timings.wrap(
+            f"streamer:{self.name}", update_func
+        )
         self.topic_byte = self.name.encode("utf-8")
         self.msg_encoder = msg_encoder
         if start_streaming:
@@ -138,7 +542,7 @@ class Streamer(Publisher):
     async def update_loop(self) -> None:
         self.running = True
         last = 0.0
-        logger.info(f"Topic {self.name} starts streaming")
+        logger.info("Topic %s starts streaming", self.name)
         while self.running:
             try:
                 diff = time.monotonic() - last
@@ -147,108 +551,774 @@ class Streamer(Publisher):
                 last = time.monotonic()
                 await self.send_bytes_async(self.generate_byte_msg())
             except Exception as e:
-                logger.error(f"Error when streaming {self.name}: {e}")
-                traceback.print_exc()
-        logger.info(f"Streamer for topic {self.name} is stopped")
+                logger.error(
+                    "Error when streaming %s: %s", self.name, e, exc_info=True
+                )
+        logger.info("Streamer for topic %s is stopped", self.name)
+
 
+class AbstractSubscriber(AbstractLanComSocket):
+    """Receives the messages of the publishers in the same process.
+
+    They are handed over through a queue instead of a zmq socket. With
+    `local_objects` the published objects are passed as they are,
+    otherwise they are encoded and decoded like remote messages.
+    """
 
-class Subscriber(AbstractLanComSocket):
     def __init__(
         self,
         topic_name: str,
         msg_decoder: Callable[[bytes], MessageT],
-        callback: Callable[[MessageT], None],
-    ):
-        super().__init__(topic_name, SocketTypeEnum.SUBSCRIBER.value, False)
-        self.socket = self.node.create_socket(zmq.SUB)
-        self.socket.setsockopt(zmq.SUBSCRIBE, self.name.encode())
+        local_objects: bool,
+        node: Optional[LanComNode],
+        busy_poll: bool = False,
+    ) -> None:
+        super().__init__(
+            topic_name, SocketTypeEnum.SUBSCRIBER.value, False, node
+        )
+        self.busy_poll = busy_poll
+        self.socket: Any
+        if busy_poll:
+            self.socket = self.node.create_busy_socket(zmq.SUB)
+        else:
+            self.socket = self.node.create_socket(zmq.SUB)
         self.subscribed_components: Dict[HashIdentifier, SocketInfo] = {}
         self.msg_decoder = msg_decoder
+        self.local_objects = local_objects
+        self.local_publishers: List[Publisher] = []
+        self.inbox: Optional[LocalInbox] = None
+        self.throttle: Optional[Throttle] = None
+
+    def connect_local(self, publisher: Publisher) -> None:
+        if self.inbox is None:
+            self.inbox = LocalInbox(LOCAL_INBOX_SIZE)
+            self.local_task = self.node.submit_loop_task(
+                self.local_loop(self.inbox)
+            )
+        publisher.add_local_inbox(self.inbox, self.throttle)
+        self.local_publishers.append(publisher)
+        self.subscribed_components[publisher.info["socketID"]] = publisher.info
+        logger.info(
+            "Subscriber %s is connected to %s in this process",
+            self.name,
+            publisher.name,
+        )
+
+    async def local_loop(self, inbox: LocalInbox) -> None:
+        while self.running:
+            topic, msg, encoder = await inbox.get()
+            try:
+                if encoder is None:
+                    msg = self.msg_decoder(msg)
+                elif not self.local_objects:
+                    msg = self.msg_decoder(encoder(msg))
+                self.deliver(topic, msg)
+            except Exception as e:
+                logger.error(
+                    "Error from topic '%s' subscriber: %s",
+                    self.name,
+                    e,
+                    exc_info=True,
+                )
+
+    @abc.abstractmethod
+    def deliver(self, topic: str, msg: Any) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def handle_frames(self, frames: List[bytes]) -> None:
+        raise NotImplementedError
+
+    def connect_socket(self, addr: str) -> None:
+        if self.busy_poll:
+            # the busy polled socket is only used on the poller thread
+            poller = self.node.runtime.get_busy_poller()
+            poller.call(partial(self.socket.connect, addr))
+        else:
+            self.socket.connect(addr)
+
+    def disconnect_socket(self, addr: str) -> None:
+        if self.busy_poll:
+            poller = self.node.runtime.get_busy_poller()
+            poller.call(partial(self.socket.disconnect, addr))
+        else:
+            self.socket.disconnect(addr)
+
+    def close_socket(self) -> None:
+        if self.busy_poll:
+            self.node.runtime.get_busy_poller().unregister(self.socket)
+        else:
+            self.socket.close()
+
+    def receive_frames(self, frames: List[bytes]) -> None:
+        emulator = netem.active
+        if emulator is None:
+            self.handle_frames(frames)
+            return
+        size = sum(len(frame) for frame in frames)
+        emulator.deliver(self.remote_ip(), size, self.handle_frames, frames)
+
+    def remote_ip(self) -> Optional[str]:
+        """The address of the remote publishers, when they share one."""
+        local_ids = {p.info["socketID"] for p in self.local_publishers}
+        ips = {
+            info["ip"]
+            for socket_id, info in self.subscribed_components.items()
+            if socket_id not in local_ids
+        }
+        return ips.pop() if len(ips) == 1 else None
+
+    async def close_local(self) -> None:
+        for publisher in self.local_publishers:
+            if self.inbox is not None:
+                publisher.remove_local_inbox(self.inbox)
+        self.local_publishers.clear()
+        if self.inbox is not None:
+            self.local_task.cancel()
+
+
+class Subscriber(AbstractSubscriber):
+    def __init__(
+        self,
+        topic_name: str,
+        msg_decoder: Callable[[bytes], MessageT],
+        callback: Optional[Callable[[MessageT], None]] = None,
+        local_objects: bool = True,
+        batch_callback: Optional[Callable[[List[MessageT]], None]] = None,
+        throttle: Optional[Throttle] = None,
+        buffer_size: int = BUFFER_SIZE,
+        busy_poll: bool = False,
+        qos: QoS = QoS.NORMAL,
+        node: Optional[LanComNode] = None,
+    ):
+        """
+        The batches of a batching publisher are delivered to the callback
+        message by message, or as a whole to `batch_callback`.
+
+        With a `throttle`, e.g. `Throttle.max_rate(2.0)`, the publishers
+        only send the selected messages to this subscriber.
+
+        Without a callback, the last `buffer_size` messages are buffered
+        for `recv()`, `latest()` and `async for msg in subscriber`.
+
+        With `busy_poll`, the socket is polled by the `BusyPoller` thread
+        and the callback runs there, for the lowest latency. The messages
+        of latched and reliable publishers are still ordered on the loop.
+
+        The `qos` class sets the queue size and the type of service of
+        the socket of the subscriber.
+        """
+        super().__init__(
+            topic_name, msg_decoder, local_objects, node, busy_poll
+        )
+        self.qos = qos
+        configure_socket(self.socket, qos)
+        self.throttle = throttle
+        if throttle is None:
+            self.topic_bytes = self.name.encode()
+        else:
+            self.topic_bytes = throttle.topic(self.name).encode()
+        timings = self.node.runtime.timings
+        if batch_callback is not None:
+            batch_callback = timings.wrap(
+                f"subscriber:{self.name}", batch_callback
+            )
+        self.batch_callback = batch_callback
+        self.socket.setsockopt(zmq.SUBSCRIBE, self.topic_bytes)
         self.connected = False
+        self.buffer: Optional[MessageBuffer] = None
+        if callback is None:
+            self.buffer = MessageBuffer(buffer_size)
+            callback = self.buffer.put
+        else:
+            callback = timings.wrap(f"subscriber:{self.name}", callback)
         self.callback = callback
+        # last delivered sequence number of every latched publisher
+        self.last_seq: Dict[bytes, int] = {}
+        # live messages received while a snapshot or a NACK is pending
+        self.pending: Dict[bytes, List[Tuple[int, bytes]]] = {}
+        self.reliable_publishers: Set[bytes] = set()
+        # the nearest publisher or relay of every publisher of the topic
+        self.routes: Dict[HashIdentifier, PublisherInfo] = {}
+        self.stats = DeliveryStats()
         self.running = True
-        self.node.submit_loop_task(self.listen_loop(), False)
-        self.node.submit_loop_task(self.receive_loop(), False)
+        self.node.submit_loop_task(self.watch(), False)
+        if busy_poll:
+            poller = self.node.runtime.get_busy_poller()
+            poller.register(self.socket, self.poll_frames)
+        else:
+            self.node.submit_loop_task(self.receive_loop(), False)
 
     async def receive_loop(self) -> None:
         """Listens for incoming messages on the subscribed topic."""
-        logger.info(f"Subscriber {self.name} is subscribing ...")
+        logger.info("Subscriber %s is subscribing ...", self.name)
         while self.running:
             try:
                 # Wait for a message
-                _, msg = await self.socket.recv_multipart()
+                frames = await self.socket.recv_multipart()
+            except Exception as e:
+                logger.error(
+                    "Error from topic '%s' subscriber: %s",
+                    self.name,
+                    e,
+                    exc_info=True,
+                )
+                continue
+            self.receive_frames(frames)
+
+    def poll_frames(self, zmq_socket: zmq.Socket) -> None:
+        """Receives a message on the busy poll thread."""
+        frames = zmq_socket.recv_multipart(zmq.NOBLOCK)
+        if netem.active is None and (
+            len(frames) == 2 or frames[2][0] & BATCH_FLAG
+        ):
+            self.handle_frames(frames)
+            return
+        # the sequence numbers are tracked on the loop
+        self.node.loop.call_soon_threadsafe(self.receive_frames, frames)
+
+    def handle_frames(self, frames: List[bytes]) -> None:
+        try:
+            # zmq filters by prefix, "cam" also receives "camera"
+            if frames[0] != self.topic_bytes:
+                return
+            if len(frames) == 2:
                 # Invoke the callback
-                self.callback(self.msg_decoder(msg))
+                self.callback(self.msg_decoder(frames[1]))
+            elif frames[2][0] & BATCH_FLAG:
+                self.receive_batch(frames[1])
+            else:
+                self.receive_sequenced(frames[1], frames[2])
+        except Exception as e:
+            logger.error(
+                "Error from topic '%s' subscriber: %s",
+                self.name,
+                e,
+                exc_info=True,
+            )
+
+    def receive_batch(self, batch: bytes) -> None:
+        messages = [self.msg_decoder(msg) for msg in msgpack.loads(batch)]
+        if self.batch_callback is not None:
+            self.batch_callback(messages)
+            return
+        for msg in messages:
+            self.callback(msg)
+
+    def receive_sequenced(self, msg: bytes, header: bytes) -> None:
+        _, socket_id, seq = unpack_message_header(header)
+        if socket_id in self.pending:
+            self.pending[socket_id].append((seq, msg))
+            return
+        reliable = socket_id in self.reliable_publishers
+        # without a recovered start, a reliable topic starts from here
+        last_seq = self.last_seq.get(socket_id, seq - 1 if reliable else 0)
+        if seq <= last_seq:
+            return
+        if seq > last_seq + 1:
+            self.pending[socket_id] = [(seq, msg)]
+            if reliable:
+                # missed messages, NACK them from the retransmit ring
+                self.node.submit_loop_task(self.recover(socket_id))
+            else:
+                # joined late or missed messages, catch up from the latch
+                self.node.submit_loop_task(self.fetch_snapshot(socket_id))
+            return
+        self.last_seq[socket_id] = seq
+        self.callback(self.msg_decoder(msg))
+
+    def get_publisher_addr(self, socket_id: bytes) -> Tuple[str, str, int]:
+        pub_id = str(uuid.UUID(bytes=socket_id))
+        # connected through a relay, the publisher is asked directly
+        pub_info = self.subscribed_components.get(pub_id)
+        if pub_info is None:
+            pub_info = self.node.nodes_map.publishers_dict[pub_id]
+        node_info = self.node.nodes_map.nodes_info[pub_info["nodeID"]]
+        return pub_id, node_info["ip"], node_info["port"]
+
+    async def fetch_snapshot(self, socket_id: bytes) -> None:
+        """Delivers the latched messages of a publisher.
+
+        The live messages buffered in the meantime are merged in and the
+        duplicates are skipped by their sequence number.
+        """
+        snapshot: List[Tuple[int, bytes]] = []
+        try:
+            pub_id, ip, port = self.get_publisher_addr(socket_id)
+            response = await self.node.send_request(
+                NodeReqType.SNAPSHOT.value, ip, port, pub_id
+            )
+            snapshot = [(seq, msg) for seq, msg in msgpack.loads(response)]
+        except Exception as e:
+            logger.warning(
+                "Failed to fetch the snapshot of %s: %s", self.name, e
+            )
+        if socket_id not in self.last_seq:
+            # the subscription starts with the oldest message received
+            seqs = [seq for seq, _ in snapshot + self.pending[socket_id]]
+            if seqs:
+                self.last_seq[socket_id] = min(seqs) - 1
+        if socket_id not in self.reliable_publishers:
+            self.deliver_pending(socket_id, snapshot, float("inf"))
+            return
+        # the latest messages are latched, NACK the ones missed after
+        last = max((seq for seq, _ in snapshot), default=0)
+        if not self.deliver_pending(socket_id, snapshot, last):
+            await self.recover(socket_id)
+
+    async def recover(self, socket_id: bytes) -> None:
+        """NACKs the messages missing before the pending ones.
+
+        Repeats until the pending messages are delivered in order. Before
+        the first message, only the current sequence number of the
+        publisher is fetched, the subscription starts from there.
+        """
+        while socket_id in self.pending and self.running:
+            pending = self.pending[socket_id]
+            last_seq = self.last_seq.get(socket_id)
+            if last_seq is None:
+                first, last = 1, 0
+            else:
+                first, last = last_seq + 1, max(pending)[0] - 1
+                fresh = {seq for seq, _ in pending if seq > last_seq}
+                if len(fresh) == last + 1 - last_seq:
+                    # nothing is missing anymore
+                    self.deliver_pending(socket_id, [], last)
+                    continue
+            current: Optional[int] = None
+            recovered: List[Tuple[int, bytes]] = []
+            try:
+                pub_id, ip, port = self.get_publisher_addr(socket_id)
+                self.stats.nacks += 1
+                response = await self.node.send_request(
+                    NodeReqType.RETRANSMIT.value,
+                    ip,
+                    port,
+                    f"{pub_id}:{first}:{last}",
+                )
+                current, messages = msgpack.loads(response)
+                recovered = [(seq, msg) for seq, msg in messages]
             except Exception as e:
-                logger.error(f"Error from topic '{self.name}' subscriber: {e}")
-                traceback.print_exc()
+                logger.warning(
+                    "Failed to recover the messages of %s: %s", self.name, e
+                )
+            if last_seq is None:
+                # also keep the messages received before the response
+                pending = self.pending[socket_id]
+                if pending:
+                    start = min(pending)[0] - 1
+                    current = start if current is None else min(current, start)
+                if current is None:
+                    self.pending.pop(socket_id)
+                    return
+                self.last_seq[socket_id] = current
+                last = current
+            self.stats.recovered += len(recovered)
+            self.deliver_pending(socket_id, recovered, last)
 
-    async def listen_loop(self) -> None:
-        """Listens for new publishers and connects to them."""
-        logger.info(f"Subscriber {self.name} is listening ...")
-        while self.running:
+    def deliver_pending(
+        self,
+        socket_id: bytes,
+        fetched: List[Tuple[int, bytes]],
+        lost_until: float,
+    ) -> bool:
+        """Delivers the fetched and the pending messages in order.
+
+        The messages missing up to `lost_until` could not be fetched and
+        are lost. A gap after it stays pending, returns whether none did.
+        """
+        messages = dict(fetched)
+        messages.update(self.pending.pop(socket_id, []))
+        seqs = sorted(messages)
+        for i, seq in enumerate(seqs):
+            last_seq = self.last_seq.get(socket_id, 0)
+            if seq <= last_seq:
+                continue
+            if seq - 1 > lost_until:
+                # missed after the request was sent, fetch them again
+                self.count_lost(max(int(lost_until) - last_seq, 0))
+                self.last_seq[socket_id] = max(last_seq, int(lost_until))
+                self.pending[socket_id] = [(s, messages[s]) for s in seqs[i:]]
+                return False
+            self.count_lost(seq - last_seq - 1)
+            self.last_seq[socket_id] = seq
             try:
-                publishers = self.node.nodes_map.get_publisher_info(self.name)
-                # print(f"Publishers: {publishers}")
-                for pub_info in publishers:
-                    if pub_info["socketID"] not in self.subscribed_components:
-                        self.connect(pub_info)
-                await async_sleep(0.5)
+                self.callback(self.msg_decoder(messages[seq]))
             except Exception as e:
-                logger.error(f"Error from topic '{self.name}' listener: {e}")
-                traceback.print_exc()
+                logger.error(
+                    "Error from topic '%s' subscriber: %s",
+                    self.name,
+                    e,
+                    exc_info=True,
+                )
+        return True
+
+    def count_lost(self, lost: int) -> None:
+        if lost > 0:
+            self.stats.lost += lost
+            logger.warning("Topic %s lost %s messages", self.name, lost)
+
+    async def request_throttle(self, pub_info: SocketInfo) -> None:
+        """Asks the node of the publisher to send the throttled topic."""
+        throttle = cast(Throttle, self.throttle)
+        try:
+            node_info = self.node.nodes_map.nodes_info[pub_info["nodeID"]]
+            await self.node.send_request(
+                NodeReqType.THROTTLE.value,
+                node_info["ip"],
+                node_info["port"],
+                f"{pub_info['socketID']}|{throttle.to_string()}",
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to throttle %s from %s: %s",
+                self.name,
+                pub_info["name"],
+                e,
+            )
+
+    async def watch(self) -> None:
+        # runs on the loop thread, where the nodes map is updated
+        self.node.nodes_map.watch_topic(self.name, self.connect)
+        await self.node.fetch_deferred(topic_key(self.name))
+
+    async def unwatch(self) -> None:
+        self.node.nodes_map.unwatch_topic(self.name, self.connect)
+
+    def deliver(self, topic: str, msg: Any) -> None:
+        self.callback(msg)
+
+    def get_buffer(self) -> MessageBuffer:
+        if self.buffer is None:
+            raise ValueError(
+                f"Subscriber {self.name} has a callback, it buffers nothing"
+            )
+        return self.buffer
+
+    def recv(self, timeout: Optional[float] = None) -> MessageT:
+        """Pops the oldest buffered message, waiting for one if needed.
+
+        Raises:
+            ReceiveTimeoutError: No message arrived within `timeout`.
+        """
+        return self.get_buffer().get(timeout)
+
+    def latest(self) -> Optional[MessageT]:
+        """The latest message, None before the first one."""
+        return self.get_buffer().latest
+
+    def __aiter__(self) -> Subscriber:
+        self.get_buffer()
+        return self
+
+    async def __anext__(self) -> MessageT:
+        return await self.get_buffer().get_async()
 
     def connect(self, pub_info: SocketInfo) -> None:
-        self.socket.connect(f"tcp://{pub_info['ip']}:{pub_info['port']}")
-        self.subscribed_components[pub_info["socketID"]] = pub_info
+        if pub_info["socketID"] in self.subscribed_components:
+            return
+        pub_info = cast(PublisherInfo, pub_info)
+        # the publisher itself or one of the relays forwarding it
+        origin_id = pub_info.get("relayOf", pub_info["socketID"])
+        rank = self.route_rank(pub_info)
+        route = self.routes.get(origin_id)
+        if rank is None or (
+            route is not None and self.route_rank(route) <= rank
+        ):
+            return
+        if route is not None:
+            self.disconnect_route(route)
+        self.routes[origin_id] = pub_info
         self.connected = True
+        local = self.node.runtime.local_publishers.get(pub_info["socketID"])
+        if local is not None:
+            self.connect_local(local)
+            return
+        self.connect_socket(f"tcp://{pub_info['ip']}:{pub_info['port']}")
+        self.subscribed_components[pub_info["socketID"]] = pub_info
+        logger.info(
+            "Subscriber %s is connected to %s from %s:%s",
+            self.name,
+            pub_info["name"],
+            pub_info["ip"],
+            pub_info["port"],
+        )
+        if self.throttle is not None:
+            self.node.submit_loop_task(self.request_throttle(pub_info))
+            return
+        # the relays forward the sequence numbers of the publisher
+        socket_id = uuid.UUID(origin_id).bytes
+        if socket_id in self.last_seq:
+            return
+        if pub_info.get("reliable", 0) > 0:
+            self.reliable_publishers.add(socket_id)
+        if pub_info.get("latch", 0) > 0:
+            self.pending[socket_id] = []
+            self.node.submit_loop_task(self.fetch_snapshot(socket_id))
+        elif pub_info.get("reliable", 0) > 0:
+            self.pending[socket_id] = []
+            self.node.submit_loop_task(self.recover(socket_id))
+
+    def route_rank(self, pub_info: PublisherInfo) -> Optional[int]:
+        """The lower the nearer, None for a relay not serving this node.
+
+        The publishers in this process come first, then the relays into
+        the network of this node and then the publishers themselves.
+        """
+        if pub_info["socketID"] in self.node.runtime.local_publishers:
+            return 0
+        if "relayOf" not in pub_info:
+            return 2
+        # the throttles are requested from the publishers themselves
+        if self.throttle is None and relay_serves(pub_info, self.node.node_ip):
+            return 1
+        return None
+
+    def disconnect_route(self, pub_info: PublisherInfo) -> None:
+        self.subscribed_components.pop(pub_info["socketID"], None)
+        addr = f"tcp://{pub_info['ip']}:{pub_info['port']}"
+        # the publishers of a node share its socket
+        if not any(
+            f"tcp://{info['ip']}:{info['port']}" == addr
+            for info in self.subscribed_components.values()
+        ):
+            self.disconnect_socket(addr)
+        logger.info("Subscriber %s is disconnected from %s", self.name, addr)
+
+    def on_shutdown(self) -> None:
+        self.running = False
+        self.node.submit_loop_task(self.unwatch(), False)
+        self.node.submit_loop_task(self.close_local())
+        self.close_socket()
+        if self.buffer is not None:
+            self.buffer.close()
+
+
+class PatternSubscriber(AbstractSubscriber):
+    """Subscribes to every topic matching a glob pattern.
+
+    The pattern is matched against the topic index of the discovered
+    nodes (see `TopicPattern` for the syntax) and the callback receives
+    the actual topic name along with the message.
+    """
+
+    def __init__(
+        self,
+        topic_pattern: str,
+        msg_decoder: Callable[[bytes], MessageT],
+        callback: Callable[[str, MessageT], None],
+        local_objects: bool = True,
+        node: Optional[LanComNode] = None,
+    ):
+        super().__init__(topic_pattern, msg_decoder, local_objects, node)
+        self.pattern = TopicPattern(self.name)
+        self.socket.setsockopt(zmq.SUBSCRIBE, self.pattern.prefix.encode())
+        # publishers of a node share one socket, connect to it only once
+        self.connected_addrs: Set[str] = set()
+        # matching result of every topic received so far
+        self.topic_matches: Dict[bytes, Optional[str]] = {}
+        self.callback = self.node.runtime.timings.wrap(
+            f"subscriber:{self.name}", callback
+        )
+        self.running = True
+        self.node.submit_loop_task(self.watch(), False)
+        self.node.submit_loop_task(self.receive_loop(), False)
+
+    async def watch(self) -> None:
+        # runs on the loop thread, where the nodes map is updated
+        self.node.nodes_map.watch_publishers(self.pattern, self.connect)
+        await self.node.fetch_deferred()
+
+    def deliver(self, topic: str, msg: Any) -> None:
+        self.callback(topic, msg)
+
+    def connect(self, pub_info: SocketInfo) -> None:
+        if pub_info["socketID"] in self.subscribed_components:
+            return
+        # the relayed copies of the topics would arrive twice
+        if "relayOf" in pub_info:
+            return
+        local = self.node.runtime.local_publishers.get(pub_info["socketID"])
+        if local is not None:
+            self.connect_local(local)
+            return
+        self.subscribed_components[pub_info["socketID"]] = pub_info
+        addr = f"tcp://{pub_info['ip']}:{pub_info['port']}"
+        if addr in self.connected_addrs:
+            return
+        self.socket.connect(addr)
+        self.connected_addrs.add(addr)
         logger.info(
-            f"Subscriber {self.name} is connected to {pub_info['name']}"
-            f" from {pub_info['ip']}:{pub_info['port']}"
+            "Subscriber %s is connected to %s from %s:%s",
+            self.name,
+            pub_info["name"],
+            pub_info["ip"],
+            pub_info["port"],
         )
 
+    def match_topic(self, topic_bytes: bytes) -> Optional[str]:
+        if topic_bytes not in self.topic_matches:
+            topic = topic_bytes.decode()
+            # the throttled copies of the topics are not topics of their own
+            matched = not is_throttled_topic(topic)
+            matched = matched and self.pattern.matches(topic)
+            self.topic_matches[topic_bytes] = topic if matched else None
+        return self.topic_matches[topic_bytes]
+
+    async def receive_loop(self) -> None:
+        logger.info("Subscriber %s is subscribing ...", self.name)
+        while self.running:
+            try:
+                frames = await self.socket.recv_multipart()
+            except Exception as e:
+                logger.error(
+                    "Error from topic '%s' subscriber: %s",
+                    self.name,
+                    e,
+                    exc_info=True,
+                )
+                continue
+            self.receive_frames(frames)
+
+    def handle_frames(self, frames: List[bytes]) -> None:
+        try:
+            topic = self.match_topic(frames[0])
+            if topic is None:
+                return
+            if len(frames) > 2 and frames[2][0] & BATCH_FLAG:
+                for msg in msgpack.loads(frames[1]):
+                    self.callback(topic, self.msg_decoder(msg))
+                return
+            self.callback(topic, self.msg_decoder(frames[1]))
+        except Exception as e:
+            logger.error(
+                "Error from topic '%s' subscriber: %s",
+                self.name,
+                e,
+                exc_info=True,
+            )
+
     def on_shutdown(self) -> None:
         self.running = False
+        self.node.submit_loop_task(self.unwatch(), False)
+        self.node.submit_loop_task(self.close_local())
         self.socket.close()
 
+    async def unwatch(self) -> None:
+        self.node.nodes_map.unwatch_publishers(self.connect)
+
 
 RequestT = TypeVar("RequestT", bytes, str, dict)
 ResponseT = TypeVar("ResponseT", bytes, str, dict)
 
 
 class Service(AbstractLanComSocket):
+    # the clients in the same process call the callback directly
+    local_calls = True
+
     def __init__(
         self,
         service_name: str,
         request_decoder: Callable[[bytes], RequestT],
         response_encoder: Callable[[ResponseT], bytes],
         callback: Callable[[RequestT], ResponseT],
+        cache_ttl: Optional[float] = None,
+        cache_version: str = "",
+        busy_poll: bool = False,
+        qos: QoS = QoS.NORMAL,
+        node: Optional[LanComNode] = None,
     ) -> None:
-        super().__init__(service_name, SocketTypeEnum.SERVICE.value, False)
-        self.set_up_socket(self.node.service_socket)
+        """
+        Setting `cache_ttl` declares the service idempotent, clients then
+        cache its responses for that many seconds. Bump `cache_version`
+        whenever previously returned responses become stale.
+
+        With `busy_poll`, the service gets a socket of its own polled by
+        the `BusyPoller` thread, which also runs the callback. The
+        requests are handled one at a time, without the executor.
+
+        The services of a `qos` class share a socket and an executor of
+        their own. Their requests are dispatched before the ones of the
+        lower classes, which wait while higher ones are being handled.
+        """
+        if busy_poll and qos is not QoS.NORMAL:
+            raise ValueError("Busy polled services have a socket of their own")
+        super().__init__(
+            service_name, SocketTypeEnum.SERVICE.value, False, node
+        )
+        self.busy_poll = busy_poll
+        self.qos = qos
+        if busy_poll:
+            busy_socket = self.node.create_busy_socket(zmq.ROUTER)
+            busy_socket.bind(f"tcp://{self.node.node_ip}:0")
+            self.set_up_socket(busy_socket)
+        else:
+            self.set_up_socket(self.node.get_service_socket(qos))
+        if qos is not QoS.NORMAL:
+            cast(ServiceInfo, self.info)["qos"] = qos.value
+        if cache_ttl is not None:
+            service_info = cast(ServiceInfo, self.info)
+            service_info["cacheTTL"] = cache_ttl
+            service_info["cacheVersion"] = cache_version
         # check the service is already registered locally
         for service_info in self.node.local_info["services"]:
             if service_info["name"] != self.name:
                 continue
             raise RuntimeError("Service has been registered locally")
-        if self.node.nodes_map.get_service_info(service_name) is not None:
-            raise RuntimeError("Service has been registered")
-        self.node.local_info["services"].append(self.info)
-        self.node.local_info["infoID"] += 1
-        self.node.service_cbs[self.name] = self.callback
-        self.handle_request = callback
+        # other nodes may provide the same name, they form a replica group
+        self.handle_request = self.node.runtime.timings.wrap(
+            f"service:{self.name}", callback
+        )
         self.request_decoder = request_decoder
         self.response_encoder = response_encoder
-        logger.info(f'"{self.name}" Service is started')
+        if busy_poll:
+            poller = self.node.runtime.get_busy_poller()
+            poller.register(self.socket, self.poll_request)
+        else:
+            self.node.service_cbs[self.name] = self.callback
+        self.node.local_info["services"].append(self.info)
+        self.node.refresh_local_info()
+        if self.local_calls:
+            local_services = self.node.runtime.local_services
+            local_services.setdefault(self.name, []).append(self)
+        logger.info('"%s" Service is started', self.name)
 
     def callback(self, msg: bytes) -> bytes:
         request = self.request_decoder(msg)
         result = self.handle_request(request)
         return self.response_encoder(result)
 
+    def poll_request(self, zmq_socket: zmq.Socket) -> None:
+        """Handles a request on the busy poll thread."""
+        envelope, body = split_envelope(zmq_socket.recv_multipart(zmq.NOBLOCK))
+        status, payload = LanComMsg.SUCCESS, b""
+        if body[0] != self.name.encode():
+            status, payload = LanComMsg.ERROR, b"Not available"
+        elif len(body) > 2 and unpack_deadline(body[2]) <= 0:
+            status = LanComMsg.EXPIRED
+        else:
+            try:
+                payload = self.callback(body[1])
+            except Exception as e:
+                logger.error(
+                    'One error occurred when processing the Service "%s": %s',
+                    self.name,
+                    e,
+                    exc_info=True,
+                )
+                status, payload = LanComMsg.ERROR, str(e).encode()
+        zmq_socket.send_multipart(envelope + [status.value.encode(), payload])
+
     def on_shutdown(self):
         self.node.local_info["services"].remove(self.info)
-        logger.info(f'"{self.name}" Service is stopped')
+        self.node.service_cbs.pop(self.name, None)
+        if self.busy_poll:
+            self.node.runtime.get_busy_poller().unregister(self.socket)
+        self.node.refresh_local_info()
+        local_services = self.node.runtime.local_services.get(self.name, [])
+        if self in local_services:
+            local_services.remove(self)
+        logger.info('"%s" Service is stopped', self.name)
 
 
 class ServiceProxy:
@@ -258,18 +1328,135 @@ class ServiceProxy:
         request_encoder: Callable[[RequestT], bytes],
         response_decoder: Callable[[bytes], ResponseT],
         request: RequestT,
+        strategy: BalanceStrategy = BalanceStrategy.ROUND_ROBIN,
+        timeout: float = 1.0,
+        retries: int = 0,
+        deadline: Optional[float] = None,
+        hedge: bool = False,
+        node: Optional[LanComNode] = None,
     ) -> Optional[ResponseT]:
-        if LanComNode.instance is None:
-            raise ValueError("Lancom Node is not initialized")
-        node = LanComNode.instance
-        service_component = node.nodes_map.get_service_info(service_name)
-        if service_component is None:
-            logger.warning(f"Service {service_name} is not exist")
+        """Sends a request to one of the providers of the service.
+
+        When several nodes provide the service, `strategy` decides which
+        replica is used; timed out requests fail over to the next one.
+        Each attempt waits up to `timeout` seconds, failed rounds are
+        retried `retries` times and the whole call gives up after
+        `deadline` seconds, which is also propagated to the server. See
+        `ServiceBalancer.request` for `hedge`.
+
+        A service running in the same process is called directly with
+        the request object, without encoding it or balancing replicas.
+
+        Raises:
+            RequestTimeoutError: The service did not respond in time.
+            DeadlineExceededError: The deadline of the call has passed.
+            ServiceError: The service failed to handle the request.
+        """
+        node = LanComNode.get_node(node)
+        local_services = node.runtime.local_services.get(service_name)
+        if local_services:
+            return node.submit_loop_task(
+                ServiceProxy.local_request(
+                    node, local_services[0], request, timeout, deadline
+                ),
+                True,
+            )
+        if not node.nodes_map.get_service_infos(service_name):
+            # the providers may have been discovered without their info
+            node.submit_loop_task(
+                ServiceProxy.resolve_service(node, service_name), True
+            )
+        if not node.nodes_map.get_service_infos(service_name):
+            logger.warning("Service %s is not exist", service_name)
             return None
         request_bytes = request_encoder(request)
-        addr = f"tcp://{service_component['ip']}:{service_component['port']}"
         response = node.submit_loop_task(
-            send_bytes_request(addr, service_name, request_bytes),
+            ServiceProxy.balanced_request(
+                node,
+                service_name,
+                strategy,
+                request_bytes,
+                partial(
+                    ServiceBalancer.request,
+                    timeout=timeout,
+                    retries=retries,
+                    deadline=deadline,
+                    hedge=hedge,
+                ),
+            ),
             True,
         )
         return response_decoder(cast(bytes, response))
+
+    @staticmethod
+    async def local_request(
+        node: LanComNode,
+        service: Service,
+        request: RequestT,
+        timeout: float,
+        deadline: Optional[float],
+    ) -> ResponseT:
+        if deadline is not None and deadline < timeout:
+            timeout = deadline
+        try:
+            return await asyncio.wait_for(
+                node.loop.run_in_executor(
+                    node.runtime.get_executor(service.qos),
+                    service.handle_request,
+                    request,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            if timeout == deadline:
+                raise DeadlineExceededError(
+                    f"Request {service.name} ran out of time"
+                ) from None
+            raise RequestTimeoutError(
+                f"Request {service.name} timed out for {timeout} s."
+            ) from None
+        except Exception as e:
+            raise ServiceError(f"Service {service.name} failed: {e}") from e
+
+    @staticmethod
+    async def resolve_service(node: LanComNode, service_name: str) -> None:
+        node.nodes_map.wanted_services.add(service_name)
+        await node.fetch_deferred(service_key(service_name))
+
+    @staticmethod
+    async def balanced_request(
+        node: LanComNode,
+        service_name: str,
+        strategy: BalanceStrategy,
+        request_bytes: bytes,
+        send_request: Callable[
+            [ServiceBalancer, bytes], Awaitable[bytes]
+        ] = ServiceBalancer.request,
+    ) -> bytes:
+        # the balancers are created on the loop thread to avoid races
+        balancer = node.service_balancers.get(service_name)
+        if balancer is None:
+            balancer = ServiceBalancer(node, service_name, strategy)
+            node.service_balancers[service_name] = balancer
+            # the info of new replicas is fetched as soon as they appear
+            node.nodes_map.wanted_services.add(service_name)
+        balancer.strategy = strategy
+        replicas = cast(List[ServiceInfo], balancer.get_replicas())
+        cache_ttl = min((r.get("cacheTTL", 0.0) for r in replicas), default=0)
+        if cache_ttl <= 0:
+            return await send_request(balancer, request_bytes)
+        # any change of the providers invalidates the cached responses
+        version = frozenset(
+            (
+                r["nodeID"],
+                node.nodes_map.nodes_info_id.get(r["nodeID"]),
+                r.get("cacheVersion", ""),
+            )
+            for r in replicas
+        )
+        return await node.response_cache.get_or_request(
+            create_cache_key(service_name, request_bytes),
+            cache_ttl,
+            version,
+            lambda: send_request(balancer, request_bytes),
+        )
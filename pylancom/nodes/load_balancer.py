@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from enum import Enum
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional
+
+from ..errors import (
+    DeadlineExceededError,
+    LanComError,
+    RequestTimeoutError,
+    ServiceNotFoundError,
+)
+from ..lancom_type import HashIdentifier, LanComMsg, NodeReqType, SocketInfo
+from ..utils.log import logger
+from ..utils.msg import send_bytes_request
+
+if TYPE_CHECKING:
+    from .lancom_node import LanComNode
+
+HEALTH_CHECK_INTERVAL = 2.0
+HEALTH_CHECK_TIMEOUT = 0.5
+# smoothing factor of the latency moving average
+LATENCY_ALPHA = 0.2
+LATENCY_WINDOW = 100
+# the p95 latency is only trusted after this many samples
+HEDGE_MIN_SAMPLES = 20
+RETRY_BACKOFF = 0.05
+MAX_BACKOFF = 1.0
+
+
+class BalanceStrategy(Enum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"
+    LATENCY_WEIGHTED = "latency_weighted"
+
+
+class ReplicaStats:
+    def __init__(self) -> None:
+        self.outstanding = 0
+        self.latency = 0.0
+        self.healthy = True
+        self.failures = 0
+
+    def record_latency(self, latency: float) -> None:
+        if self.latency == 0.0:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_ALPHA * (latency - self.latency)
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+
+class ServiceBalancer:
+    """Spreads the requests of one service over all of its providers.
+
+    All the state is only touched from the node's event loop, so the
+    methods are not thread safe and must run as loop tasks.
+    """
+
+    def __init__(
+        self,
+        node: LanComNode,
+        service_name: str,
+        strategy: BalanceStrategy = BalanceStrategy.ROUND_ROBIN,
+    ) -> None:
+        self.node = node
+        self.service_name = service_name
+        self.strategy = strategy
+        self.stats: Dict[HashIdentifier, ReplicaStats] = {}
+        self.counter = 0
+        # recent latencies of all replicas, used for the hedging delay
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.hedges = 0
+        self.running = True
+        node.submit_loop_task(self.health_check_loop(), False)
+
+    def get_stats(self, info: SocketInfo) -> ReplicaStats:
+        if info["socketID"] not in self.stats:
+            self.stats[info["socketID"]] = ReplicaStats()
+        return self.stats[info["socketID"]]
+
+    def get_replicas(self) -> List[SocketInfo]:
+        return self.node.nodes_map.get_service_infos(self.service_name)
+
+    def order_replicas(self) -> List[SocketInfo]:
+        """Returns the replicas in the order they should be tried."""
+        replicas = self.get_replicas()
+        healthy = [r for r in replicas if self.get_stats(r).healthy]
+        # if every replica looks down, still give all of them a chance
+        candidates = healthy or replicas
+        if len(candidates) < 2:
+            return candidates
+        self.counter += 1
+        start = self.counter % len(candidates)
+        rotated = candidates[start:] + candidates[:start]
+        if self.strategy == BalanceStrategy.LEAST_OUTSTANDING:
+            rotated.sort(key=lambda r: self.get_stats(r).outstanding)
+        elif self.strategy == BalanceStrategy.LATENCY_WEIGHTED:
+            first = self.pick_by_latency(rotated)
+            rotated.remove(first)
+            rotated.sort(key=lambda r: self.get_stats(r).latency)
+            rotated.insert(0, first)
+        return rotated
+
+    def pick_by_latency(self, candidates: List[SocketInfo]) -> SocketInfo:
+        latencies = [self.get_stats(r).latency for r in candidates]
+        known = [latency for latency in latencies if latency > 0]
+        # replicas without measurements are weighted like the fastest one
+        default = min(known) if known else 1.0
+        weights = [1.0 / (latency or default) for latency in latencies]
+        return random.choices(candidates, weights=weights)[0]
+
+    def hedge_delay(self, timeout: float) -> float:
+        """Returns the p95 latency after which a hedged copy is sent."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return timeout / 2
+        latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95)]
+
+    async def request(
+        self,
+        request: bytes,
+        timeout: float = 1.0,
+        retries: int = 0,
+        deadline: Optional[float] = None,
+        hedge: bool = False,
+    ) -> bytes:
+        """Sends the request to the replicas of the service.
+
+        Every attempt waits at most `timeout` seconds and replicas that
+        time out are failed over. After a failed round the request is
+        retried up to `retries` times with a jittered exponential backoff,
+        but never past `deadline` seconds from now. With `hedge`, a second
+        copy goes to another replica once the first one is slower than the
+        p95 latency, and the first response wins.
+        """
+        deadline_at = None if deadline is None else time.monotonic() + deadline
+        attempt = 0
+        while True:
+            replicas = self.order_replicas()
+            if not replicas:
+                raise ServiceNotFoundError(
+                    f"Service {self.service_name} does not exist"
+                )
+            try:
+                if hedge and len(replicas) > 1:
+                    return await self.hedged_request(
+                        replicas, request, timeout, deadline_at
+                    )
+                return await self.failover_request(
+                    replicas, request, timeout, deadline_at
+                )
+            except DeadlineExceededError:
+                raise
+            except RequestTimeoutError:
+                if attempt >= retries:
+                    raise
+            attempt += 1
+            backoff = random.uniform(
+                0, min(MAX_BACKOFF, RETRY_BACKOFF * 2**attempt)
+            )
+            if deadline_at is not None and (
+                time.monotonic() + backoff >= deadline_at
+            ):
+                raise DeadlineExceededError(
+                    f"Request {self.service_name} ran out of time"
+                )
+            logger.warning(
+                "Retrying %s in %.3f s (%s/%s)",
+                self.service_name,
+                backoff,
+                attempt,
+                retries,
+            )
+            await asyncio.sleep(backoff)
+
+    async def failover_request(
+        self,
+        replicas: List[SocketInfo],
+        request: bytes,
+        timeout: float,
+        deadline_at: Optional[float],
+    ) -> bytes:
+        for info in replicas[:-1]:
+            try:
+                return await self.send_to(info, request, timeout, deadline_at)
+            except DeadlineExceededError:
+                raise
+            except RequestTimeoutError:
+                logger.warning(
+                    "Service %s at %s:%s timed out, trying the next replica",
+                    self.service_name,
+                    info["ip"],
+                    info["port"],
+                )
+        return await self.send_to(replicas[-1], request, timeout, deadline_at)
+
+    async def hedged_request(
+        self,
+        replicas: List[SocketInfo],
+        request: bytes,
+        timeout: float,
+        deadline_at: Optional[float],
+    ) -> bytes:
+        loop = asyncio.get_running_loop()
+        pending = {
+            loop.create_task(
+                self.send_to(replicas[0], request, timeout, deadline_at)
+            )
+        }
+        done, _ = await asyncio.wait(
+            pending, timeout=self.hedge_delay(timeout)
+        )
+        if not done:
+            self.hedges += 1
+            pending.add(
+                loop.create_task(
+                    self.send_to(replicas[1], request, timeout, deadline_at)
+                )
+            )
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    async def send_to(
+        self,
+        info: SocketInfo,
+        request: bytes,
+        timeout: float,
+        deadline_at: Optional[float],
+    ) -> bytes:
+        budget = None
+        if deadline_at is not None:
+            budget = deadline_at - time.monotonic()
+            if budget <= 0:
+                raise DeadlineExceededError(
+                    f"Request {self.service_name} ran out of time"
+                )
+            timeout = min(timeout, budget)
+        stats = self.get_stats(info)
+        stats.outstanding += 1
+        start = time.monotonic()
+        try:
+            response = await send_bytes_request(
+                f"tcp://{info['ip']}:{info['port']}",
+                self.service_name,
+                request,
+                timeout,
+                budget,
+            )
+        except RequestTimeoutError as e:
+            stats.record_failure()
+            if budget is not None and timeout >= budget:
+                raise DeadlineExceededError(
+                    f"Request {self.service_name} ran out of time"
+                ) from e
+            raise
+        finally:
+            stats.outstanding -= 1
+        latency = time.monotonic() - start
+        stats.record_latency(latency)
+        self.latencies.append(latency)
+        return response
+
+    async def check_health(self, info: SocketInfo) -> None:
+        node_info = self.node.nodes_map.nodes_info.get(info["nodeID"])
+        if node_info is None:
+            return
+        try:
+            await send_bytes_request(
+                f"tcp://{node_info['ip']}:{node_info['port']}",
+                NodeReqType.PING.value,
+                LanComMsg.EMPTY.value.encode(),
+                HEALTH_CHECK_TIMEOUT,
+            )
+            healthy = True
+        except LanComError:
+            healthy = False
+        stats = self.get_stats(info)
+        if stats.healthy and not healthy:
+            logger.warning(
+                "Replica of %s at %s is down", self.service_name, info["ip"]
+            )
+        stats.healthy = healthy
+
+    async def health_check_loop(self) -> None:
+        while self.running and self.node.running:
+            replicas = self.get_replicas()
+            # forget the replicas which are no longer advertised
+            alive = {r["socketID"] for r in replicas}
+            for socket_id in list(self.stats.keys()):
+                if socket_id not in alive:
+                    self.stats.pop(socket_id)
+            if len(replicas) > 1:
+                await asyncio.gather(*[self.check_health(r) for r in replicas])
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    def stop(self) -> None:
+        self.running = False
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..lancom_type import HashIdentifier, LanComMsg, NodeReqType
+from ..utils.log import logger
+from ..utils.serialization import BytesDecoder
+from .lancom_node import LanComNode
+from .lancom_socket import Subscriber
+
+# time for a new subscription to reach the publishers
+SUBSCRIBE_DELAY = 0.1
+
+
+class TopicSample(NamedTuple):
+    rate: float
+    bandwidth: float
+    mean_size: float
+    max_size: int
+    # monotonic time the sample was taken at
+    time: float
+
+
+class NodeRow(NamedTuple):
+    name: str
+    ip: str
+    port: int
+    publishers: int
+    services: int
+    latency: Optional[float]
+
+
+class TopicRow(NamedTuple):
+    name: str
+    publishers: int
+    sample: Optional[TopicSample]
+
+
+class ServiceRow(NamedTuple):
+    name: str
+    node: str
+    latency: Optional[float]
+
+
+class NetworkMonitor:
+    """Observes the nodes, topics and services of the network.
+
+    The topics are sampled in turns, `concurrency` at a time, by briefly
+    subscribing to them for `sample_time` seconds without decoding the
+    messages. Only the sampled topics are sent to the monitor, the other
+    ones are not affected. The nodes are pinged every `ping_interval`
+    seconds, the latency of a service is the one of its node.
+
+    Use it with a `SilentNode`, which the observed nodes do not see.
+    """
+
+    def __init__(
+        self,
+        node: LanComNode,
+        sample_time: float = 1.0,
+        concurrency: int = 4,
+        ping_interval: float = 2.0,
+    ) -> None:
+        self.node = node
+        self.sample_time = sample_time
+        self.concurrency = concurrency
+        self.ping_interval = ping_interval
+        self.samples: Dict[str, TopicSample] = {}
+        self.latencies: Dict[HashIdentifier, Optional[float]] = {}
+        self.running = True
+        # every node is of interest, not only the ones with our topics
+        self.node.nodes_map.wants_all = True
+        self.tasks = [
+            self.node.submit_loop_task(self.sample_loop()),
+            self.node.submit_loop_task(self.ping_loop()),
+        ]
+
+    def topics(self) -> List[str]:
+        publishers = self.node.nodes_map.publishers_dict.values()
+        return sorted({info["name"] for info in publishers})
+
+    async def sample_loop(self) -> None:
+        await self.node.fetch_deferred()
+        while self.running:
+            topics = self.topics()
+            if not topics:
+                await asyncio.sleep(self.sample_time)
+                continue
+            # the topics waiting for the longest time first
+            topics.sort(
+                key=lambda t: self.samples[t].time if t in self.samples else 0
+            )
+            await asyncio.gather(
+                *(self.sample(topic) for topic in topics[: self.concurrency])
+            )
+
+    async def sample(self, topic: str) -> None:
+        count, total, max_size = 0, 0, 0
+        counting = False
+
+        def receive(msg: bytes) -> None:
+            nonlocal count, total, max_size
+            if counting:
+                count += 1
+                total += len(msg)
+                max_size = max(max_size, len(msg))
+
+        # the messages of this process are encoded, to count their size
+        subscriber = Subscriber(
+            topic,
+            BytesDecoder,
+            receive,
+            local_objects=False,
+            node=self.node,
+        )
+        try:
+            await asyncio.sleep(SUBSCRIBE_DELAY)
+            counting = True
+            start = time.monotonic()
+            await asyncio.sleep(self.sample_time)
+            counting = False
+            duration = time.monotonic() - start
+        finally:
+            subscriber.shutdown()
+        self.samples[topic] = TopicSample(
+            count / duration,
+            total / duration,
+            total / count if count else 0.0,
+            max_size,
+            time.monotonic(),
+        )
+
+    async def ping_loop(self) -> None:
+        while self.running:
+            nodes = [
+                node_info
+                for node_id, node_info in self.node.nodes_map.nodes_info.items()
+                if node_id != self.node.node_id
+            ]
+            results = await asyncio.gather(
+                *(self.ping(info["ip"], info["port"]) for info in nodes)
+            )
+            self.latencies = {
+                info["nodeID"]: latency
+                for info, latency in zip(nodes, results)
+            }
+            await asyncio.sleep(self.ping_interval)
+
+    async def ping(self, ip: str, port: int) -> Optional[float]:
+        start = time.monotonic()
+        try:
+            await self.node.send_request(
+                NodeReqType.PING.value, ip, port, LanComMsg.EMPTY.value
+            )
+        except Exception as e:
+            logger.debug("Failed to ping %s:%s: %s", ip, port, e)
+            return None
+        return time.monotonic() - start
+
+    async def collect(
+        self,
+    ) -> Tuple[List[NodeRow], List[TopicRow], List[ServiceRow]]:
+        """The rows of the tables, collected on the loop thread."""
+        nodes_map = self.node.nodes_map
+        node_rows, service_rows = [], []
+        topic_publishers: Dict[str, int] = {}
+        for node_id, info in nodes_map.nodes_info.items():
+            if node_id == self.node.node_id:
+                continue
+            latency = self.latencies.get(node_id)
+            node_rows.append(
+                NodeRow(
+                    info["name"],
+                    info["ip"],
+                    info["port"],
+                    len(info["publishers"]),
+                    len(info["services"]),
+                    latency,
+                )
+            )
+            for pub_info in info["publishers"]:
+                name = pub_info["name"]
+                topic_publishers[name] = topic_publishers.get(name, 0) + 1
+            for service_info in info["services"]:
+                service_rows.append(
+                    ServiceRow(service_info["name"], info["name"], latency)
+                )
+        topic_rows = [
+            TopicRow(name, count, self.samples.get(name))
+            for name, count in sorted(topic_publishers.items())
+        ]
+        node_rows.sort(key=lambda row: row.name)
+        service_rows.sort(key=lambda row: row.name)
+        return node_rows, topic_rows, service_rows
+
+    async def close_async(self) -> None:
+        self.running = False
+        for task in self.tasks:
+            task.cancel()
+
+    def close(self) -> None:
+        self.node.submit_loop_task(self.close_async(), True)
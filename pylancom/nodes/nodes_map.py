@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from ..lancom_type import (
+    HashIdentifier,
+    IPAddress,
+    NodeInfo,
+    Port,
+    SocketInfo,
+    TopicName,
+)
+from ..utils.log import logger
+from ..utils.name_filter import NameFilter, service_key, topic_key
+from ..utils.topic_index import TopicPattern, TopicTrie
+
+PublisherCallback = Callable[[SocketInfo], None]
+PublisherWatcher = Tuple[TopicPattern, PublisherCallback]
+
+
+class DeferredNode(NamedTuple):
+    """A node whose info was not fetched, it has no socket of interest."""
+
+    ip: IPAddress
+    port: Port
+    info_id: int
+    names: NameFilter
+
+
+class NodesMap:
+    def __init__(self):
+        self.nodes_info: Dict[str, NodeInfo] = {}
+        self.nodes_info_id: Dict[str, int] = {}
+        # the heartbeat headers already processed, skipped before parsing
+        self.heartbeats: Dict[bytes, HashIdentifier] = {}
+        self.node_heartbeats: Dict[HashIdentifier, bytes] = {}
+        # the nodes discovered without fetching their info
+        self.deferred: Dict[HashIdentifier, DeferredNode] = {}
+        # the services requested from this process
+        self.wanted_services: Set[str] = set()
+        # fetch the info of every node, not only of the interesting ones
+        self.wants_all = False
+        self.publishers_dict: Dict[str, SocketInfo] = {}
+        self.services_dict: Dict[str, SocketInfo] = {}
+        # socket ids registered for every node
+        self.node_sockets: Dict[str, Set[str]] = {}
+        self.topic_index = TopicTrie()
+        self.publisher_watchers: List[PublisherWatcher] = []
+        self.topic_watchers: Dict[TopicName, List[PublisherCallback]] = {}
+
+    def check_node(self, node_id: str) -> bool:
+        return node_id in self.nodes_info or node_id in self.deferred
+
+    def count_nodes(self) -> int:
+        return len(self.nodes_info) + len(self.deferred)
+
+    def heard(self, header: bytes) -> bool:
+        return header in self.heartbeats
+
+    def add_heartbeat(self, node_id: HashIdentifier, header: bytes) -> None:
+        previous = self.node_heartbeats.pop(node_id, None)
+        if previous is not None:
+            self.heartbeats.pop(previous, None)
+        self.heartbeats[header] = node_id
+        self.node_heartbeats[node_id] = header
+
+    def is_wanted(self, names: NameFilter) -> bool:
+        """Whether a node with these socket names has any of interest."""
+        if self.wants_all or self.publisher_watchers:
+            return True
+        return any(topic_key(t) in names for t in self.topic_watchers) or any(
+            service_key(s) in names for s in self.wanted_services
+        )
+
+    def defer_node(self, node_id: HashIdentifier, node: DeferredNode) -> None:
+        self.deferred[node_id] = node
+
+    def take_deferred(
+        self, key: Optional[str] = None
+    ) -> List[Tuple[HashIdentifier, DeferredNode]]:
+        """Removes the deferred nodes which may have the socket `key`.
+
+        All of them without a key, e.g. for a pattern subscription.
+        """
+        taken = [
+            (node_id, node)
+            for node_id, node in self.deferred.items()
+            if key is None or key in node.names
+        ]
+        for node_id, _ in taken:
+            del self.deferred[node_id]
+        return taken
+
+    def check_info(self, node_id: str, info_id: int) -> bool:
+        return self.nodes_info_id.get(node_id, "") == info_id
+
+    def check_heartbeat(self, node_id: str, info_id: int) -> bool:
+        return self.check_node(node_id) and self.check_info(node_id, info_id)
+
+    def update_node(self, node_id: str, node_info: NodeInfo):
+        if node_id not in self.nodes_info:
+            logger.debug("Node %s has been registered", node_info["name"])
+        self.deferred.pop(node_id, None)
+        known_sockets = self.node_sockets.get(node_id, set())
+        # drop the sockets the node no longer advertises
+        self.remove_sockets(node_id)
+        sockets: Set[str] = set()
+        new_publishers: List[SocketInfo] = []
+        for pub_info in node_info["publishers"]:
+            self.publishers_dict[pub_info["socketID"]] = pub_info
+            self.topic_index.insert(pub_info)
+            sockets.add(pub_info["socketID"])
+            if pub_info["socketID"] not in known_sockets:
+                new_publishers.append(pub_info)
+        for service_info in node_info["services"]:
+            self.services_dict[service_info["socketID"]] = service_info
+            sockets.add(service_info["socketID"])
+        self.node_sockets[node_id] = sockets
+        self.nodes_info[node_id] = node_info
+        self.nodes_info_id[node_id] = node_info["infoID"]
+        for pub_info in new_publishers:
+            self.notify_watchers(pub_info)
+
+    def remove_sockets(self, node_id: str) -> None:
+        for socket_id in self.node_sockets.pop(node_id, set()):
+            pub_info = self.publishers_dict.pop(socket_id, None)
+            if pub_info is not None:
+                self.topic_index.remove(pub_info)
+            self.services_dict.pop(socket_id, None)
+
+    def remove_node(self, node_id: str) -> None:
+        self.nodes_info.pop(node_id, None)
+        self.nodes_info_id.pop(node_id, None)
+        self.deferred.pop(node_id, None)
+        header = self.node_heartbeats.pop(node_id, None)
+        if header is not None:
+            self.heartbeats.pop(header, None)
+        self.remove_sockets(node_id)
+
+    def get_publisher_info(self, topic_name: TopicName) -> List[SocketInfo]:
+        return self.topic_index.get(topic_name)
+
+    def match_publishers(self, pattern: TopicPattern) -> List[SocketInfo]:
+        return self.topic_index.match(pattern)
+
+    def watch_publishers(
+        self, pattern: TopicPattern, callback: PublisherCallback
+    ) -> None:
+        """Calls back with every publisher matching the pattern.
+
+        The known publishers are reported right away and the new ones as
+        soon as their node is discovered.
+        """
+        self.publisher_watchers.append((pattern, callback))
+        for pub_info in self.match_publishers(pattern):
+            callback(pub_info)
+
+    def unwatch_publishers(self, callback: PublisherCallback) -> None:
+        self.publisher_watchers = [
+            w for w in self.publisher_watchers if w[1] != callback
+        ]
+
+    def watch_topic(
+        self, topic_name: TopicName, callback: PublisherCallback
+    ) -> None:
+        """Like `watch_publishers` for the publishers of one topic."""
+        self.topic_watchers.setdefault(topic_name, []).append(callback)
+        for pub_info in self.get_publisher_info(topic_name):
+            callback(pub_info)
+
+    def unwatch_topic(
+        self, topic_name: TopicName, callback: PublisherCallback
+    ) -> None:
+        callbacks = self.topic_watchers.get(topic_name, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.topic_watchers.pop(topic_name, None)
+
+    def notify_watchers(self, pub_info: SocketInfo) -> None:
+        callbacks = list(self.topic_watchers.get(pub_info["name"], []))
+        for pattern, callback in self.publisher_watchers:
+            if pattern.matches(pub_info["name"]):
+                callbacks.append(callback)
+        for callback in callbacks:
+            try:
+                callback(pub_info)
+            except Exception as e:
+                logger.error(
+                    "Error when notifying a new publisher: %s",
+                    e,
+                    exc_info=True,
+                )
+
+    def get_service_info(self, service_name: str) -> Optional[SocketInfo]:
+        for service in self.services_dict.values():
+            if service["name"] == service_name:
+                return service
+        return None
+
+    def get_service_infos(self, service_name: str) -> List[SocketInfo]:
+        """Returns all the replicas providing the service."""
+        return [
+            service
+            for service in self.services_dict.values()
+            if service["name"] == service_name
+        ]
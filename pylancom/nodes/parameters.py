@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import msgpack
+
+from ..errors import RequestTimeoutError
+from ..utils.log import logger
+from ..utils.serialization import (
+    BytesDecoder,
+    BytesEncoder,
+    MsgpackDecoder,
+    MsgpackEncoder,
+)
+from ..utils.topic_index import TopicPattern
+from .lancom_node import LanComNode
+from .lancom_socket import Publisher, Service, ServiceProxy, Subscriber
+from .load_balancer import BalanceStrategy
+
+# seconds between two attempts to fetch the snapshot of the owner
+SYNC_RETRY_INTERVAL = 0.5
+
+# called with the key and the new value, None when it was deleted
+WatchCallback = Callable[[str, Any], None]
+
+
+class ParameterCache:
+    """The parameters of a store at one version, with the watchers.
+
+    The values are read with plain dictionary lookups, without a lock or
+    a round trip. The updates are applied by one thread at a time.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.values: Dict[str, Any] = {}
+        # the owner instance the values come from and their version
+        self.epoch = b""
+        self.version = 0
+        self.watchers: List[Tuple[TopicPattern, WatchCallback]] = []
+        self.changed = threading.Condition()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.values
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.values))
+
+    def items(self, pattern: str = "**") -> List[Tuple[str, Any]]:
+        """The parameters with a key matching the glob `pattern`."""
+        matcher = TopicPattern(pattern)
+        values = list(self.values.items())
+        return [(k, v) for k, v in values if matcher.matches(k)]
+
+    def watch(self, pattern: str, callback: WatchCallback) -> None:
+        """Calls back on the changes of the keys matching `pattern`.
+
+        The keys are "/" separated like the topic names and `pattern` is
+        a glob like the ones of `PatternSubscriber`, e.g. "arm/**".
+        """
+        self.watchers.append((TopicPattern(pattern), callback))
+
+    def apply(
+        self, version: int, changed: Dict[str, Any], deleted: List[str]
+    ) -> None:
+        self.values.update(changed)
+        for key in deleted:
+            self.values.pop(key, None)
+        self.set_version(version)
+        self.notify(changed, deleted)
+
+    def set_version(self, version: int) -> None:
+        with self.changed:
+            self.version = version
+            self.changed.notify_all()
+
+    def notify(self, changed: Dict[str, Any], deleted: List[str]) -> None:
+        if not self.watchers:
+            return
+        updates = list(changed.items()) + [(key, None) for key in deleted]
+        for key, value in updates:
+            for pattern, callback in self.watchers:
+                if not pattern.matches(key):
+                    continue
+                try:
+                    callback(key, value)
+                except Exception as e:
+                    logger.error(
+                        "Error watching parameter %s: %s",
+                        key,
+                        e,
+                        exc_info=True,
+                    )
+
+    def wait_for_version(self, version: int, timeout: float) -> bool:
+        with self.changed:
+            return self.changed.wait_for(
+                lambda: self.version >= version, timeout
+            )
+
+
+class ParameterServer(ParameterCache):
+    """Owns a parameter store and broadcasts its changes.
+
+    Every change increments the version of the store and is published on
+    the "<name>/updates" topic as a msgpack delta of the changed and
+    deleted keys. The replicas fetch the whole store from the
+    "<name>/snapshot" service when they start or miss a delta, and send
+    their own changes through "<name>/set".
+    """
+
+    def __init__(
+        self,
+        name: str = "parameters",
+        values: Optional[Dict[str, Any]] = None,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        super().__init__(name)
+        self.values = dict(values or {})
+        # a restarted owner starts over, the replicas fetch its snapshot
+        self.epoch = uuid.uuid4().bytes
+        self.lock = threading.Lock()
+        self.publisher = Publisher(f"{name}/updates", node=node)
+        self.services = [
+            Service(
+                f"{name}/snapshot",
+                BytesDecoder,
+                BytesEncoder,
+                self.snapshot,
+                node=node,
+            ),
+            Service(
+                f"{name}/set",
+                MsgpackDecoder,
+                MsgpackEncoder,
+                self.handle_set,
+                node=node,
+            ),
+        ]
+
+    def set(self, key: str, value: Any) -> int:
+        return self.update({key: value})
+
+    def delete(self, key: str) -> int:
+        return self.update({}, [key])
+
+    def update(
+        self, changed: Dict[str, Any], deleted: Optional[List[str]] = None
+    ) -> int:
+        """Changes several parameters at once, returns the new version.
+
+        The values must be encodable with msgpack. The changes are
+        published from the calling thread, not from the loop thread.
+        """
+        with self.lock:
+            deleted = [key for key in deleted or [] if key in self.values]
+            # the unchanged values are not sent again
+            changed = {
+                key: value
+                for key, value in changed.items()
+                if key not in self.values or self.values[key] != value
+            }
+            if not changed and not deleted:
+                return self.version
+            version = self.version + 1
+            delta = msgpack.packb([self.epoch, version, changed, deleted])
+            self.apply(version, changed, deleted)
+            self.publisher.publish_bytes(delta)
+        return version
+
+    def snapshot(self, _: bytes) -> bytes:
+        with self.lock:
+            return msgpack.packb([self.epoch, self.version, self.values])
+
+    def handle_set(self, request: List[Any]) -> int:
+        changed, deleted = request
+        return self.update(changed, deleted)
+
+    def close(self) -> None:
+        for service in self.services:
+            service.shutdown()
+        self.publisher.shutdown()
+
+
+class Parameters(ParameterCache):
+    """A replica of the parameter store of a `ParameterServer`.
+
+    The replica starts empty and fills up once the snapshot of the owner
+    is fetched, see `wait_synced`. The deltas of the owner are applied
+    on the loop thread, which also runs the watch callbacks.
+    """
+
+    def __init__(
+        self, name: str = "parameters", node: Optional[LanComNode] = None
+    ) -> None:
+        super().__init__(name)
+        self.node = LanComNode.get_node(node)
+        self.synced = threading.Event()
+        # the deltas received while the snapshot is fetched
+        self.pending: Optional[List[List[Any]]] = []
+        self.running = True
+        self.subscriber = Subscriber(
+            f"{name}/updates", BytesDecoder, self.receive, node=self.node
+        )
+        self.sync_task = self.node.submit_loop_task(self.sync())
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the first snapshot of the owner."""
+        return self.synced.wait(timeout)
+
+    def set(self, key: str, value: Any, timeout: float = 1.0) -> int:
+        return self.update({key: value}, timeout=timeout)
+
+    def delete(self, key: str, timeout: float = 1.0) -> int:
+        return self.update({}, [key], timeout)
+
+    def update(
+        self,
+        changed: Dict[str, Any],
+        deleted: Optional[List[str]] = None,
+        timeout: float = 1.0,
+    ) -> int:
+        """Changes parameters through the owner, returns the new version.
+
+        Returns once the change is applied to this replica as well, so
+        it is read back right after, RequestTimeoutError if it is not
+        within `timeout`. Do not call it on the loop thread.
+        """
+        version = ServiceProxy.request(
+            f"{self.name}/set",
+            MsgpackEncoder,
+            MsgpackDecoder,
+            [changed, deleted or []],
+            timeout=timeout,
+            node=self.node,
+        )
+        if version is None:
+            raise LookupError(f"Parameter store {self.name} is not found")
+        if not self.wait_for_version(version, timeout):
+            raise RequestTimeoutError(
+                f"Version {version} of {self.name} did not arrive in time"
+            )
+        return version
+
+    def receive(self, msg: bytes) -> None:
+        delta = msgpack.unpackb(msg)
+        if self.pending is not None:
+            self.pending.append(delta)
+        elif not self.apply_delta(delta):
+            self.resync([delta])
+
+    def apply_delta(self, delta: List[Any]) -> bool:
+        """Applies the next delta, False when some are missing."""
+        epoch, version, changed, deleted = delta
+        if epoch == self.epoch and version <= self.version:
+            return True
+        if epoch != self.epoch or version != self.version + 1:
+            # missed deltas or a restarted owner
+            return False
+        self.apply(version, changed, deleted)
+        return True
+
+    def resync(self, pending: List[List[Any]]) -> None:
+        self.pending = pending
+        self.sync_task = self.node.submit_loop_task(self.sync())
+
+    async def sync(self) -> None:
+        """Fetches the snapshot, then applies the deltas received since."""
+        service_name = f"{self.name}/snapshot"
+        while self.running:
+            try:
+                await ServiceProxy.resolve_service(self.node, service_name)
+                response = await ServiceProxy.balanced_request(
+                    self.node,
+                    service_name,
+                    BalanceStrategy.ROUND_ROBIN,
+                    b"",
+                )
+                break
+            except Exception as e:
+                logger.debug("Failed to sync %s: %s", self.name, e)
+                await asyncio.sleep(SYNC_RETRY_INTERVAL)
+        else:
+            return
+        epoch, version, values = msgpack.unpackb(response)
+        previous = self.values
+        self.values = values
+        self.epoch = epoch
+        self.set_version(version)
+        pending, self.pending = self.pending or [], None
+        self.synced.set()
+        self.notify(
+            {k: v for k, v in values.items() if previous.get(k) != v},
+            [key for key in previous if key not in values],
+        )
+        for i, delta in enumerate(pending):
+            if delta[0] != epoch:
+                # sent by a previous instance of the owner
+                continue
+            if not self.apply_delta(delta):
+                self.resync(pending[i:])
+                break
+
+    def close(self) -> None:
+        self.running = False
+        self.sync_task.cancel()
+        self.subscriber.shutdown()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from ..utils.log import logger
+from .lancom_node import LanComNode
+from .lancom_socket import RequestT, ResponseT, Service
+from .process_worker import (
+    SHM_THRESHOLD,
+    Payload,
+    init_worker,
+    read_payload,
+    release_payload,
+    run_pipeline,
+    write_payload,
+)
+
+# the longest time a request may take, longer than the one of the other
+# services for the CPU-bound callbacks
+PROCESS_SERVICE_TIMEOUT = 30.0
+
+
+class ProcessService(Service):
+    """A Service whose decoder, handler and encoder run in worker processes.
+
+    The request decoder, the callback, the response encoder and the
+    initializer are sent to the workers, so they must be picklable
+    (e.g. module-level functions). `initializer(*initargs)` runs once in
+    every worker and is the place to load models or other warm state.
+
+    A request gets `timeout` seconds instead of the `SERVICE_TIMEOUT` of
+    the other services, the clients have to wait as long. A timed out
+    worker still finishes its computation. The workers are stopped when
+    the service is shut down or its node is closed.
+    """
+
+    # the callback has to run in the workers, also for local clients
+    local_calls = False
+
+    def __init__(
+        self,
+        service_name: str,
+        request_decoder: Callable[[bytes], RequestT],
+        response_encoder: Callable[[ResponseT], bytes],
+        callback: Callable[[RequestT], ResponseT],
+        num_workers: Optional[int] = None,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple = (),
+        shm_threshold: int = SHM_THRESHOLD,
+        timeout: float = PROCESS_SERVICE_TIMEOUT,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        super().__init__(
+            service_name,
+            request_decoder,
+            response_encoder,
+            callback,
+            node=node,
+        )
+        self.shm_threshold = shm_threshold
+        # spawn instead of fork, the node already runs zmq and loop threads
+        self.pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(
+                request_decoder,
+                callback,
+                response_encoder,
+                initializer,
+                initargs,
+            ),
+        )
+        self.node.service_timeouts[self.name] = timeout
+        self.node.process_services[self.name] = self
+
+    async def callback(self, msg: bytes) -> bytes:  # type: ignore[override]
+        request = write_payload(msg, self.shm_threshold)
+        future = self.pool.submit(run_pipeline, request, self.shm_threshold)
+        try:
+            response = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: self.discard_result(f, request))
+            raise
+        return read_payload(response)
+
+    @staticmethod
+    def discard_result(
+        future: concurrent.futures.Future, request: Payload
+    ) -> None:
+        if future.cancelled():
+            release_payload(request)
+        elif future.exception() is None:
+            release_payload(future.result())
+
+    def on_shutdown(self):
+        super().on_shutdown()
+        self.node.service_timeouts.pop(self.name, None)
+        self.node.process_services.pop(self.name, None)
+        self.stop_workers()
+
+    def stop_workers(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        logger.info('Worker processes of "%s" are stopped', self.name)
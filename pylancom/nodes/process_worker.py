@@ -0,0 +1,82 @@
+"""The worker side of `ProcessService`.
+
+Spawned workers import this module to unpickle the pipeline, it only
+depends on the standard library so they do not load zmq and the node
+runtime.
+"""
+
+from __future__ import annotations
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, NamedTuple, Optional, Tuple, Union
+
+# payloads at least this large are exchanged through shared memory
+SHM_THRESHOLD = 64 * 1024
+
+
+class SharedPayload(NamedTuple):
+    name: str
+    size: int
+
+
+Payload = Union[bytes, SharedPayload]
+
+# the decode -> handle -> encode pipeline of the worker process
+_pipeline: Optional[Tuple[Callable, Callable, Callable]] = None
+
+
+def write_payload(data: bytes, shm_threshold: int) -> Payload:
+    """Move a large payload into a new shared memory block.
+
+    The block is owned by the reader, which unlinks it in `read_payload`.
+    """
+    if len(data) < shm_threshold:
+        return data
+    shm = SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        return SharedPayload(shm.name, len(data))
+    finally:
+        shm.close()
+
+
+def read_payload(payload: Payload) -> bytes:
+    if not isinstance(payload, SharedPayload):
+        return payload
+    shm = SharedMemory(name=payload.name)
+    try:
+        return bytes(shm.buf[: payload.size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def release_payload(payload: Any) -> None:
+    """Free a payload that will never be read."""
+    if isinstance(payload, SharedPayload):
+        try:
+            read_payload(payload)
+        except FileNotFoundError:
+            pass
+
+
+def init_worker(
+    request_decoder: Callable,
+    callback: Callable,
+    response_encoder: Callable,
+    initializer: Optional[Callable[..., None]],
+    initargs: Tuple,
+) -> None:
+    global _pipeline
+    _pipeline = (request_decoder, callback, response_encoder)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def run_pipeline(payload: Payload, shm_threshold: int) -> Payload:
+    if _pipeline is None:
+        raise RuntimeError("Worker process has not been initialized")
+    request_decoder, callback, response_encoder = _pipeline
+    request = request_decoder(read_payload(payload))
+    response = response_encoder(callback(request))
+    return write_payload(response, shm_threshold)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+from ..utils.log import logger
+from ..utils.mmap_log import DEFAULT_SEGMENT_SIZE, LogReader, LogWriter
+from ..utils.serialization import BytesDecoder
+from .lancom_node import LanComNode
+from .lancom_socket import PatternSubscriber, Publisher
+
+
+class Recorder:
+    """Records the topics matching the glob patterns into a log directory.
+
+    See `TopicPattern` for the syntax of the patterns.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        topic_patterns: List[str],
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        self.node = LanComNode.get_node(node)
+        self.writer = LogWriter(directory, segment_size)
+        self.count = 0
+        self.running = True
+        self.subscribers = [
+            # the payloads of local publishers have to be encoded as well
+            PatternSubscriber(
+                pattern,
+                BytesDecoder,
+                self.record,
+                local_objects=False,
+                node=self.node,
+            )
+            for pattern in topic_patterns
+        ]
+
+    def record(self, topic: str, msg: bytes) -> None:
+        if self.running:
+            self.writer.write(time.time(), topic, msg)
+            self.count += 1
+
+    async def close_async(self) -> None:
+        # the subscribers write on the loop thread, close there as well
+        self.running = False
+        for subscriber in self.subscribers:
+            subscriber.shutdown()
+        self.writer.close()
+
+    def close(self) -> None:
+        self.node.submit_loop_task(self.close_async(), True)
+        logger.info("Recorded %s messages", self.count)
+
+
+class Player:
+    """Republishes a recorded log at `rate` times the original speed.
+
+    A `rate` of 0 replays the records as fast as possible.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rate: float = 1.0,
+        topics: Optional[Set[str]] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        self.node = LanComNode.get_node(node)
+        self.reader = LogReader(directory)
+        self.rate = rate
+        self.topics = topics
+        self.start = start
+        self.end = end
+        self.publishers: Dict[str, Publisher] = {}
+        self.count = 0
+        self.running = False
+
+    def get_publisher(self, topic: str) -> Publisher:
+        if topic not in self.publishers:
+            self.publishers[topic] = Publisher(topic, node=self.node)
+        return self.publishers[topic]
+
+    def advertise(self) -> None:
+        """Creates the publishers ahead so subscribers can connect."""
+        for topic in self.reader.topics():
+            if self.topics is None or topic in self.topics:
+                self.get_publisher(topic)
+
+    async def play_loop(self) -> None:
+        self.running = True
+        log_start: Optional[float] = None
+        wall_start = time.monotonic()
+        for record in self.reader.read(self.start, self.end, self.topics):
+            if not self.running:
+                break
+            if log_start is None:
+                log_start = record.timestamp
+            if self.rate > 0:
+                due = (record.timestamp - log_start) / self.rate
+                delay = due - (time.monotonic() - wall_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.count % 1024 == 0:
+                # let the other loop tasks run when replaying at full speed
+                await asyncio.sleep(0)
+            publisher = self.get_publisher(record.topic)
+            # the payload is a view into the log, unmapped on close
+            await publisher.send_bytes_async(bytes(record.payload))
+            self.count += 1
+        self.running = False
+        logger.info("Replayed %s messages", self.count)
+
+    def play(self, block: bool = True) -> None:
+        self.node.submit_loop_task(self.play_loop(), block)
+
+    def stop(self) -> None:
+        self.running = False
+
+    def close(self) -> None:
+        self.stop()
+        self.reader.close()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, cast
+
+import msgpack
+import zmq
+
+from ..lancom_type import HashIdentifier, NodeInfo, RegistryReqType
+from ..utils.log import logger
+from .lancom_node import LanComNode
+
+REGISTRY_PORT = 7721
+# nodes which did not poll the registry for this long are dropped
+REGISTRY_LEASE = 10.0
+
+
+class Registry:
+    """Central index of the nodes, for networks without multicast.
+
+    The nodes created with `registry="ip:port"` register their `NodeInfo`
+    once, register it again when it changes and poll the registry for the
+    changes of the other nodes. A poll also renews the lease of the node.
+    Runs on the loop of `node`, which binds the registry port.
+    """
+
+    def __init__(
+        self,
+        node: Optional[LanComNode] = None,
+        port: int = REGISTRY_PORT,
+        lease: float = REGISTRY_LEASE,
+    ) -> None:
+        self.node = LanComNode.get_node(node)
+        self.lease = lease
+        # increased with every change, the nodes poll the newer changes
+        self.version = 0
+        self.entries: Dict[HashIdentifier, Tuple[int, NodeInfo]] = {}
+        self.last_seen: Dict[HashIdentifier, float] = {}
+        # removed node -> (version, time of the removal)
+        self.removed: Dict[HashIdentifier, Tuple[int, float]] = {}
+        # the polls older than the forgotten removals resync everything
+        self.forgotten_version = 0
+        self.socket = self.node.create_socket(zmq.ROUTER)
+        self.socket.bind(f"tcp://{self.node.node_ip}:{port}")
+        callbacks = {
+            RegistryReqType.REGISTER.value: self.register,
+            RegistryReqType.UNREGISTER.value: self.unregister,
+            RegistryReqType.QUERY.value: self.query,
+        }
+        self.tasks = [
+            self.node.submit_loop_task(
+                self.node.service_loop(self.socket, callbacks)
+            ),
+            self.node.submit_loop_task(self.expire_loop()),
+        ]
+        logger.info("Registry is listening on port %s", port)
+
+    async def register(self, request: bytes) -> bytes:
+        node_info = cast(NodeInfo, msgpack.loads(request))
+        node_id = node_info["nodeID"]
+        if node_id not in self.entries:
+            logger.debug("Node %s has registered", node_info["name"])
+        self.version += 1
+        self.entries[node_id] = (self.version, node_info)
+        self.last_seen[node_id] = time.monotonic()
+        self.removed.pop(node_id, None)
+        return b""
+
+    async def unregister(self, request: bytes) -> bytes:
+        self.remove(request.decode())
+        return b""
+
+    async def query(self, request: bytes) -> bytes:
+        """Returns the changes since the version polled last time."""
+        node_id, since = msgpack.loads(request)
+        registered = node_id in self.entries
+        if registered:
+            self.last_seen[node_id] = time.monotonic()
+        # a restarted registry or a node silent for too long
+        full = since > self.version or since < self.forgotten_version
+        if full:
+            since = 0
+        updated: List[NodeInfo] = []
+        removed: List[HashIdentifier] = []
+        if since < self.version:
+            updated = [
+                info
+                for version, info in self.entries.values()
+                if version > since
+            ]
+            removed = [
+                node_id
+                for node_id, (version, _) in self.removed.items()
+                if version > since
+            ]
+        response = [self.version, registered, full, updated, removed]
+        return cast(bytes, msgpack.dumps(response))
+
+    def remove(self, node_id: HashIdentifier) -> None:
+        if self.entries.pop(node_id, None) is None:
+            return
+        self.last_seen.pop(node_id, None)
+        self.version += 1
+        self.removed[node_id] = (self.version, time.monotonic())
+
+    async def expire_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            now = time.monotonic()
+            for node_id, last_seen in list(self.last_seen.items()):
+                if now - last_seen > self.lease:
+                    logger.info("Registered node %s has expired", node_id)
+                    self.remove(node_id)
+            # every node polled the removals in the meantime
+            for node_id, (version, removed_at) in list(self.removed.items()):
+                if now - removed_at > self.lease:
+                    del self.removed[node_id]
+                    self.forgotten_version = max(
+                        self.forgotten_version, version
+                    )
+
+    async def close_async(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        # let the cancellations run before the socket goes away
+        await asyncio.sleep(0)
+        self.socket.close(linger=0)
+
+    def close(self) -> None:
+        self.node.submit_loop_task(self.close_async(), True)
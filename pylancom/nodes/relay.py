@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+from ipaddress import ip_address, ip_interface
+from typing import Dict, List, Optional, cast
+
+import zmq
+
+from ..lancom_type import HashIdentifier, PublisherInfo, SocketInfo
+from ..utils.log import logger
+from ..utils.msg import create_hash_identifier, get_socket_port
+from ..utils.topic_index import TopicPattern
+from .lancom_node import LanComNode
+from .lancom_socket import relay_serves
+
+# relays a publisher goes through at most, a safety net for the loops
+MAX_RELAY_HOPS = 4
+# seconds between two checks of the forwarded publishers
+PRUNE_INTERVAL = 2.0
+
+
+class TopicRelay:
+    """Forwards the topics of other networks into the network of a node.
+
+    The topics matching `patterns` are received once from their
+    publishers outside of `network`, the /24 network of the node by
+    default, and republished on a socket of the relay, which the
+    subscribers of the network connect to instead of the publishers. The
+    relay advertises a copy of every forwarded publisher in the info of
+    its node, with the "relay*" fields of `PublisherInfo`.
+
+    The subscriptions go upstream like through a zmq XSUB/XPUB proxy, a
+    topic is only received while a subscriber of the network wants it.
+    A publisher is not forwarded back into its own network, nor twice by
+    the same relay, and the relays a publisher went through are listed
+    in its "relayPath".
+    """
+
+    def __init__(
+        self,
+        patterns: List[str],
+        network: Optional[str] = None,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        self.node = LanComNode.get_node(node)
+        self.patterns = [TopicPattern(pattern) for pattern in patterns]
+        if network is None:
+            network = f"{self.node.node_ip}/24"
+        self.network = ip_interface(network).network
+        # the publisher or the upstream relay every origin is received from
+        self.routes: Dict[HashIdentifier, PublisherInfo] = {}
+        # the copies advertised in the info of the node, by origin
+        self.forwarded: Dict[HashIdentifier, PublisherInfo] = {}
+        self.upstream = self.node.create_socket(zmq.XSUB)
+        self.downstream = self.node.create_socket(zmq.XPUB)
+        self.downstream.bind(f"tcp://{self.node.node_ip}:0")
+        self.port = get_socket_port(self.downstream)
+        self.running = True
+        self.tasks = [
+            self.node.submit_loop_task(self.forward_loop()),
+            self.node.submit_loop_task(self.subscription_loop()),
+            self.node.submit_loop_task(self.prune_loop()),
+        ]
+        self.node.submit_loop_task(self.watch(), False)
+
+    async def watch(self) -> None:
+        # runs on the loop thread, where the nodes map is updated
+        for pattern in self.patterns:
+            self.node.nodes_map.watch_publishers(pattern, self.connect)
+        await self.node.fetch_deferred()
+
+    def forwards(self, pub_info: PublisherInfo) -> bool:
+        """Whether the publisher is forwarded by this relay."""
+        if pub_info["nodeID"] == self.node.node_id:
+            return False
+        path = pub_info.get("relayPath", [])
+        if self.node.node_id in path or len(path) >= MAX_RELAY_HOPS:
+            return False
+        origin_ip = pub_info.get("relayFrom", pub_info["ip"])
+        if ip_address(origin_ip) in self.network:
+            # its subscribers already reach it
+            return False
+        # a relay into another network is no nearer than the publisher
+        return "relayOf" not in pub_info or relay_serves(
+            pub_info, self.node.node_ip
+        )
+
+    def connect(self, info: SocketInfo) -> None:
+        pub_info = cast(PublisherInfo, info)
+        if not self.forwards(pub_info):
+            return
+        origin_id = pub_info.get("relayOf", pub_info["socketID"])
+        route = self.routes.get(origin_id)
+        # a relay serving this node comes before the publisher itself
+        if route is not None and (
+            "relayOf" in route or "relayOf" not in pub_info
+        ):
+            return
+        if route is not None:
+            self.disconnect(route)
+        self.routes[origin_id] = pub_info
+        addr = get_address(pub_info)
+        if not any(
+            get_address(other) == addr
+            for other in self.routes.values()
+            if other is not pub_info
+        ):
+            self.upstream.connect(addr)
+        logger.info("Relay is forwarding %s from %s", pub_info["name"], addr)
+        if origin_id not in self.forwarded:
+            self.advertise(origin_id, pub_info)
+
+    def disconnect(self, pub_info: PublisherInfo) -> None:
+        origin_id = pub_info.get("relayOf", pub_info["socketID"])
+        self.routes.pop(origin_id, None)
+        addr = get_address(pub_info)
+        # the publishers of a node share its socket
+        if not any(
+            get_address(other) == addr for other in self.routes.values()
+        ):
+            self.upstream.disconnect(addr)
+
+    def advertise(self, origin_id: HashIdentifier, pub_info: PublisherInfo):
+        info = PublisherInfo(
+            name=pub_info["name"],
+            socketID=create_hash_identifier(),
+            nodeID=self.node.node_id,
+            type=pub_info["type"],
+            ip=self.node.node_ip,
+            port=self.port,
+        )
+        # the subscribers ask the publisher itself for the lost messages
+        options = {
+            key: value
+            for key, value in pub_info.items()
+            if key in ("latch", "reliable", "qos")
+        }
+        info.update(cast(PublisherInfo, options))
+        info["relayOf"] = origin_id
+        info["relayFrom"] = pub_info.get("relayFrom", pub_info["ip"])
+        info["relayNetwork"] = str(self.network)
+        info["relayPath"] = pub_info.get("relayPath", []) + [self.node.node_id]
+        self.forwarded[origin_id] = info
+        self.node.local_info["publishers"].append(info)
+        self.node.refresh_local_info()
+
+    def matches(self, topic: bytes) -> bool:
+        try:
+            name = topic.decode()
+        except UnicodeDecodeError:
+            return False
+        return any(pattern.matches(name) for pattern in self.patterns)
+
+    async def forward_loop(self) -> None:
+        while self.running:
+            try:
+                frames = await self.upstream.recv_multipart(copy=False)
+                await self.downstream.send_multipart(frames, copy=False)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error when forwarding a message: %s", e)
+
+    async def subscription_loop(self) -> None:
+        """Passes the subscriptions of the network to the publishers."""
+        while self.running:
+            try:
+                frame = await self.downstream.recv()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error when receiving subscription: %s", e)
+                continue
+            # XPUB reports the first subscription and the last unsubscription
+            if frame[:1] in (b"\x00", b"\x01") and self.matches(frame[1:]):
+                await self.upstream.send(frame)
+
+    async def prune_loop(self) -> None:
+        """Drops the publishers which are gone, the nodes map is add-only."""
+        while self.running:
+            await asyncio.sleep(PRUNE_INTERVAL)
+            publishers = self.node.nodes_map.publishers_dict
+            changed = False
+            for origin_id, route in list(self.routes.items()):
+                if route["socketID"] in publishers:
+                    continue
+                self.disconnect(route)
+                origin = publishers.get(origin_id)
+                if origin is not None:
+                    # the upstream relay is gone, not the publisher
+                    self.connect(origin)
+                    continue
+                info = self.forwarded.pop(origin_id)
+                self.node.local_info["publishers"].remove(info)
+                changed = True
+            if changed:
+                self.node.refresh_local_info()
+
+    def close(self) -> None:
+        self.running = False
+        self.node.submit_loop_task(self.close_async(), True)
+
+    async def close_async(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.node.nodes_map.unwatch_publishers(self.connect)
+        for info in self.forwarded.values():
+            if info in self.node.local_info["publishers"]:
+                self.node.local_info["publishers"].remove(info)
+        self.forwarded.clear()
+        self.node.refresh_local_info()
+        self.upstream.close(linger=0)
+        self.downstream.close(linger=0)
+
+
+def get_address(pub_info: SocketInfo) -> str:
+    return f"tcp://{pub_info['ip']}:{pub_info['port']}"
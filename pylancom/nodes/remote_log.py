@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, List, NamedTuple, Optional
+
+from ..utils.log import (
+    REMOTE_ATTRIBUTE,
+    REMOTE_LOG_LEVEL_NUM,
+    add_log_handler,
+    logger,
+    remove_log_handler,
+)
+from ..utils.serialization import MsgpackDecoder, MsgpackEncoder
+from .lancom_node import LanComNode
+from .lancom_socket import Publisher, Subscriber
+
+REMOTE_LOG_TOPIC = "lancom/log"
+# records of one published batch at most
+REMOTE_LOG_BATCH_SIZE = 100
+# seconds between two batches
+REMOTE_LOG_INTERVAL = 0.5
+# records waiting to be shipped, the oldest are dropped beyond
+REMOTE_LOG_BUFFER_SIZE = 10000
+
+
+class RemoteLogRecord(NamedTuple):
+    created: float
+    level: int
+    node: str
+    message: str
+
+
+class RemoteLogHandler(logging.Handler):
+    """Ships the records at REMOTELOG and above to the log collectors.
+
+    The handler runs on the log thread, the records are published on the
+    node loop in batches of up to `batch_size` every `flush_interval`
+    seconds, and only encoded when a collector listens.
+    """
+
+    def __init__(
+        self,
+        node: Optional[LanComNode] = None,
+        topic: str = REMOTE_LOG_TOPIC,
+        level: int = REMOTE_LOG_LEVEL_NUM,
+        batch_size: int = REMOTE_LOG_BATCH_SIZE,
+        flush_interval: float = REMOTE_LOG_INTERVAL,
+    ) -> None:
+        super().__init__(level)
+        self.node = LanComNode.get_node(node)
+        self.publisher = Publisher(
+            topic, msg_encoder=MsgpackEncoder, node=self.node
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records: Deque[List[Any]] = deque(maxlen=REMOTE_LOG_BUFFER_SIZE)
+        self.task = self.node.submit_loop_task(self.flush_loop(), False)
+        add_log_handler(self)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if hasattr(record, REMOTE_ATTRIBUTE):
+            return
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.records.append(
+            [record.created, record.levelno, self.node.node_name, message]
+        )
+
+    async def flush_async(self) -> None:
+        while self.records:
+            size = min(len(self.records), self.batch_size)
+            batch = [self.records.popleft() for _ in range(size)]
+            await self.publisher.send_async(batch)
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_async()
+
+    def close(self) -> None:
+        remove_log_handler(self)
+        if self.task is not None and self.node.running:
+            self.task.cancel()
+            self.task = None
+            self.node.submit_loop_task(self.flush_async(), True)
+            self.publisher.shutdown()
+        super().close()
+
+
+class LogCollector:
+    """Receives the records shipped by the `RemoteLogHandler` of the nodes.
+
+    `callback` is called with each `RemoteLogRecord`, by default the
+    records are written to the local log with the name of their node.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[RemoteLogRecord], None]] = None,
+        topic: str = REMOTE_LOG_TOPIC,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        self.callback = callback or self.log_record
+        self.subscriber = Subscriber(
+            topic, MsgpackDecoder, self.receive, node=node
+        )
+
+    def receive(self, batch: List[List[Any]]) -> None:
+        for entry in batch:
+            self.callback(RemoteLogRecord(*entry))
+
+    @staticmethod
+    def log_record(record: RemoteLogRecord) -> None:
+        logger.log(
+            record.level,
+            "[%s] %s",
+            record.node,
+            record.message,
+            extra={REMOTE_ATTRIBUTE: True},
+        )
+
+    def close(self) -> None:
+        self.subscriber.shutdown()
@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, cast
+
+import zmq
+import zmq.asyncio
+
+from ..lancom_type import HashIdentifier, IPAddress
+from ..utils import netem
+from ..utils.log import logger
+from ..utils.profiler import CallbackTimings, LoopLagMonitor
+from ..utils.qos import QOS_SETTINGS, QoS
+from .busy_poll import BusyPoller
+from .nodes_map import NodesMap
+
+if TYPE_CHECKING:
+    from .abstract_node import AbstractNode
+    from .lancom_node import LanComNode
+    from .lancom_socket import Publisher, Service
+
+# heartbeats waiting to be processed, the newer ones are dropped beyond
+HEARTBEAT_QUEUE_SIZE = 1024
+# the announce interval doubles from the minimum up to the maximum
+ANNOUNCE_MIN_INTERVAL = 0.1
+ANNOUNCE_MAX_INTERVAL = 2.0
+# learned unicast peers are forgotten after this many seconds of silence
+PEER_TIMEOUT = 30.0
+
+# the event loop implementation, "asyncio" or "uvloop"
+EVENT_LOOP_ENV = "LANCOM_EVENT_LOOP"
+
+PeerAddress = Tuple[IPAddress, int]
+
+
+def new_event_loop(event_loop: str) -> asyncio.AbstractEventLoop:
+    if event_loop == "asyncio":
+        return asyncio.new_event_loop()
+    if event_loop == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            raise ImportError(
+                "The uvloop event loop requires `pip install uvloop`"
+            ) from None
+        return uvloop.new_event_loop()
+    raise ValueError(f"Unknown event loop {event_loop}")
+
+
+class HeartbeatProtocol(asyncio.DatagramProtocol):
+    def __init__(self, group: DiscoveryGroup) -> None:
+        self.group = group
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.group.receive(data, addr)
+
+
+class AnnounceTimer:
+    """Trickle-like schedule of the heartbeats.
+
+    The interval doubles from `min_interval` up to `max_interval` while
+    the network is stable and restarts from the minimum when it changes.
+    The delays are drawn from the second half of the interval so the
+    nodes started together do not announce in lockstep.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = ANNOUNCE_MIN_INTERVAL,
+        max_interval: float = ANNOUNCE_MAX_INTERVAL,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+    def reset(self) -> None:
+        self.interval = self.min_interval
+
+    def next_delay(self) -> float:
+        delay = random.uniform(self.interval / 2, self.interval)
+        self.interval = min(self.interval * 2, self.max_interval)
+        return delay
+
+
+class Waker:
+    """A sleep of the loop which can be cut short, from the loop thread.
+
+    A wake-up while not sleeping cuts the next sleep short instead.
+    """
+
+    def __init__(self) -> None:
+        self.future: Optional[asyncio.Future] = None
+        self.woken = False
+
+    async def sleep(self, delay: float) -> None:
+        if self.woken:
+            self.woken = False
+            return
+        loop = asyncio.get_running_loop()
+        self.future = loop.create_future()
+        handle = loop.call_later(delay, self.wake)
+        try:
+            await self.future
+        finally:
+            handle.cancel()
+            self.future = None
+            self.woken = False
+
+    def wake(self) -> None:
+        self.woken = True
+        if self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+
+class DiscoveryGroup:
+    """The nodes of the process listening to one discovery port.
+
+    They share one UDP socket and one map of the discovered nodes, so a
+    heartbeat is only fetched and stored once however many nodes run in
+    the process. The nodes announce together on one jittered schedule, to
+    the multicast group and to the unicast peers.
+
+    Without multicast the group only listens to unicast heartbeats and
+    announces back to the peers it hears from, so only one side needs
+    the other in its peer list. The first node sets the mode of the group.
+    """
+
+    def __init__(
+        self,
+        runtime: NodeRuntime,
+        multicast_addr: IPAddress,
+        port: int,
+        multicast: bool = True,
+    ) -> None:
+        self.runtime = runtime
+        self.multicast_addr = multicast_addr
+        self.multicast_port = port
+        self.multicast = multicast
+        self.nodes: List[AbstractNode] = []
+        self.nodes_map = NodesMap()
+        # created on the loop thread by the first node, a queue binds to
+        # the loop of its thread before Python 3.10
+        self.heartbeats: Optional[
+            asyncio.Queue[Tuple[bytes, IPAddress]]
+        ] = None
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.task: Optional[asyncio.Task] = None
+        self.announce_task: Optional[asyncio.Task] = None
+        self.timer = AnnounceTimer()
+        self.waker = Waker()
+        # configured peers have no last seen time, they are never dropped
+        self.peers: Dict[PeerAddress, Optional[float]] = {}
+
+    def create_socket(self) -> socket.socket:
+        _socket = socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
+        )
+        _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if self.multicast:
+            group = socket.inet_aton(self.multicast_addr)
+            _socket.setsockopt(
+                socket.IPPROTO_IP,
+                socket.IP_ADD_MEMBERSHIP,
+                struct.pack("4sL", group, socket.INADDR_ANY),
+            )
+        _socket.bind(("", self.multicast_port))
+        _socket.setblocking(False)
+        return _socket
+
+    async def add_node(self, node: AbstractNode) -> None:
+        self.nodes.append(node)
+        # a new node is announced quickly
+        self.reset_announce()
+        if self.transport is not None:
+            return
+        logger.debug("Starting multicast listening")
+        loop = asyncio.get_running_loop()
+        self.heartbeats = asyncio.Queue(HEARTBEAT_QUEUE_SIZE)
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: HeartbeatProtocol(self), sock=self.create_socket()
+        )
+        self.task = loop.create_task(self.process_loop())
+        self.announce_task = loop.create_task(self.announce_loop())
+
+    def add_peers(self, peers: List[str]) -> None:
+        """Adds unicast peers as "ip" or "ip:port" addresses.
+
+        The port defaults to the discovery port of the group.
+        """
+        for peer in peers:
+            ip, _, port = peer.partition(":")
+            addr = (ip, int(port) if port else self.multicast_port)
+            self.peers[addr] = None
+
+    def remove_node(self, node: AbstractNode) -> None:
+        if node in self.nodes:
+            self.nodes.remove(node)
+        if self.nodes:
+            return
+        if self.transport is not None:
+            self.transport.close()
+        for task in (self.task, self.announce_task):
+            if task is not None:
+                task.cancel()
+        self.runtime.groups.pop(
+            (self.multicast_addr, self.multicast_port), None
+        )
+        logger.info("Multicast receiving has been stopped")
+
+    def receive(self, data: bytes, addr: PeerAddress) -> None:
+        if not self.multicast and self.peers.get(addr, 0.0) is not None:
+            # announce back to the unicast peers heard from
+            self.peers[addr] = time.monotonic()
+        if netem.active is not None:
+            netem.active.deliver(addr[0], len(data), self.enqueue, data, addr)
+        else:
+            self.enqueue(data, addr)
+
+    def enqueue(self, data: bytes, addr: PeerAddress) -> None:
+        if self.heartbeats is None:
+            return
+        try:
+            self.heartbeats.put_nowait((data, addr[0]))
+        except asyncio.QueueFull:
+            logger.warning("Too many heartbeats, dropping one")
+
+    async def process_loop(self) -> None:
+        heartbeats = cast(asyncio.Queue, self.heartbeats)
+        while True:
+            data, ip = await heartbeats.get()
+            known_nodes = self.nodes_map.count_nodes()
+            # one after the other, the first node updates the shared map
+            # and the others find the heartbeat already known
+            for node in list(self.nodes):
+                try:
+                    await node.process_heartbeat(data, ip)
+                except Exception as e:
+                    logger.error(
+                        "Error processing the heartbeat: %s", e, exc_info=True
+                    )
+            if self.nodes_map.count_nodes() > known_nodes:
+                # let the new node discover this process quickly as well
+                self.reset_announce()
+
+    def reset_announce(self) -> None:
+        """Announces again at the fastest rate, called on the loop."""
+        self.timer.reset()
+        self.waker.wake()
+
+    async def announce_loop(self) -> None:
+        while True:
+            for node in list(self.nodes):
+                try:
+                    node.announce()
+                except Exception as e:
+                    logger.error("Failed to announce the node: %s", e)
+            await self.waker.sleep(self.timer.next_delay())
+
+    def send_to_peers(self, heartbeat: bytes) -> None:
+        if self.transport is None:
+            return
+        now = time.monotonic()
+        for addr, last_seen in list(self.peers.items()):
+            if last_seen is not None and now - last_seen > PEER_TIMEOUT:
+                del self.peers[addr]
+                continue
+            # sent from the listening socket, the peers can answer back
+            self.transport.sendto(heartbeat, addr)
+
+
+class NodeRuntime:
+    """The event loop, ZMQ context and executor of the process.
+
+    All the nodes of a process run on this one loop thread, the first
+    node starts the runtime and the last one to stop shuts it down. The
+    runtime also knows the local sockets, so the nodes of one process can
+    hand messages over without serializing them.
+    """
+
+    instance: Optional[NodeRuntime] = None
+    lock = threading.Lock()
+
+    def __init__(self, event_loop: str = "asyncio") -> None:
+        netem.install_from_env()
+        self.event_loop = event_loop
+        self.zmq_context = zmq.asyncio.Context()
+        self.executor = ThreadPoolExecutor(
+            max_workers=QOS_SETTINGS[QoS.NORMAL].workers
+        )
+        # the executors of the other QoS classes are created on first use
+        self.executors: Dict[QoS, ThreadPoolExecutor] = {
+            QoS.NORMAL: self.executor
+        }
+        self.loop = new_event_loop(event_loop)
+        # started by the first busy polled socket
+        self.busy_poller: Optional[BusyPoller] = None
+        self.nodes: List[AbstractNode] = []
+        self.groups: Dict[Tuple[IPAddress, int], DiscoveryGroup] = {}
+        self.local_nodes: Dict[HashIdentifier, LanComNode] = {}
+        self.local_publishers: Dict[HashIdentifier, Publisher] = {}
+        self.local_services: Dict[str, List[Service]] = {}
+        # the user callbacks of all the nodes are timed here
+        self.timings = CallbackTimings()
+        self.lag_monitor = LoopLagMonitor()
+        self.thread = threading.Thread(
+            target=self.run, name="lancom-loop", daemon=True
+        )
+        self.thread.start()
+
+    @classmethod
+    def get(cls, event_loop: Optional[str] = None) -> NodeRuntime:
+        """The runtime of the process, started with the first node.
+
+        `event_loop` picks the loop implementation, "asyncio" or
+        "uvloop", by default from the LANCOM_EVENT_LOOP variable.
+        """
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = cls(
+                    event_loop or os.environ.get(EVENT_LOOP_ENV, "asyncio")
+                )
+            elif event_loop and event_loop != cls.instance.event_loop:
+                logger.warning(
+                    "The runtime already runs on the %s event loop",
+                    cls.instance.event_loop,
+                )
+            return cls.instance
+
+    def get_executor(self, qos: QoS) -> ThreadPoolExecutor:
+        with NodeRuntime.lock:
+            if qos not in self.executors:
+                self.executors[qos] = ThreadPoolExecutor(
+                    max_workers=QOS_SETTINGS[qos].workers,
+                    thread_name_prefix=f"lancom-{qos.value}",
+                )
+            return self.executors[qos]
+
+    def get_busy_poller(self) -> BusyPoller:
+        with NodeRuntime.lock:
+            if self.busy_poller is None:
+                self.busy_poller = BusyPoller()
+            return self.busy_poller
+
+    def run(self) -> None:
+        logger.info("Starting spin task")
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self.lag_monitor.run())
+        try:
+            self.loop.run_forever()
+            self.loop.run_until_complete(self.cancel_tasks())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        except Exception as e:
+            logger.error(
+                "Unexpected error in thread_task: %s", e, exc_info=True
+            )
+        finally:
+            self.loop.close()
+            # the nodes closed their sockets, the others must not block
+            self.zmq_context.destroy(linger=0)
+
+    async def cancel_tasks(self) -> None:
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_group(
+        self, multicast_addr: IPAddress, port: int, multicast: bool = True
+    ) -> DiscoveryGroup:
+        key = (multicast_addr, port)
+        if key not in self.groups:
+            self.groups[key] = DiscoveryGroup(
+                self, multicast_addr, port, multicast
+            )
+        return self.groups[key]
+
+    def add_node(self, node: AbstractNode) -> None:
+        self.nodes.append(node)
+
+    def remove_node(self, node: AbstractNode) -> None:
+        if node in self.nodes:
+            self.nodes.remove(node)
+        if not self.nodes:
+            self.stop()
+
+    def stop(self) -> None:
+        with NodeRuntime.lock:
+            if NodeRuntime.instance is self:
+                NodeRuntime.instance = None
+        if self.busy_poller is not None:
+            self.busy_poller.stop()
+        try:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        except RuntimeError as e:
+            logger.error("One error occurred when stop server: %s", e)
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
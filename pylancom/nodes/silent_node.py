@@ -1,12 +1,21 @@
-from .abstract_node import AbstractNode
+from ..lancom_type import IPAddress
+from .lancom_node import LanComNode
 
 
-class SilentNode(AbstractNode):
-    def __init__(self, node_name: str, node_ip: str) -> None:
-        super().__init__(node_name, node_ip)
+class SilentNode(LanComNode):
+    """A node which listens to the discovery without announcing itself.
 
-    def initialize_event_loop(self):
-        return super().initialize_event_loop()
+    The other nodes never learn about it, it still can subscribe to their
+    topics and send requests to them, e.g. to observe the network.
+    """
 
-    def check_connection(self, updated_info):
+    def __init__(
+        self,
+        node_name: str,
+        node_ip: IPAddress,
+        multicast_port: int = 7720,
+    ) -> None:
+        super().__init__(node_name, node_ip, multicast_port=multicast_port)
+
+    def announce(self) -> None:
         pass
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Deque, List, Optional, Sequence, Tuple, Union
+
+from ..utils.log import logger
+from .lancom_node import LanComNode
+from .lancom_socket import Subscriber
+
+# a message with the timestamp taken from it
+StampedMessage = Tuple[float, Any]
+MessageDecoder = Callable[[bytes], Any]
+
+
+class TimeSynchronizer:
+    """Calls back with one message per topic, matched by their timestamps.
+
+    `get_stamp` returns the timestamp of a decoded message, the messages
+    of a topic are expected in the order of their timestamps. With the
+    default `slop` of 0, the timestamps of a tuple are equal, otherwise
+    they are at most `slop` seconds apart.
+
+    Every topic buffers its last `queue_size` messages. A message that
+    cannot be part of any tuple anymore is dropped right away, the drops
+    of every topic are counted in `dropped`. The callback receives the
+    messages in the order of `topics` and runs on the loop thread, like
+    the callbacks of the subscribers.
+    """
+
+    def __init__(
+        self,
+        topics: List[str],
+        msg_decoders: Union[MessageDecoder, Sequence[MessageDecoder]],
+        callback: Callable[..., None],
+        get_stamp: Callable[[Any], float],
+        slop: float = 0.0,
+        queue_size: int = 10,
+        node: Optional[LanComNode] = None,
+    ) -> None:
+        if callable(msg_decoders):
+            msg_decoders = [msg_decoders] * len(topics)
+        if len(msg_decoders) != len(topics):
+            raise ValueError("One message decoder per topic is required")
+        self.topics = topics
+        self.callback = callback
+        self.get_stamp = get_stamp
+        self.slop = slop
+        self.queue_size = queue_size
+        self.queues: List[Deque[StampedMessage]] = [deque() for _ in topics]
+        self.matched = 0
+        self.dropped = [0] * len(topics)
+        # subscribed last, the callbacks may fire right away
+        self.subscribers = [
+            Subscriber(
+                topic,
+                decoder,
+                partial(self.receive, index),
+                node=node,
+            )
+            for index, (topic, decoder) in enumerate(zip(topics, msg_decoders))
+        ]
+
+    def receive(self, index: int, msg: Any) -> None:
+        stamp = self.get_stamp(msg)
+        queue = self.queues[index]
+        if queue and stamp < queue[-1][0]:
+            # out of order, the newer messages may already be matched
+            self.drop(index)
+            return
+        if len(queue) == self.queue_size:
+            queue.popleft()
+            self.drop(index)
+        queue.append((stamp, msg))
+        self.match()
+
+    def drop(self, index: int) -> None:
+        self.dropped[index] += 1
+        logger.debug("Dropped a message of %s", self.topics[index])
+
+    def match(self) -> None:
+        """Emits the tuples found at the heads of the queues.
+
+        The latest head is the pivot, no tuple has an older message of its
+        topic. The other topics skip to their last message up to the
+        pivot, the skipped ones are too old to be matched. When the heads
+        do not fit in the slop, the oldest one can never be matched.
+        """
+        queues = self.queues
+        while all(queues):
+            pivot = max(queue[0][0] for queue in queues)
+            for index, queue in enumerate(queues):
+                while len(queue) > 1 and queue[1][0] <= pivot:
+                    queue.popleft()
+                    self.drop(index)
+            oldest = min(range(len(queues)), key=lambda i: queues[i][0][0])
+            if pivot - queues[oldest][0][0] > self.slop:
+                queues[oldest].popleft()
+                self.drop(oldest)
+                continue
+            # a message up to the pivot may still come and fit better
+            if any(len(q) == 1 and q[0][0] < pivot for q in queues):
+                return
+            messages = [queue.popleft()[1] for queue in queues]
+            self.matched += 1
+            self.callback(*messages)
+
+    def shutdown(self) -> None:
+        for subscriber in self.subscribers:
+            subscriber.shutdown()
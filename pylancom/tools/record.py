@@ -0,0 +1,42 @@
+"""Records PyLanCom topics into a memory-mapped log.
+
+Usage: lancom-record -o logs/run1 "robot1/*" "map"
+"""
+
+import argparse
+import time
+
+from ..nodes.lancom_node import LanComNode
+from ..nodes.recorder import Recorder
+from ..utils.mmap_log import DEFAULT_SEGMENT_SIZE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("topics", nargs="+", help="glob patterns of topics")
+    parser.add_argument("-o", "--output", required=True, help="log directory")
+    parser.add_argument("--ip", default="127.0.0.1", help="node ip address")
+    parser.add_argument("--name", default="LanComRecorder", help="node name")
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=DEFAULT_SEGMENT_SIZE // (1024 * 1024),
+        help="segment size in MiB",
+    )
+    args = parser.parse_args()
+    node = LanComNode(args.name, args.ip)
+    recorder = Recorder(
+        args.output, args.topics, args.segment_size * 1024 * 1024
+    )
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+        node.stop_node()
+
+
+if __name__ == "__main__":
+    main()
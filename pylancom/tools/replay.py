@@ -0,0 +1,52 @@
+"""Replays a log recorded by lancom-record.
+
+Usage: lancom-replay logs/run1 --rate 2
+"""
+
+import argparse
+import time
+
+from ..nodes.lancom_node import LanComNode
+from ..nodes.recorder import Player
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="log directory")
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="speed factor, 0 for max"
+    )
+    parser.add_argument("--topics", nargs="*", help="topics to replay")
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="seconds to skip"
+    )
+    parser.add_argument(
+        "--wait",
+        type=float,
+        default=2.0,
+        help="seconds to wait for subscribers before replaying",
+    )
+    parser.add_argument("--ip", default="127.0.0.1", help="node ip address")
+    parser.add_argument("--name", default="LanComPlayer", help="node name")
+    args = parser.parse_args()
+    node = LanComNode(args.name, args.ip)
+    player = Player(
+        args.input,
+        rate=args.rate,
+        topics=set(args.topics) if args.topics else None,
+    )
+    if args.start > 0:
+        player.start = player.reader.start + args.start
+    player.advertise()
+    try:
+        time.sleep(args.wait)
+        player.play(block=True)
+    except KeyboardInterrupt:
+        player.stop()
+    finally:
+        player.close()
+        node.stop_node()
+
+
+if __name__ == "__main__":
+    main()
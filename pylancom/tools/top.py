@@ -0,0 +1,130 @@
+"""Shows the nodes, topics and services of the network in a live table.
+
+Usage: lancom-top --interval 2
+"""
+
+import argparse
+import time
+from typing import List, Optional, Sequence
+
+from ..nodes.monitor import NetworkMonitor, NodeRow, ServiceRow, TopicRow
+from ..nodes.silent_node import SilentNode
+from ..utils.log import set_log_level
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return (
+                f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            )
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_latency(latency: Optional[float]) -> str:
+    return "-" if latency is None else f"{latency * 1000:.1f} ms"
+
+
+def format_table(headers: Sequence[str], rows: List[Sequence[str]]) -> str:
+    widths = [
+        max([len(header)] + [len(row[i]) for row in rows])
+        for i, header in enumerate(headers)
+    ]
+    lines = [
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+        for row in [headers] + rows
+    ]
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def render(
+    nodes: List[NodeRow], topics: List[TopicRow], services: List[ServiceRow]
+) -> str:
+    node_table = format_table(
+        ["NODE", "ADDRESS", "PUBS", "SRVS", "PING"],
+        [
+            [
+                n.name,
+                f"{n.ip}:{n.port}",
+                str(n.publishers),
+                str(n.services),
+                format_latency(n.latency),
+            ]
+            for n in nodes
+        ],
+    )
+    topic_rows = []
+    for t in topics:
+        if t.sample is None:
+            topic_rows.append([t.name, str(t.publishers), "-", "-", "-", "-"])
+            continue
+        topic_rows.append(
+            [
+                t.name,
+                str(t.publishers),
+                f"{t.sample.rate:.1f} Hz",
+                f"{format_size(t.sample.bandwidth)}/s",
+                format_size(t.sample.mean_size),
+                format_size(t.sample.max_size),
+            ]
+        )
+    topic_table = format_table(
+        ["TOPIC", "PUBS", "RATE", "BANDWIDTH", "MEAN", "MAX"], topic_rows
+    )
+    service_table = format_table(
+        ["SERVICE", "NODE", "PING"],
+        [[s.name, s.node, format_latency(s.latency)] for s in services],
+    )
+    return "\n\n".join([node_table, topic_table, service_table])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ip", default="127.0.0.1", help="node ip address")
+    parser.add_argument(
+        "--port", type=int, default=7720, help="discovery port"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=2.0, help="seconds between refreshes"
+    )
+    parser.add_argument(
+        "--sample-time",
+        type=float,
+        default=1.0,
+        help="seconds every topic is sampled for",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="topics sampled at the same time",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="print the tables once after the first interval and exit",
+    )
+    args = parser.parse_args()
+    set_log_level("WARNING")
+    node = SilentNode("LanComTop", args.ip, multicast_port=args.port)
+    monitor = NetworkMonitor(node, args.sample_time, args.concurrency)
+    try:
+        while True:
+            time.sleep(args.interval)
+            tables = render(*node.submit_loop_task(monitor.collect(), True))
+            if args.once:
+                print(tables)
+                break
+            print(CLEAR_SCREEN + tables, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        node.close()
+
+
+if __name__ == "__main__":
+    main()
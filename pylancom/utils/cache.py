@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+CacheKey = Tuple[str, bytes]
+
+
+class CacheEntry(NamedTuple):
+    response: bytes
+    expires_at: float
+    version: Hashable
+
+
+def create_cache_key(service_name: str, request: bytes) -> CacheKey:
+    return service_name, hashlib.blake2b(request, digest_size=16).digest()
+
+
+class ResponseCache:
+    """LRU cache of service responses keyed by service and request hash.
+
+    Concurrent lookups of a missing key are coalesced into a single
+    request. The cache is meant to be used from one event loop only.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self.in_flight: Dict[CacheKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey, version: Hashable) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != version or entry.expires_at < time.monotonic():
+            self.entries.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry.response
+
+    def put(
+        self, key: CacheKey, response: bytes, ttl: float, version: Hashable
+    ) -> None:
+        self.entries[key] = CacheEntry(
+            response, time.monotonic() + ttl, version
+        )
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, service_name: str) -> None:
+        for key in [k for k in self.entries if k[0] == service_name]:
+            self.entries.pop(key)
+
+    async def get_or_request(
+        self,
+        key: CacheKey,
+        ttl: float,
+        version: Hashable,
+        send_request: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        response = self.get(key, version)
+        if response is not None:
+            self.hits += 1
+            return response
+        if key in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[key])
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            response = await send_request()
+            self.put(key, response, ttl, version)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # the waiters receive the exception, nobody awaits this one
+            future.exception()
+            raise
+        finally:
+            self.in_flight.pop(key, None)
@@ -1,16 +1,30 @@
+import atexit
 import logging
-
-from colorama import Fore, init
-
-init(autoreset=True)
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple, Union
 
 # Define a new log level
 REMOTE_LOG_LEVEL_NUM = 25
 logging.addLevelName(REMOTE_LOG_LEVEL_NUM, "REMOTELOG")
 
+# overrides the default level, e.g. LANCOM_LOG_LEVEL=DEBUG
+LOG_LEVEL_ENV = "LANCOM_LOG_LEVEL"
+DEFAULT_LOG_LEVEL = logging.INFO
+# records of one call site let through per window before suppressing them
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_INTERVAL = 10.0
+# set on the records received from other nodes, which are not shipped
+# again nor rate limited twice
+REMOTE_ATTRIBUTE = "lancom_remote"
+
 
 class CustomLogger(logging.Logger):
     def remote_log(self, message, *args, **kws):
+        """Logs at the REMOTELOG level, shipped to the log collectors."""
         if self.isEnabledFor(REMOTE_LOG_LEVEL_NUM):
             self._log(REMOTE_LOG_LEVEL_NUM, message, args, **kws)
 
@@ -20,42 +34,171 @@ class CustomFormatter(logging.Formatter):
 
     FORMAT = "[%(asctime)s] [%(levelname)s] %(message)s"
 
-    FORMATS = {
-        logging.DEBUG: Fore.YELLOW + FORMAT + Fore.RESET,
-        logging.INFO: Fore.BLUE + FORMAT + Fore.RESET,
-        logging.WARNING: Fore.RED + FORMAT + Fore.RESET,
-        logging.ERROR: Fore.MAGENTA + FORMAT + Fore.RESET,
-        logging.CRITICAL: Fore.CYAN + FORMAT + Fore.RESET,
-        # Add custom level format
-        REMOTE_LOG_LEVEL_NUM: Fore.GREEN + FORMAT + Fore.RESET,
-    }
+    def __init__(self) -> None:
+        super().__init__(self.FORMAT)
+        self.formatters: Optional[Dict[int, logging.Formatter]] = None
+
+    def get_formatters(self) -> Dict[int, logging.Formatter]:
+        # colorama is loaded and hooked into the console on the first
+        # record, importing the package does not pay for it
+        if self.formatters is None:
+            from colorama import Fore, init
+
+            init(autoreset=True)
+            colors = {
+                logging.DEBUG: Fore.YELLOW,
+                logging.INFO: Fore.BLUE,
+                logging.WARNING: Fore.RED,
+                logging.ERROR: Fore.MAGENTA,
+                logging.CRITICAL: Fore.CYAN,
+                # Add custom level format
+                REMOTE_LOG_LEVEL_NUM: Fore.GREEN,
+            }
+            self.formatters = {
+                level: logging.Formatter(color + self.FORMAT + Fore.RESET)
+                for level, color in colors.items()
+            }
+        return self.formatters
 
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno, self.FORMAT)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self.get_formatters().get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
 
-def get_logger():
+class RateLimitFilter(logging.Filter):
+    """Lets `burst` records per call site through every `interval` seconds.
+
+    Only the records at `level` and above are limited, the next record let
+    through tells how many were suppressed.
+    """
+
+    def __init__(
+        self,
+        burst: int = RATE_LIMIT_BURST,
+        interval: float = RATE_LIMIT_INTERVAL,
+        level: int = logging.WARNING,
+    ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level
+        # call site -> [window start, records let through, suppressed]
+        self.windows: Dict[Tuple[str, int], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level or hasattr(record, REMOTE_ATTRIBUTE):
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = int(window[2]) if window is not None else 0
+            self.windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = (
+                    f"{record.msg} ({suppressed} similar records suppressed)"
+                )
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Hands the records over to a listener thread writing the handlers.
+
+    The caller only pays for creating the record, the formatting and the
+    console writes happen on the listener thread, started with the first
+    record.
+    """
+
+    def __init__(self, *handlers: logging.Handler) -> None:
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(
+            self.queue, *handlers, respect_handler_level=True
+        )
+        self.started = False
+        self.stopped = False
+        self.start_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the record stays in the process, the listener formats it instead
+        # of the caller
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stopped:
+            # e.g. records of the nodes closed at exit
+            self.listener.handle(record)
+            return
+        if not self.started:
+            self.start()
+        super().emit(record)
+
+    def start(self) -> None:
+        with self.start_lock:
+            if not self.started and not self.stopped:
+                self.listener.start()
+                self.started = True
+                atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Writes the pending records and stops the listener thread."""
+        with self.start_lock:
+            self.stopped = True
+            if self.started:
+                self.listener.stop()
+
+    def add_handler(self, handler: logging.Handler) -> None:
+        # the listener reads its handlers for each record
+        self.listener.handlers = self.listener.handlers + (handler,)
+
+    def remove_handler(self, handler: logging.Handler) -> None:
+        self.listener.handlers = tuple(
+            h for h in self.listener.handlers if h is not handler
+        )
+
+
+def get_log_level() -> int:
+    level = os.environ.get(LOG_LEVEL_ENV, "").upper()
+    if level.isdigit():
+        return int(level)
+    value = logging.getLevelName(level)
+    return value if isinstance(value, int) else DEFAULT_LOG_LEVEL
+
+
+def get_logger(handler: logging.Handler) -> CustomLogger:
     """Create and return a custom logger"""
-    # logger = logging.getLogger("SimPublisher")
     logger = CustomLogger("SimPublisher")
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(get_log_level())
+    logger.addHandler(handler)
+    return logger
+
 
-    # Create console handler and set level
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
+# Create console handler with the custom formatter, written by a
+# background thread
+console_handler = logging.StreamHandler()
+console_handler.setFormatter(CustomFormatter())
+queue_handler = BackgroundQueueHandler(console_handler)
+queue_handler.addFilter(RateLimitFilter())
 
-    # Create custom formatter and add to handler
-    formatter = CustomFormatter()
-    ch.setFormatter(formatter)
+# Get the logger
+logger = get_logger(queue_handler)
 
-    # Add handler to logger
-    if not logger.handlers:
-        logger.addHandler(ch)
 
-    return logger
+def set_log_level(level: Union[int, str]) -> None:
+    """Sets the level of the pylancom logger, e.g. "DEBUG"."""
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
 
 
-# Get the logger
-logger = get_logger()
+def add_log_handler(handler: logging.Handler) -> None:
+    """Adds a handler run on the log thread, e.g. a `RemoteLogHandler`."""
+    queue_handler.add_handler(handler)
+
+
+def remove_log_handler(handler: logging.Handler) -> None:
+    queue_handler.remove_handler(handler)
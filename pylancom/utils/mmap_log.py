@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import bisect
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import msgpack
+
+# segment header: magic, version and the end offset of the written data
+SEGMENT_HEADER = struct.Struct("!8sHxxxxxxQ")
+SEGMENT_MAGIC = b"LANCOMLG"
+SEGMENT_VERSION = 1
+# record header: timestamp, topic length and payload length
+RECORD_HEADER = struct.Struct("!dHI")
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+# one entry of the time index every INDEX_STRIDE records
+INDEX_STRIDE = 64
+
+
+class Record(NamedTuple):
+    timestamp: float
+    topic: str
+    # a view into the mapped segment, valid until the reader is closed
+    payload: memoryview
+
+
+class SegmentIndex:
+    """Time and topic index of one segment, stored next to it."""
+
+    def __init__(self) -> None:
+        self.start = 0.0
+        self.end = 0.0
+        self.count = 0
+        self.topics: Dict[str, int] = {}
+        self.times: List[float] = []
+        self.offsets: List[int] = []
+
+    def add(self, timestamp: float, topic: str, offset: int) -> None:
+        if self.count == 0:
+            self.start = timestamp
+        self.end = max(self.end, timestamp)
+        if self.count % INDEX_STRIDE == 0:
+            self.times.append(timestamp)
+            self.offsets.append(offset)
+        self.topics[topic] = self.topics.get(topic, 0) + 1
+        self.count += 1
+
+    def seek(self, timestamp: float) -> int:
+        """Returns an offset from which the records reach `timestamp`."""
+        i = bisect.bisect_right(self.times, timestamp) - 1
+        return self.offsets[max(i, 0)] if self.offsets else 0
+
+    def dumps(self) -> bytes:
+        return msgpack.dumps(
+            {
+                "start": self.start,
+                "end": self.end,
+                "count": self.count,
+                "topics": self.topics,
+                "times": self.times,
+                "offsets": self.offsets,
+            }
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> SegmentIndex:
+        raw = msgpack.loads(data)
+        index = cls()
+        index.start = raw["start"]
+        index.end = raw["end"]
+        index.count = raw["count"]
+        index.topics = raw["topics"]
+        index.times = raw["times"]
+        index.offsets = raw["offsets"]
+        return index
+
+
+def segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"segment_{number:05d}.lclog")
+
+
+def index_path(path: str) -> str:
+    return f"{path[: -len('.lclog')]}.idx"
+
+
+class SegmentWriter:
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = size
+        self.file = open(path, "w+b")
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        self.offset = SEGMENT_HEADER.size
+        self.index = SegmentIndex()
+        self.commit()
+
+    def fits(self, length: int) -> bool:
+        return self.offset + length <= self.size
+
+    def append(self, timestamp: float, topic: bytes, payload: bytes) -> None:
+        start = self.offset
+        end = start + RECORD_HEADER.size + len(topic) + len(payload)
+        RECORD_HEADER.pack_into(
+            self.mmap, start, timestamp, len(topic), len(payload)
+        )
+        topic_start = start + RECORD_HEADER.size
+        self.mmap[topic_start : topic_start + len(topic)] = topic
+        self.mmap[topic_start + len(topic) : end] = payload
+        self.offset = end
+        self.index.add(timestamp, topic.decode(), start)
+        self.commit()
+
+    def commit(self) -> None:
+        # the header tells readers and the recovery how far data is valid
+        SEGMENT_HEADER.pack_into(
+            self.mmap, 0, SEGMENT_MAGIC, SEGMENT_VERSION, self.offset
+        )
+
+    def close(self) -> None:
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.truncate(self.offset)
+        self.file.close()
+        with open(index_path(self.path), "wb") as f:
+            f.write(self.index.dumps())
+
+
+class LogWriter:
+    """Appends `[timestamp, topic, payload]` records to a segmented log."""
+
+    def __init__(
+        self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE
+    ) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        self.number = len(list_segments(directory))
+        self.segment: Optional[SegmentWriter] = None
+
+    def write(self, timestamp: float, topic: str, payload: bytes) -> None:
+        topic_bytes = topic.encode()
+        length = RECORD_HEADER.size + len(topic_bytes) + len(payload)
+        if self.segment is None or not self.segment.fits(length):
+            self.roll(length)
+        assert self.segment is not None
+        self.segment.append(timestamp, topic_bytes, payload)
+
+    def roll(self, length: int) -> None:
+        if self.segment is not None:
+            self.segment.close()
+        size = max(self.segment_size, SEGMENT_HEADER.size + length)
+        self.segment = SegmentWriter(
+            segment_path(self.directory, self.number), size
+        )
+        self.number += 1
+
+    def close(self) -> None:
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+
+class SegmentReader:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        magic, version, self.end = SEGMENT_HEADER.unpack_from(self.mmap, 0)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise ValueError(f"{path} is not a PyLanCom log segment")
+        if os.path.exists(index_path(path)):
+            with open(index_path(path), "rb") as f:
+                self.index = SegmentIndex.loads(f.read())
+        else:
+            # the recorder did not close the segment, rebuild its index
+            self.index = SegmentIndex()
+            for offset, record in self.scan(SEGMENT_HEADER.size):
+                self.index.add(record.timestamp, record.topic, offset)
+
+    def scan(self, offset: int) -> Iterator[Tuple[int, Record]]:
+        view = self.view
+        while offset < self.end:
+            timestamp, topic_len, payload_len = RECORD_HEADER.unpack_from(
+                view, offset
+            )
+            topic_start = offset + RECORD_HEADER.size
+            payload_start = topic_start + topic_len
+            topic = bytes(view[topic_start:payload_start]).decode()
+            payload = view[payload_start : payload_start + payload_len]
+            yield offset, Record(timestamp, topic, payload)
+            offset = payload_start + payload_len
+
+    def close(self) -> None:
+        try:
+            self.view.release()
+            self.mmap.close()
+        except BufferError:
+            # payload views are still alive, the map goes with the last one
+            pass
+        self.file.close()
+
+
+def list_segments(directory: str) -> List[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(".lclog")
+    )
+
+
+class LogReader:
+    """Reads the records of a segmented log without copying them."""
+
+    def __init__(self, directory: str) -> None:
+        self.segments = [SegmentReader(p) for p in list_segments(directory)]
+
+    @property
+    def start(self) -> float:
+        starts = [s.index.start for s in self.segments if s.index.count]
+        return min(starts, default=0.0)
+
+    @property
+    def end(self) -> float:
+        return max((s.index.end for s in self.segments), default=0.0)
+
+    def topics(self) -> Dict[str, int]:
+        topics: Dict[str, int] = {}
+        for segment in self.segments:
+            for topic, count in segment.index.topics.items():
+                topics[topic] = topics.get(topic, 0) + count
+        return topics
+
+    def read(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        topics: Optional[Set[str]] = None,
+    ) -> Iterator[Record]:
+        """Yields the records between the `start` and `end` timestamps."""
+        for segment in self.segments:
+            index = segment.index
+            if index.count == 0:
+                continue
+            if start is not None and index.end < start:
+                continue
+            if end is not None and index.start > end:
+                continue
+            if topics is not None and not topics.intersection(index.topics):
+                continue
+            offset = SEGMENT_HEADER.size
+            if start is not None:
+                offset = max(offset, index.seek(start))
+            for _, record in segment.scan(offset):
+                if start is not None and record.timestamp < start:
+                    continue
+                if end is not None and record.timestamp > end:
+                    break
+                if topics is None or record.topic in topics:
+                    yield record
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
@@ -3,13 +3,16 @@ import hashlib
 import socket
 import struct
 import uuid
+from typing import List, NamedTuple, Optional, Tuple
 
 import zmq
 import zmq.asyncio
 
 from ..config import __VERSION_BYTES__
+from ..errors import DeadlineExceededError, RequestTimeoutError, ServiceError
 from ..lancom_type import HashIdentifier, IPAddress, LanComMsg, Port
-from .log import logger
+from . import netem
+from .name_filter import NAME_FILTER_SIZE
 
 
 def create_hash_identifier() -> HashIdentifier:
@@ -28,25 +31,106 @@ def create_sha256(s: str):
     return hashlib.sha256(s.encode()).hexdigest()
 
 
-def create_heartbeat_message(node_id: str, port: Port, info_id: int) -> bytes:
+# magic, heartbeat format, package version, flags, raw node id, node port,
+# info id and the `NameFilter` of the socket names
+HEARTBEAT = struct.Struct(f"!4sB3sB16sHI{NAME_FILTER_SIZE}s")
+HEARTBEAT_MAGIC = b"LCHB"
+HEARTBEAT_FORMAT = 2
+# the heartbeat is followed by the msgpack encoded node info
+INLINE_INFO_FLAG = 0x01
+# the node info is only carried by the heartbeats up to this size
+HEARTBEAT_INLINE_SIZE = 512
+
+
+class Heartbeat(NamedTuple):
+    version: bytes
+    flags: int
+    node_id: HashIdentifier
+    port: Port
+    info_id: int
+    names: bytes
+    node_info: Optional[bytes]
+
+
+def create_heartbeat_message(
+    node_id: HashIdentifier,
+    port: Port,
+    info_id: int,
+    names: bytes = bytes(NAME_FILTER_SIZE),
+    node_info: Optional[bytes] = None,
+) -> bytes:
     """
-    Constructs the full SDP heartbeat message efficiently using join().
-
-    - `node_id`: The generated NodeID.
-    - `version`: A 3-byte version string (default: "001").
+    Packs the binary heartbeat of a node.
 
-    Returns:
-        A complete SDP heartbeat message in bytes.
+    - `names`: the `NameFilter` of its topic and service names.
+    - `node_info`: the encoded node info, carried inline when it is
+      small enough so the receivers do not need to fetch it.
     """
-    return b"".join(
-        [
-            b"LANCOM",  # 6-byte header
-            __VERSION_BYTES__,  # 3-byte version
-            node_id.encode(),  # 36-byte NodeID
-            port.to_bytes(2, "big"),  # 2-byte port
-            info_id.to_bytes(4, "big"),  # 4-byte timestamp
-        ]
+    flags = 0
+    if node_info is not None and len(node_info) <= HEARTBEAT_INLINE_SIZE:
+        flags |= INLINE_INFO_FLAG
+    else:
+        node_info = None
+    header = HEARTBEAT.pack(
+        HEARTBEAT_MAGIC,
+        HEARTBEAT_FORMAT,
+        __VERSION_BYTES__,
+        flags,
+        uuid.UUID(node_id).bytes,
+        port,
+        info_id,
+        names,
     )
+    return header + node_info if node_info is not None else header
+
+
+def get_heartbeat_header(data: bytes) -> bytes:
+    """The fixed part of a heartbeat, the same until the node changes."""
+    return data[: HEARTBEAT.size]
+
+
+def parse_heartbeat(data: bytes) -> Optional[Heartbeat]:
+    """Unpacks a heartbeat, None for other datagrams and formats."""
+    if len(data) < HEARTBEAT.size or data[:4] != HEARTBEAT_MAGIC:
+        return None
+    (
+        magic,
+        fmt,
+        version,
+        flags,
+        raw_id,
+        port,
+        info_id,
+        names,
+    ) = HEARTBEAT.unpack_from(data)
+    if fmt != HEARTBEAT_FORMAT:
+        return None
+    node_info = data[HEARTBEAT.size :] if flags & INLINE_INFO_FLAG else None
+    node_id = str(uuid.UUID(bytes=raw_id))
+    return Heartbeat(version, flags, node_id, port, info_id, names, node_info)
+
+
+# flags of the optional header frame appended to topic messages
+LATCHED_FLAG = 0x01
+RELIABLE_FLAG = 0x02
+# the message frame is a msgpack list of messages
+BATCH_FLAG = 0x04
+MESSAGE_HEADER = struct.Struct("!B16sQ")
+
+
+def pack_message_header(flags: int, socket_id: bytes, seq: int) -> bytes:
+    """
+    Packs the header frame of a sequenced topic message.
+
+    - `flags`: 1-byte feature flags of the publisher.
+    - `socket_id`: 16-byte raw UUID of the publisher.
+    - `seq`: 8-byte sequence number of the message.
+    """
+    return MESSAGE_HEADER.pack(flags, socket_id, seq)
+
+
+def unpack_message_header(frame: bytes) -> Tuple[int, bytes, int]:
+    return MESSAGE_HEADER.unpack(frame)
 
 
 def get_socket_port(socket: zmq.asyncio.Socket) -> int:
@@ -54,6 +138,15 @@ def get_socket_port(socket: zmq.asyncio.Socket) -> int:
     return int(endpoint.decode().split(":")[-1])
 
 
+def split_envelope(frames: List[bytes]) -> Tuple[List[bytes], List[bytes]]:
+    """
+    Split a message received on a ROUTER socket into its routing envelope
+    (identities plus the empty delimiter frame) and the message body.
+    """
+    delimiter = frames.index(b"")
+    return frames[: delimiter + 1], frames[delimiter + 1 :]
+
+
 def calculate_broadcast_addr(ip_addr: IPAddress) -> IPAddress:
     ip_bin = struct.unpack("!I", socket.inet_aton(ip_addr))[0]
     netmask_bin = struct.unpack("!I", socket.inet_aton("255.255.255.0"))[0]
@@ -61,21 +154,74 @@ def calculate_broadcast_addr(ip_addr: IPAddress) -> IPAddress:
     return socket.inet_ntoa(struct.pack("!I", broadcast_bin))
 
 
+def pack_deadline(budget: float) -> bytes:
+    """Encodes the remaining time budget of a request in seconds."""
+    return struct.pack("!d", budget)
+
+
+def unpack_deadline(frame: bytes) -> float:
+    return struct.unpack("!d", frame)[0]
+
+
+async def emulate_request(
+    emulator: netem.NetworkEmulator,
+    sock: zmq.asyncio.Socket,
+    addr: str,
+    frames: List[bytes],
+) -> List[bytes]:
+    """The round trip of a request over the emulated link."""
+    ip = addr.split("//")[-1].rsplit(":", 1)[0]
+    await emulator.transmit(ip, sum(len(frame) for frame in frames))
+    await sock.send_multipart(frames)
+    reply = await sock.recv_multipart()
+    await emulator.transmit(ip, sum(len(frame) for frame in reply))
+    return reply
+
+
 async def send_bytes_request(
-    addr: str, service_name: str, bytes_msgs: bytes, timeout: float = 1.0
+    addr: str,
+    service_name: str,
+    bytes_msgs: bytes,
+    timeout: float = 1.0,
+    deadline: Optional[float] = None,
 ) -> bytes:
-    response = LanComMsg.TIMEOUT.value.encode()
+    """
+    Sends a request and waits for the response payload.
+
+    `deadline` is the remaining time budget in seconds. It is sent along
+    with the request so the server can drop it once it has expired.
+
+    Raises:
+        RequestTimeoutError: No response was received within `timeout`.
+        DeadlineExceededError: The server dropped the expired request.
+        ServiceError: The service failed to handle the request.
+    """
+    frames = [service_name.encode(), bytes_msgs]
+    if deadline is not None:
+        frames.append(pack_deadline(deadline))
+    sock = zmq.asyncio.Context.instance().socket(zmq.REQ)
+    # do not block on pending messages to a peer that is gone
+    sock.setsockopt(zmq.LINGER, 0)
     try:
-        sock = zmq.asyncio.Context().socket(zmq.REQ)
         sock.connect(addr)
-        # Send the message; you can also wrap this in wait_for if needed.
-        await sock.send_multipart([service_name.encode(), bytes_msgs])
-
-        # Wait for a response with a timeout.
-        response = await asyncio.wait_for(sock.recv(), timeout=timeout)
+        if netem.active is None:
+            await sock.send_multipart(frames)
+            reply = sock.recv_multipart()
+        else:
+            reply = emulate_request(netem.active, sock, addr, frames)
+        status, response = await asyncio.wait_for(reply, timeout=timeout)
     except asyncio.TimeoutError:
-        logger.error(f"Request {service_name} timed out for {timeout} s.")
+        raise RequestTimeoutError(
+            f"Request {service_name} timed out for {timeout} s."
+        ) from None
     finally:
-        sock.disconnect(addr)
         sock.close()
+    if status == LanComMsg.SUCCESS.value.encode():
         return response
+    if status == LanComMsg.EXPIRED.value.encode():
+        raise DeadlineExceededError(
+            f"Request {service_name} expired before it was handled"
+        )
+    if status == LanComMsg.TIMEOUT.value.encode():
+        raise RequestTimeoutError(f"Service {service_name} took too long")
+    raise ServiceError(f"Service {service_name} failed: {response.decode()}")
@@ -0,0 +1,41 @@
+import hashlib
+
+# 256 bits, one byte of the hash picks a bit
+NAME_FILTER_SIZE = 32
+NAME_FILTER_HASHES = 3
+
+
+def topic_key(name: str) -> str:
+    return f"t:{name}"
+
+
+def service_key(name: str) -> str:
+    return f"s:{name}"
+
+
+class NameFilter:
+    """Bloom filter of the topic and service names of a node.
+
+    Carried by the heartbeats so the receivers can tell whether a node may
+    have a socket they need before fetching its info. About 1% of the
+    lookups are false positives with 20 names.
+    """
+
+    def __init__(self, data: bytes = b"") -> None:
+        self.bits = int.from_bytes(data, "big")
+
+    @staticmethod
+    def positions(key: str) -> bytes:
+        return hashlib.blake2b(
+            key.encode(), digest_size=NAME_FILTER_HASHES
+        ).digest()
+
+    def add(self, key: str) -> None:
+        for position in self.positions(key):
+            self.bits |= 1 << position
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits >> p & 1 for p in self.positions(key))
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes(NAME_FILTER_SIZE, "big")
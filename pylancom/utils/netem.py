@@ -0,0 +1,148 @@
+"""Emulates a bad network between the nodes, for tests on localhost.
+
+The messages entering this process, heartbeats, topic messages and
+request round trips, are delayed, dropped, reordered and rate limited
+like on a real link. Nothing changes until an emulator is installed:
+
+    emulator = NetworkEmulator(LinkProfile(delay=0.02, loss=0.05))
+    install(emulator)
+    ...
+    uninstall()
+
+The child processes of a test pick it up from the `LANCOM_NETEM`
+environment variable, e.g. "delay=0.02,jitter=0.005,loss=0.05".
+Profiles of single remote addresses, e.g. a node on 127.0.0.2, override
+the default one. The messages between the nodes of one process, which
+are handed over without the sockets, are not affected.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+NETEM_ENV = "LANCOM_NETEM"
+
+
+class LinkProfile(NamedTuple):
+    # seconds every message is delayed by, plus or minus the jitter
+    delay: float = 0.0
+    jitter: float = 0.0
+    # probability a message is dropped
+    loss: float = 0.0
+    # probability a message skips the delay, overtaking the previous ones
+    reorder: float = 0.0
+    # bytes per second, 0 for no limit
+    bandwidth: float = 0.0
+
+    @staticmethod
+    def from_string(text: str) -> LinkProfile:
+        """Parses "delay=0.02,loss=0.05" like profiles."""
+        values = {}
+        for item in text.split(","):
+            if item.strip():
+                key, value = item.split("=")
+                values[key.strip()] = float(value)
+        return LinkProfile(**values)
+
+
+class LinkEmulator:
+    """Decides the fate of the messages on one link."""
+
+    def __init__(self, profile: LinkProfile, seed: Optional[int] = None):
+        self.profile = profile
+        self.random = random.Random(seed)
+        # the time the link is busy until with the previous messages
+        self.busy_until = 0.0
+        self.delivered = 0
+        self.dropped = 0
+
+    def schedule(self, size: int) -> Optional[float]:
+        """Returns the delay of a message, None when it is dropped."""
+        profile = self.profile
+        if profile.loss > 0 and self.random.random() < profile.loss:
+            self.dropped += 1
+            return None
+        self.delivered += 1
+        delay = 0.0
+        if profile.bandwidth > 0:
+            now = time.monotonic()
+            self.busy_until = max(self.busy_until, now)
+            self.busy_until += size / profile.bandwidth
+            delay = self.busy_until - now
+        if profile.reorder > 0 and self.random.random() < profile.reorder:
+            return delay
+        if profile.jitter > 0:
+            jitter = self.random.uniform(-profile.jitter, profile.jitter)
+            return delay + max(profile.delay + jitter, 0.0)
+        return delay + profile.delay
+
+
+class NetworkEmulator:
+    """Applies link profiles to the messages received by this process."""
+
+    def __init__(
+        self, profile: LinkProfile = LinkProfile(), seed: Optional[int] = None
+    ) -> None:
+        self.seed = seed
+        self.default = LinkEmulator(profile, seed)
+        self.links: Dict[str, LinkEmulator] = {}
+
+    def set_profile(self, profile: LinkProfile, ip: Optional[str] = None):
+        """Sets the default profile, or the one of a remote address."""
+        if ip is None:
+            self.default = LinkEmulator(profile, self.seed)
+        else:
+            self.links[ip] = LinkEmulator(profile, self.seed)
+
+    def get_link(self, ip: Optional[str]) -> LinkEmulator:
+        if ip is None:
+            return self.default
+        return self.links.get(ip, self.default)
+
+    def deliver(
+        self,
+        ip: Optional[str],
+        size: int,
+        callback: Callable[..., Any],
+        *args: Any,
+    ) -> None:
+        """Calls back with the message when it arrives, on the loop."""
+        delay = self.get_link(ip).schedule(size)
+        if delay is None:
+            return
+        if delay <= 0:
+            callback(*args)
+        else:
+            asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    async def transmit(self, ip: Optional[str], size: int) -> None:
+        """Waits for a message to arrive, forever when it is dropped."""
+        delay = self.get_link(ip).schedule(size)
+        if delay is None:
+            await asyncio.Event().wait()
+        elif delay > 0:
+            await asyncio.sleep(delay)
+
+
+# the emulator of the process, None on a perfect network
+active: Optional[NetworkEmulator] = None
+
+
+def install(emulator: NetworkEmulator) -> None:
+    global active
+    active = emulator
+
+
+def uninstall() -> None:
+    global active
+    active = None
+
+
+def install_from_env() -> None:
+    text = os.environ.get(NETEM_ENV)
+    if text and active is None:
+        install(NetworkEmulator(LinkProfile.from_string(text)))
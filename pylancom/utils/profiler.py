@@ -0,0 +1,175 @@
+"""Timing of the user callbacks, loop lag monitor and sampling profiler.
+
+The callbacks of the subscribers, services and streamers are always
+timed, a few hundred nanoseconds per call. The sampling profiler only
+runs on demand, e.g. on a PROFILE request from another node.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from .log import logger
+
+# event loop stalls longer than this are logged, e.g. LANCOM_LOOP_LAG=0.05
+LOOP_LAG_ENV = "LANCOM_LOOP_LAG"
+LOOP_LAG_THRESHOLD = 0.1
+LOOP_LAG_INTERVAL = 0.05
+# the profile is returned within the timeout of the node requests
+MAX_PROFILE_DURATION = 1.5
+PROFILE_INTERVAL = 0.001
+# the most frequent stacks returned by a profile
+MAX_STACKS = 50
+# the leaf frames of the idle threads, waiting for a lock, a task or
+# the selector of the loop
+IDLE_FILES = ("threading.py", "thread.py", "queue.py", "selectors.py")
+
+
+class CallbackStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def to_list(self) -> List[float]:
+        return [self.count, self.total, self.max]
+
+
+class CallbackTimings:
+    """Calls, total and maximal duration of every user callback.
+
+    The callbacks are wrapped once, when their socket is created, and
+    timed on whichever thread calls them.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, CallbackStats] = {}
+        self.lock = threading.Lock()
+
+    def record(self, name: str, duration: float) -> None:
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = CallbackStats()
+            stats.count += 1
+            stats.total += duration
+            if duration > stats.max:
+                stats.max = duration
+
+    def wrap(self, name: str, callback: Callable) -> Callable:
+        """Times `callback`, a coroutine function stays one."""
+        if asyncio.iscoroutinefunction(callback):
+
+            @functools.wraps(callback)
+            async def timed_async(*args: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await callback(*args)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+
+            return timed_async
+
+        @functools.wraps(callback)
+        def timed(*args: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        return timed
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        """[calls, total seconds, max seconds] by callback name."""
+        with self.lock:
+            return {
+                name: stats.to_list() for name, stats in self.stats.items()
+            }
+
+
+class LoopLagMonitor:
+    """Flags the stalls of the event loop, e.g. a blocking callback.
+
+    A task wakes up every `interval` seconds and measures how late it
+    is, the lags above `threshold` are logged as warnings.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        interval: float = LOOP_LAG_INTERVAL,
+    ) -> None:
+        if threshold is None:
+            threshold = float(
+                os.environ.get(LOOP_LAG_ENV, str(LOOP_LAG_THRESHOLD))
+            )
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    async def run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - start - self.interval
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > self.threshold:
+                self.stalls += 1
+                logger.warning("The event loop stalled for %.3f s", lag)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"stalls": self.stalls, "maxLag": self.max_lag}
+
+
+class SamplingProfiler:
+    """Samples the stacks of the other threads of the process.
+
+    The stacks are aggregated in the collapsed format of the flame graph
+    tools, "thread;outer (file:line);...;inner (file:line)", and the
+    idle threads are skipped.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+
+    def sample(self) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        current = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == current:
+                continue
+            if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(
+                    f"{code.co_name} ({filename}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, duration: float) -> Dict[str, Any]:
+        """Samples for `duration` seconds, blocking the calling thread."""
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            self.sample()
+            time.sleep(self.interval)
+        return {
+            "duration": duration,
+            "samples": self.samples,
+            "stacks": dict(self.stacks.most_common(MAX_STACKS)),
+        }
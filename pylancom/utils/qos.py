@@ -0,0 +1,53 @@
+"""Quality of service classes of the topics and services.
+
+Every class has sockets of its own on a node, so the messages of a class
+never queue behind the ones of another, and its own executor for the
+service callbacks. The requests of a lower class wait until the ones of
+the higher classes are handled.
+"""
+
+from enum import Enum
+from typing import Dict, List, NamedTuple
+
+import zmq
+
+
+class QoS(Enum):
+    # in the order of their priority
+    REALTIME = "realtime"
+    NORMAL = "normal"
+    BULK = "bulk"
+
+
+class QoSSettings(NamedTuple):
+    # messages queued per socket and peer before they are dropped
+    hwm: int
+    # IP type of service of the packets, the DSCP class shifted by 2
+    tos: int
+    # threads of the executor running the service callbacks
+    workers: int
+
+
+QOS_SETTINGS: Dict[QoS, QoSSettings] = {
+    # a few fresh messages rather than a backlog of stale ones, DSCP EF
+    QoS.REALTIME: QoSSettings(hwm=100, tos=0xB8, workers=4),
+    # the defaults of zmq and of the executor
+    QoS.NORMAL: QoSSettings(hwm=1000, tos=0, workers=10),
+    # large transfers in the background, DSCP CS1
+    QoS.BULK: QoSSettings(hwm=10000, tos=0x20, workers=2),
+}
+
+
+def higher_classes(qos: QoS) -> List[QoS]:
+    """The classes which take precedence over `qos`."""
+    classes = list(QoS)
+    return classes[: classes.index(qos)]
+
+
+def configure_socket(zmq_socket: zmq.Socket, qos: QoS) -> None:
+    """Sets the queue sizes and the type of service of a new socket."""
+    settings = QOS_SETTINGS[qos]
+    zmq_socket.setsockopt(zmq.SNDHWM, settings.hwm)
+    zmq_socket.setsockopt(zmq.RCVHWM, settings.hwm)
+    if settings.tos:
+        zmq_socket.setsockopt(zmq.TOS, settings.tos)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import Any, NamedTuple, Optional
+
+# starts the topics of the throttled streams, no topic pattern matches it
+THROTTLE_PREFIX = "\x01"
+
+
+class ThrottleMode(Enum):
+    # at most `value` messages per second, the first one of each period
+    RATE = "rate"
+    # at most `value` messages per second, always ending with the latest
+    LATEST = "latest"
+    # every `value`-th message
+    NTH = "nth"
+
+
+class Throttle(NamedTuple):
+    """The rate a subscriber wants to receive a topic at.
+
+    The publisher sends the messages of every throttle class to its own
+    topic, the subscribers of that class only receive the selected ones.
+    """
+
+    mode: ThrottleMode
+    value: float
+
+    @staticmethod
+    def create(mode: ThrottleMode, value: float) -> Throttle:
+        if not value > 0:
+            raise ValueError(f"Throttle {mode.value} must be positive")
+        return Throttle(mode, value)
+
+    @staticmethod
+    def max_rate(rate: float) -> Throttle:
+        return Throttle.create(ThrottleMode.RATE, rate)
+
+    @staticmethod
+    def latest(rate: float) -> Throttle:
+        return Throttle.create(ThrottleMode.LATEST, rate)
+
+    @staticmethod
+    def every_nth(n: int) -> Throttle:
+        return Throttle.create(ThrottleMode.NTH, n)
+
+    def to_string(self) -> str:
+        return f"{self.mode.value}:{self.value:g}"
+
+    @staticmethod
+    def from_string(text: str) -> Throttle:
+        mode, value = text.split(":")
+        return Throttle.create(ThrottleMode(mode), float(value))
+
+    def topic(self, name: str) -> str:
+        return f"{THROTTLE_PREFIX}{self.to_string()}/{name}"
+
+
+def is_throttled_topic(topic: str) -> bool:
+    return topic.startswith(THROTTLE_PREFIX)
+
+
+class SendSchedule:
+    """Selects the messages of a publisher sent to one throttle class.
+
+    `LATEST` sends the first message of a period right away and keeps the
+    following ones, the latest of them is sent when the period is over.
+    """
+
+    def __init__(self, throttle: Throttle, name: str) -> None:
+        self.throttle = throttle
+        self.topic_bytes = throttle.topic(name).encode()
+        self.interval = 0.0
+        if throttle.mode is not ThrottleMode.NTH:
+            self.interval = 1.0 / throttle.value
+        self.count = 0
+        self.next_time = 0.0
+        # the message kept for the end of the period and its send task
+        self.latest: Optional[Any] = None
+        self.flush: Optional[Any] = None
+
+    def accept(self, now: float) -> bool:
+        if self.throttle.mode is ThrottleMode.NTH:
+            self.count += 1
+            if self.count < self.throttle.value:
+                return False
+            self.count = 0
+            return True
+        if now < self.next_time:
+            return False
+        self.next_time = now + self.interval
+        return True
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import fnmatch
+import re
+from typing import Dict, List, Pattern, Union
+
+from ..lancom_type import HashIdentifier, SocketInfo, TopicName
+
+GLOB_CHARS = "*?["
+# matches any number of topic levels, including none
+ANY_LEVELS = "**"
+
+Segment = Union[str, Pattern[str]]
+
+
+def compile_segment(segment: str) -> Segment:
+    if segment == ANY_LEVELS or not any(c in segment for c in GLOB_CHARS):
+        return segment
+    return re.compile(fnmatch.translate(segment))
+
+
+def match_segment(segment: Segment, name: str) -> bool:
+    if isinstance(segment, str):
+        return segment == name
+    return segment.match(name) is not None
+
+
+class TopicPattern:
+    """A compiled glob pattern over "/" separated topic names.
+
+    `*`, `?` and `[...]` match within one level, a `**` level matches any
+    number of levels, e.g. "robot1/*/image" or "robot1/**".
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+        self.segments = [compile_segment(s) for s in pattern.split("/")]
+        # the literal start of the pattern, used as the zmq filter
+        first_glob = min(
+            (pattern.index(c) for c in GLOB_CHARS if c in pattern),
+            default=len(pattern),
+        )
+        prefix = pattern[:first_glob]
+        glob_level = pattern[first_glob:].split("/")[0]
+        # a `**` level also matches no level, "robot1/**" matches "robot1"
+        if glob_level == ANY_LEVELS and prefix.endswith("/"):
+            prefix = prefix[:-1]
+        self.prefix = prefix
+
+    def matches(self, topic: TopicName) -> bool:
+        return self.match_levels(topic.split("/"), 0, 0)
+
+    def match_levels(self, levels: List[str], i: int, j: int) -> bool:
+        if i == len(self.segments):
+            return j == len(levels)
+        segment = self.segments[i]
+        if segment == ANY_LEVELS:
+            return any(
+                self.match_levels(levels, i + 1, k)
+                for k in range(j, len(levels) + 1)
+            )
+        if j == len(levels) or not match_segment(segment, levels[j]):
+            return False
+        return self.match_levels(levels, i + 1, j + 1)
+
+
+class TopicTrieNode:
+    __slots__ = ("children", "sockets")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, TopicTrieNode] = {}
+        self.sockets: Dict[HashIdentifier, SocketInfo] = {}
+
+
+class TopicTrie:
+    """Index of the sockets by topic name, one trie level per topic level.
+
+    Exact lookups cost one dict access per level and pattern lookups only
+    walk the branches the pattern can match.
+    """
+
+    def __init__(self) -> None:
+        self.root = TopicTrieNode()
+
+    def insert(self, info: SocketInfo) -> None:
+        node = self.root
+        for level in info["name"].split("/"):
+            node = node.children.setdefault(level, TopicTrieNode())
+        node.sockets[info["socketID"]] = info
+
+    def remove(self, info: SocketInfo) -> None:
+        path = [self.root]
+        levels = info["name"].split("/")
+        for level in levels:
+            child = path[-1].children.get(level)
+            if child is None:
+                return
+            path.append(child)
+        path[-1].sockets.pop(info["socketID"], None)
+        # prune the branches left empty
+        for level, parent, node in zip(
+            reversed(levels), reversed(path[:-1]), reversed(path[1:])
+        ):
+            if node.sockets or node.children:
+                break
+            parent.children.pop(level)
+
+    def get(self, topic: TopicName) -> List[SocketInfo]:
+        node = self.root
+        for level in topic.split("/"):
+            child = node.children.get(level)
+            if child is None:
+                return []
+            node = child
+        return list(node.sockets.values())
+
+    def match(self, pattern: TopicPattern) -> List[SocketInfo]:
+        found: Dict[HashIdentifier, SocketInfo] = {}
+        self.match_node(self.root, pattern.segments, 0, found)
+        return list(found.values())
+
+    def match_node(
+        self,
+        node: TopicTrieNode,
+        segments: List[Segment],
+        i: int,
+        found: Dict[HashIdentifier, SocketInfo],
+    ) -> None:
+        if i == len(segments):
+            found.update(node.sockets)
+            return
+        segment = segments[i]
+        if segment == ANY_LEVELS:
+            self.match_node(node, segments, i + 1, found)
+            for child in node.children.values():
+                self.match_node(child, segments, i, found)
+        elif isinstance(segment, str):
+            child = node.children.get(segment)
+            if child is not None:
+                self.match_node(child, segments, i + 1, found)
+        else:
+            for name, child in node.children.items():
+                if segment.match(name) is not None:
+                    self.match_node(child, segments, i + 1, found)
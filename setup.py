@@ -1,9 +1,17 @@
-from setuptools import setup
+from setuptools import find_namespace_packages, setup
 
 setup(
     name="pylancom",
     version="1.0.1",
     install_requires=["zmq", "colorama", "msgpack"],
+    extras_require={"uvloop": ["uvloop"]},
     include_package_data=True,
-    packages=["pylancom"],
+    packages=find_namespace_packages(include=["pylancom", "pylancom.*"]),
+    entry_points={
+        "console_scripts": [
+            "lancom-record=pylancom.tools.record:main",
+            "lancom-replay=pylancom.tools.replay:main",
+            "lancom-top=pylancom.tools.top:main",
+        ],
+    },
 )
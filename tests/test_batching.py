@@ -0,0 +1,68 @@
+import multiprocessing as mp
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7860
+
+
+def run_publisher(started: mp.Event) -> None:
+    node = LanComNode(
+        "BatchPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    # flushed by the interval, long enough for all the messages
+    publisher = Publisher(
+        "batched", batch_size=1 << 20, batch_interval=0.5, node=node
+    )
+    while not node.has_subscriber(publisher.topic_bytes):
+        time.sleep(0.01)
+    # give the second subscriber some time to connect too
+    time.sleep(0.5)
+    for i in range(10):
+        publisher.publish_string(str(i))
+    started.set()
+    time.sleep(1.0)
+    node.close()
+
+
+def test_batching():
+    # the publisher runs in another process to go through the sockets
+    ctx = mp.get_context("spawn")
+    started = ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(started,))
+    node = LanComNode(
+        "BatchSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+    try:
+        messages, batches = [], []
+        Subscriber("batched", StrDecoder, messages.append, node=node)
+        Subscriber(
+            "batched",
+            StrDecoder,
+            messages.append,
+            batch_callback=batches.append,
+            node=node,
+        )
+        process.start()
+        assert started.wait(10.0)
+        assert wait_for(lambda: len(messages) == 10 and batches)
+        assert messages == [str(i) for i in range(10)]
+        assert batches == [[str(i) for i in range(10)]]
+    finally:
+        process.join(5.0)
+        node.close()
+
+
+if __name__ == "__main__":
+    test_batching()
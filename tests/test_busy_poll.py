@@ -0,0 +1,110 @@
+import multiprocessing as mp
+import threading
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Service, Subscriber
+from pylancom.nodes.runtime import new_event_loop
+from pylancom.utils.msg import get_socket_port, send_bytes_request
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+BASE_PORT = 7897
+
+
+def test_unknown_event_loop():
+    try:
+        new_event_loop("trio")
+        assert False, "trio is not an asyncio event loop"
+    except ValueError:
+        pass
+
+
+def test_busy_poll_service():
+    node = LanComNode("BusyServer", "127.0.0.1", multicast_port=BASE_PORT)
+    threads = []
+
+    def upper(msg: str) -> str:
+        threads.append(threading.current_thread().name)
+        if msg == "fail":
+            raise ValueError("failed on purpose")
+        return msg.upper()
+
+    service = Service(
+        "busy/upper", StrDecoder, StrEncoder, upper, busy_poll=True, node=node
+    )
+    # a socket of its own, not the shared service socket of the node
+    assert service.info["port"] != get_socket_port(node.service_socket)
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+    try:
+        response = node.submit_loop_task(
+            send_bytes_request(addr, "busy/upper", b"hello"), True
+        )
+        assert response == b"HELLO"
+        assert threads == ["lancom-busy-poll"]
+        try:
+            node.submit_loop_task(
+                send_bytes_request(addr, "busy/upper", b"fail"), True
+            )
+            assert False, "the service failed"
+        except Exception as e:
+            assert "failed on purpose" in str(e)
+    finally:
+        service.shutdown()
+        node.close()
+
+
+def run_publisher(stop: mp.Event) -> None:
+    node = LanComNode(
+        "BusyPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 2}"],
+        multicast_port=BASE_PORT + 1,
+    )
+    publisher = Publisher("busy/topic", node=node)
+    while not stop.is_set():
+        publisher.publish_string("ping")
+        time.sleep(0.01)
+    node.close()
+
+
+def test_busy_poll_subscriber():
+    # the publisher runs in another process to go through the sockets
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(stop,))
+    process.start()
+    node = LanComNode(
+        "BusySubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 2,
+    )
+    threads = []
+
+    def receive(msg: str) -> None:
+        threads.append(threading.current_thread().name)
+
+    try:
+        subscriber = Subscriber(
+            "busy/topic", StrDecoder, receive, busy_poll=True, node=node
+        )
+        assert wait_for(lambda: len(threads) > 5, 10.0)
+        assert set(threads) == {"lancom-busy-poll"}
+        subscriber.shutdown()
+        time.sleep(0.1)
+        count = len(threads)
+        time.sleep(0.1)
+        assert len(threads) == count
+    finally:
+        stop.set()
+        process.join()
+        node.close()
+
+
+if __name__ == "__main__":
+    test_unknown_event_loop()
+    test_busy_poll_service()
+    test_busy_poll_subscriber()
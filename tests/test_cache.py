@@ -0,0 +1,53 @@
+import asyncio
+
+from pylancom.utils.cache import ResponseCache, create_cache_key
+
+
+def test_cache_hit_and_version_invalidation():
+    cache = ResponseCache()
+    key = create_cache_key("service", b"request")
+    cache.put(key, b"response", 10.0, "v1")
+    assert cache.get(key, "v1") == b"response"
+    assert cache.get(key, "v2") is None
+    # the stale entry has been evicted
+    assert cache.get(key, "v1") is None
+
+
+def test_cache_expiry_and_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    keys = [create_cache_key("service", bytes([i])) for i in range(3)]
+    cache.put(keys[0], b"0", -1.0, None)
+    assert cache.get(keys[0], None) is None
+    for i, key in enumerate(keys):
+        cache.put(key, bytes([i]), 10.0, None)
+    assert cache.get(keys[0], None) is None
+    assert cache.get(keys[2], None) == bytes([2])
+
+
+def test_concurrent_requests_are_coalesced():
+    cache = ResponseCache()
+    key = create_cache_key("service", b"request")
+    calls = []
+
+    async def send_request() -> bytes:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"response"
+
+    async def main():
+        return await asyncio.gather(
+            *[
+                cache.get_or_request(key, 10.0, None, send_request)
+                for _ in range(5)
+            ]
+        )
+
+    assert asyncio.run(main()) == [b"response"] * 5
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    test_cache_hit_and_version_invalidation()
+    test_cache_expiry_and_lru_eviction()
+    test_concurrent_requests_are_coalesced()
+    print("All tests passed.")
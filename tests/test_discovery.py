@@ -0,0 +1,146 @@
+from typing import List
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.nodes.registry import Registry
+from pylancom.nodes.runtime import AnnounceTimer
+from pylancom.utils.serialization import StrDecoder
+
+# the nodes on different discovery ports have their own map of the nodes,
+# like nodes running in different processes
+BASE_PORT = 7800
+
+
+def know_each_other(nodes: List[LanComNode]) -> bool:
+    return all(
+        all(other.nodes_map.check_node(n.node_id) for n in nodes)
+        for other in nodes
+    )
+
+
+def test_announce_timer():
+    timer = AnnounceTimer(0.1, 1.0)
+    delays = [timer.next_delay() for _ in range(6)]
+    assert 0.05 <= delays[0] <= 0.1
+    assert 0.5 <= delays[-1] <= 1.0
+    timer.reset()
+    assert timer.next_delay() <= 0.1
+
+
+def test_unicast_peers():
+    # only the first node knows the address of the others
+    peers = [f"127.0.0.1:{BASE_PORT + i}" for i in range(1, 4)]
+    nodes = [
+        LanComNode(
+            "UnicastNode0",
+            "127.0.0.1",
+            multicast=False,
+            peers=peers,
+            multicast_port=BASE_PORT,
+        )
+    ]
+    try:
+        for i in range(1, 4):
+            nodes.append(
+                LanComNode(
+                    f"UnicastNode{i}",
+                    "127.0.0.1",
+                    multicast=False,
+                    multicast_port=BASE_PORT + i,
+                )
+            )
+        first = nodes[0]
+        assert wait_for(
+            lambda: all(first.nodes_map.check_node(n.node_id) for n in nodes)
+        )
+        assert all(n.nodes_map.check_node(first.node_id) for n in nodes)
+    finally:
+        for node in reversed(nodes):
+            node.close()
+
+
+def test_deferred_nodes():
+    publisher_node = LanComNode(
+        "DeferredPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 6}"],
+        multicast_port=BASE_PORT + 5,
+    )
+    # too many sockets for the info to be carried by the heartbeat
+    publishers = [
+        Publisher(f"deferred/topic{i}", node=publisher_node) for i in range(8)
+    ]
+    subscriber_node = LanComNode(
+        "DeferredSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 6,
+    )
+    try:
+        nodes_map = subscriber_node.nodes_map
+        node_id = publisher_node.node_id
+        # discovered, but nothing of interest was worth a fetch
+        assert wait_for(lambda: nodes_map.check_node(node_id))
+        assert node_id in nodes_map.deferred
+        assert node_id not in nodes_map.nodes_info
+        received = []
+        Subscriber(
+            "deferred/topic3",
+            StrDecoder,
+            received.append,
+            node=subscriber_node,
+        )
+        assert wait_for(lambda: node_id in nodes_map.nodes_info)
+
+        def publish() -> bool:
+            publishers[3].publish_string("hello")
+            return bool(received)
+
+        assert wait_for(publish)
+        assert received[0] == "hello"
+    finally:
+        subscriber_node.close()
+        publisher_node.close()
+
+
+def test_registry():
+    registry_node = LanComNode(
+        "RegistryNode", "127.0.0.1", multicast_port=BASE_PORT + 10
+    )
+    registry = Registry(registry_node, port=BASE_PORT + 11)
+    nodes = []
+    try:
+        for i in range(10):
+            nodes.append(
+                LanComNode(
+                    f"RegisteredNode{i}",
+                    "127.0.0.1",
+                    multicast=False,
+                    registry=f"127.0.0.1:{BASE_PORT + 11}",
+                    multicast_port=BASE_PORT + 12 + i,
+                )
+            )
+        assert wait_for(lambda: know_each_other(nodes))
+        # the closed nodes unregister
+        closed = nodes.pop()
+        closed.close()
+        assert wait_for(
+            lambda: not any(
+                n.nodes_map.check_node(closed.node_id) for n in nodes
+            )
+        )
+    finally:
+        for node in reversed(nodes):
+            node.close()
+        registry.close()
+        registry_node.close()
+
+
+if __name__ == "__main__":
+    test_announce_timer()
+    test_unicast_peers()
+    test_deferred_nodes()
+    test_registry()
@@ -0,0 +1,78 @@
+import asyncio
+import multiprocessing as mp
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7945
+LATCH = 20
+NUM_MESSAGES = 60
+
+
+class SlowSnapshotNode(LanComNode):
+    """Answers the snapshot requests late, the live messages go on."""
+
+    async def snapshot_cbs(self, request: bytes) -> bytes:
+        await asyncio.sleep(0.05)
+        return await super().snapshot_cbs(request)
+
+
+def run_publisher(latched: mp.Event, subscribed: mp.Event) -> None:
+    node = SlowSnapshotNode(
+        "LatchedPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    publisher = Publisher("latch/topic", latch=LATCH, node=node)
+    for i in range(10):
+        publisher.publish_string(str(i))
+    latched.set()
+    subscribed.wait(10.0)
+    for i in range(10, NUM_MESSAGES):
+        publisher.publish_string(str(i))
+        time.sleep(0.01)
+    time.sleep(0.5)
+    node.close()
+
+
+def test_late_subscriber():
+    ctx = mp.get_context("spawn")
+    latched, subscribed = ctx.Event(), ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(latched, subscribed))
+    process.start()
+    node = LanComNode(
+        "LateSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+    received = []
+    try:
+        assert latched.wait(10.0)
+        subscriber = Subscriber(
+            "latch/topic",
+            StrDecoder,
+            lambda msg: received.append(int(msg)),
+            node=node,
+        )
+        assert wait_for(lambda: subscriber.subscribed_components, 10.0)
+        subscribed.set()
+        assert wait_for(lambda: received[-1:] == [NUM_MESSAGES - 1])
+        # the latched messages published before the subscriber came, then
+        # the live ones buffered meanwhile, also latched, only once
+        assert received == list(range(NUM_MESSAGES))
+        assert subscriber.stats.lost == 0
+    finally:
+        subscribed.set()
+        process.join(5.0)
+        node.close()
+
+
+if __name__ == "__main__":
+    test_late_subscriber()
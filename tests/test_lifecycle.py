@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Service
+from pylancom.utils.msg import send_bytes_request
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+BASE_PORT = 7950
+
+
+def upper(msg: str) -> str:
+    return msg.upper()
+
+
+def request(node: LanComNode, service: Service, msg: bytes) -> bytes:
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+    return node.submit_loop_task(
+        send_bytes_request(addr, service.name, msg), True
+    )
+
+
+def test_autostart():
+    node = LanComNode(
+        "LateStart", "127.0.0.1", autostart=False, multicast_port=BASE_PORT
+    )
+    try:
+        assert not node.running
+        service = Service(
+            "lifecycle/upper", StrDecoder, StrEncoder, upper, node=node
+        )
+        node.start()
+        assert node.running
+        # starting twice does nothing
+        node.start()
+        assert request(node, service, b"hi") == b"HI"
+    finally:
+        node.close()
+    assert node.stopped.is_set() and not node.running
+
+
+def test_context_managers():
+    node = LanComNode(
+        "WithNode", "127.0.0.1", autostart=False, multicast_port=BASE_PORT
+    )
+    with node:
+        assert node.running
+        service = Service(
+            "lifecycle/with", StrDecoder, StrEncoder, upper, node=node
+        )
+        assert request(node, service, b"with") == b"WITH"
+    assert node.stopped.is_set()
+
+    async def main() -> None:
+        node = LanComNode(
+            "AsyncWithNode",
+            "127.0.0.1",
+            autostart=False,
+            multicast_port=BASE_PORT,
+        )
+        # entered from another event loop than the one of the node
+        async with node:
+            assert node.running
+            service = Service(
+                "lifecycle/async", StrDecoder, StrEncoder, upper, node=node
+            )
+            addr = f"tcp://127.0.0.1:{service.info['port']}"
+            response = await node.run_on_loop(
+                send_bytes_request(addr, service.name, b"async")
+            )
+            assert response == b"ASYNC"
+        assert node.stopped.is_set()
+
+    asyncio.run(main())
+
+
+def test_close_drains_requests():
+    node = LanComNode("Draining", "127.0.0.1", multicast_port=BASE_PORT)
+    # the client keeps the loop running after the server is closed
+    client = LanComNode("DrainClient", "127.0.0.1", multicast_port=BASE_PORT)
+    started = threading.Event()
+
+    def slow_upper(msg: str) -> str:
+        started.set()
+        time.sleep(float(msg))
+        return msg.upper()
+
+    try:
+        service = Service(
+            "lifecycle/slow", StrDecoder, StrEncoder, slow_upper, node=node
+        )
+        addr = f"tcp://127.0.0.1:{service.info['port']}"
+        future = client.submit_loop_task(
+            send_bytes_request(addr, service.name, b"0.3")
+        )
+        assert started.wait(1.0)
+        start = time.monotonic()
+        node.close(drain_timeout=1.0)
+        # the request being handled was answered before the close
+        assert 0.2 <= time.monotonic() - start < 1.0
+        assert future.result(1.0) == b"0.3"
+    finally:
+        node.close()
+        client.close()
+
+
+def test_close_drain_timeout():
+    node = LanComNode("DrainLimit", "127.0.0.1", multicast_port=BASE_PORT)
+    started = threading.Event()
+
+    def slow_upper(msg: str) -> str:
+        started.set()
+        time.sleep(1.0)
+        return msg.upper()
+
+    service = Service(
+        "lifecycle/slower", StrDecoder, StrEncoder, slow_upper, node=node
+    )
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+    node.submit_loop_task(send_bytes_request(addr, service.name, b"x"))
+    assert started.wait(1.0)
+    start = time.monotonic()
+    node.close(drain_timeout=0.2)
+    # the close does not wait longer than the drain timeout
+    assert time.monotonic() - start < 0.8
+    assert node.stopped.is_set()
+
+
+if __name__ == "__main__":
+    test_autostart()
+    test_context_managers()
+    test_close_drains_requests()
+    test_close_drain_timeout()
@@ -0,0 +1,163 @@
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+from utils import wait_for
+
+from pylancom.errors import RequestTimeoutError
+from pylancom.lancom_type import ServiceInfo
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.load_balancer import BalanceStrategy, ServiceBalancer
+
+BASE_PORT = 7930
+
+
+def service_info(name: str, port: int = 1) -> ServiceInfo:
+    return ServiceInfo(
+        name="balanced",
+        socketID=name,
+        nodeID=f"{name}-node",
+        type="service",
+        ip="127.0.0.1",
+        port=port,
+    )
+
+
+class FixedBalancer(ServiceBalancer):
+    """Balances fabricated replicas instead of the discovered ones."""
+
+    def __init__(
+        self,
+        node: LanComNode,
+        replicas: List[ServiceInfo],
+        strategy: BalanceStrategy = BalanceStrategy.ROUND_ROBIN,
+    ) -> None:
+        self.replicas = replicas
+        super().__init__(node, "balanced", strategy)
+
+    def get_replicas(self) -> List[ServiceInfo]:
+        return self.replicas
+
+
+def names(replicas: List[ServiceInfo]) -> List[str]:
+    return [r["socketID"] for r in replicas]
+
+
+def test_order_replicas():
+    # not started, the balancers do not check the health of the replicas
+    node = LanComNode("Balancer", "127.0.0.1", autostart=False)
+    replicas = [service_info(name) for name in "abc"]
+    try:
+        balancer = FixedBalancer(node, replicas)
+        # round robin over the replicas
+        assert names(balancer.order_replicas()) == ["b", "c", "a"]
+        assert names(balancer.order_replicas()) == ["c", "a", "b"]
+        balancer.get_stats(replicas[2]).healthy = False
+        assert "c" not in names(balancer.order_replicas())
+        # every replica is down, all of them are tried
+        for info in replicas:
+            balancer.get_stats(info).healthy = False
+        assert sorted(names(balancer.order_replicas())) == ["a", "b", "c"]
+        balancer = FixedBalancer(
+            node, replicas, BalanceStrategy.LEAST_OUTSTANDING
+        )
+        balancer.get_stats(replicas[0]).outstanding = 3
+        balancer.get_stats(replicas[1]).outstanding = 1
+        assert names(balancer.order_replicas()) == ["c", "b", "a"]
+    finally:
+        node.close()
+
+
+def test_pick_by_latency():
+    node = LanComNode("Balancer", "127.0.0.1", autostart=False)
+    replicas = [service_info(name) for name in "abc"]
+    try:
+        balancer = FixedBalancer(
+            node, replicas, BalanceStrategy.LATENCY_WEIGHTED
+        )
+        balancer.get_stats(replicas[0]).record_latency(0.001)
+        balancer.get_stats(replicas[1]).record_latency(0.1)
+        random.seed(1)
+        picks = [
+            balancer.pick_by_latency(replicas)["socketID"] for _ in range(1000)
+        ]
+        # weighted by the inverse latency, "c" is unmeasured and weighted
+        # like the fastest one
+        assert picks.count("b") < 50
+        assert abs(picks.count("a") - picks.count("c")) < 150
+        # the rest of the order is by latency
+        order = names(balancer.order_replicas())
+        rest = order[1:]
+        assert rest == sorted(rest, key=lambda n: balancer.stats[n].latency)
+    finally:
+        node.close()
+
+
+def test_failover():
+    node = LanComNode("Balancer", "127.0.0.1", autostart=False)
+    replicas = [service_info("down"), service_info("up")]
+    calls = []
+
+    async def send_to(
+        info: ServiceInfo,
+        request: bytes,
+        timeout: float,
+        deadline_at: Optional[float],
+    ) -> bytes:
+        calls.append(info["socketID"])
+        if info["socketID"] == "down":
+            raise RequestTimeoutError("down")
+        return request
+
+    try:
+        balancer = FixedBalancer(node, replicas)
+        balancer.send_to = send_to
+        # the replica timing out first
+        balancer.counter = -1
+        assert asyncio.run(balancer.request(b"x")) == b"x"
+        assert calls == ["down", "up"]
+        # the last replica timing out fails the round
+        calls.clear()
+        balancer.replicas = replicas[:1]
+        try:
+            asyncio.run(balancer.request(b"x", retries=1))
+            assert False, "the only replica is down"
+        except RequestTimeoutError:
+            pass
+        assert calls == ["down", "down"]
+    finally:
+        node.close()
+
+
+def test_health_check_loop():
+    node = LanComNode("HealthCheck", "127.0.0.1", multicast_port=BASE_PORT)
+    up = service_info("up")
+    up["nodeID"] = node.node_id
+    down = service_info("down")
+    # nothing answers the pings of this node
+    node.nodes_map.nodes_info["down-node"] = {
+        **node.local_info,
+        "nodeID": "down-node",
+        "port": BASE_PORT + 1,
+    }
+    try:
+        balancer = FixedBalancer(node, [up, down])
+        balancer.get_stats(service_info("gone"))
+        start = time.monotonic()
+        assert wait_for(lambda: not balancer.get_stats(down).healthy)
+        assert time.monotonic() - start < 2.0
+        assert balancer.get_stats(up).healthy
+        # the replicas no longer advertised are forgotten
+        assert wait_for(lambda: "gone" not in balancer.stats)
+        assert names(balancer.order_replicas()) == ["up"]
+        balancer.stop()
+    finally:
+        node.close()
+
+
+if __name__ == "__main__":
+    test_order_replicas()
+    test_pick_by_latency()
+    test_failover()
+    test_health_check_loop()
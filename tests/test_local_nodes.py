@@ -0,0 +1,53 @@
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import (
+    Publisher,
+    Service,
+    ServiceProxy,
+    Subscriber,
+)
+from pylancom.utils.serialization import (
+    MsgpackDecoder,
+    MsgpackEncoder,
+    StrDecoder,
+    StrEncoder,
+)
+
+
+def test_local_nodes():
+    node_a = LanComNode("LocalNodeA", "127.0.0.1")
+    node_b = LanComNode("LocalNodeB", "127.0.0.1")
+    try:
+        # the nodes of a process share the loop and the discovered nodes
+        assert node_a.runtime is node_b.runtime
+        assert node_a.nodes_map is node_b.nodes_map
+        objects, copies = [], []
+        publisher = Publisher("local", msg_encoder=MsgpackEncoder, node=node_a)
+        Subscriber("local", MsgpackDecoder, objects.append, node=node_b)
+        Subscriber(
+            "local",
+            MsgpackDecoder,
+            copies.append,
+            local_objects=False,
+            node=node_b,
+        )
+        Service("echo", StrDecoder, StrEncoder, str.upper, node=node_a)
+        msg = {"data": [1, 2, 3]}
+        assert wait_for(lambda: len(publisher.local_inboxes) == 2)
+        publisher.publish(msg)
+        assert wait_for(lambda: objects and copies)
+        assert objects[0] is msg
+        assert copies[0] == msg and copies[0] is not msg
+        response = ServiceProxy.request(
+            "echo", StrEncoder, StrDecoder, "hello", node=node_b
+        )
+        assert response == "HELLO"
+    finally:
+        node_b.stop_node()
+        node_a.stop_node()
+
+
+if __name__ == "__main__":
+    test_local_nodes()
+    print("All tests passed.")
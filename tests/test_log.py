@@ -0,0 +1,56 @@
+import logging
+import time
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.remote_log import LogCollector, RemoteLogHandler
+from pylancom.utils.log import REMOTE_ATTRIBUTE, RateLimitFilter, logger
+
+
+def create_record(lineno: int, level: int = logging.ERROR, **extra):
+    record = logging.LogRecord(
+        "test", level, "test_log.py", lineno, "error %s", (lineno,), None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_rate_limit_filter():
+    rate_limit = RateLimitFilter(burst=3, interval=0.2)
+    passed = [rate_limit.filter(create_record(1)) for _ in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    # other call sites, lower levels and remote records are let through
+    assert rate_limit.filter(create_record(2))
+    assert rate_limit.filter(create_record(1, logging.INFO))
+    assert rate_limit.filter(create_record(1, **{REMOTE_ATTRIBUTE: True}))
+    time.sleep(0.25)
+    record = create_record(1)
+    assert rate_limit.filter(record)
+    assert record.getMessage() == "error 1 (7 similar records suppressed)"
+
+
+def test_remote_log():
+    node_a = LanComNode("RemoteLogNodeA", "127.0.0.1")
+    node_b = LanComNode("RemoteLogNodeB", "127.0.0.1")
+    received = []
+    try:
+        handler = RemoteLogHandler(node=node_a, flush_interval=0.05)
+        collector = LogCollector(received.append, node=node_b)
+        time.sleep(0.1)
+        logger.remote_log("shipped %d", 1)
+        logger.debug("not shipped")
+        start = time.monotonic()
+        while not received and time.monotonic() - start < 3.0:
+            time.sleep(0.05)
+        assert [(r.node, r.message) for r in received] == [
+            ("RemoteLogNodeA", "shipped 1")
+        ]
+        handler.close()
+        collector.close()
+    finally:
+        node_b.close()
+        node_a.close()
+
+
+if __name__ == "__main__":
+    test_rate_limit_filter()
+    test_remote_log()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+from pylancom.utils.mmap_log import INDEX_STRIDE, LogReader, LogWriter
+
+
+def write_log(directory: str, count: int, segment_size: int) -> None:
+    writer = LogWriter(directory, segment_size)
+    for i in range(count):
+        topic = "camera" if i % 2 else "joints"
+        writer.write(float(i), topic, f"message {i}".encode())
+    writer.close()
+
+
+def test_write_and_read_segments():
+    with tempfile.TemporaryDirectory() as directory:
+        write_log(directory, 1000, 4096)
+        assert len([f for f in os.listdir(directory) if f.endswith(".idx")])
+        reader = LogReader(directory)
+        assert len(reader.segments) > 1
+        records = list(reader.read())
+        assert len(records) == 1000
+        assert [r.timestamp for r in records] == [
+            float(i) for i in range(1000)
+        ]
+        assert bytes(records[10].payload) == b"message 10"
+        assert reader.topics() == {"camera": 500, "joints": 500}
+        records.clear()
+        reader.close()
+
+
+def test_seek_and_topic_filter():
+    with tempfile.TemporaryDirectory() as directory:
+        write_log(directory, 4 * INDEX_STRIDE, 1024 * 1024)
+        reader = LogReader(directory)
+        records = list(reader.read(start=100.0, end=110.0, topics={"camera"}))
+        assert [r.timestamp for r in records] == [
+            float(i) for i in range(101, 110, 2)
+        ]
+        records.clear()
+        reader.close()
+
+
+def test_recover_unclosed_segment():
+    with tempfile.TemporaryDirectory() as directory:
+        writer = LogWriter(directory, 1024 * 1024)
+        for i in range(10):
+            writer.write(float(i), "topic", b"payload")
+        # simulate a crash: the index is never written
+        assert writer.segment is not None
+        writer.segment.mmap.flush()
+        reader = LogReader(directory)
+        assert reader.segments[0].index.count == 10
+        assert len(list(reader.read())) == 10
+        reader.close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    test_write_and_read_segments()
+    test_seek_and_topic_filter()
+    test_recover_unclosed_segment()
+    print("All tests passed.")
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Service
+from pylancom.nodes.monitor import NetworkMonitor
+from pylancom.nodes.silent_node import SilentNode
+from pylancom.tools.top import render
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+PORT = 7880
+
+
+def test_monitor():
+    node = LanComNode("MonitoredNode", "127.0.0.1", multicast_port=PORT)
+    silent_node = SilentNode("Monitor", "127.0.0.1", multicast_port=PORT)
+    publisher = Publisher("monitored/topic", node=node)
+    Service("monitored/echo", StrDecoder, StrEncoder, str.upper, node=node)
+    running = True
+
+    def publish() -> None:
+        while running:
+            publisher.publish_bytes(bytes(100))
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=publish)
+    thread.start()
+    monitor = NetworkMonitor(silent_node, sample_time=0.5)
+    try:
+        assert wait_for(lambda: "monitored/topic" in monitor.samples)
+        sample = monitor.samples["monitored/topic"]
+        assert 20 < sample.rate < 110
+        assert sample.mean_size == sample.max_size == 100
+        assert abs(sample.bandwidth - sample.rate * 100) < 1e-6
+        assert wait_for(lambda: node.node_id in monitor.latencies)
+        nodes, topics, services = node.submit_loop_task(
+            monitor.collect(), True
+        )
+        # the silent node is not part of the network
+        assert [n.name for n in nodes] == ["MonitoredNode"]
+        assert [t.name for t in topics] == ["monitored/topic"]
+        assert services[0].name == "monitored/echo"
+        assert services[0].latency is not None
+        assert "monitored/topic" in render(nodes, topics, services)
+    finally:
+        running = False
+        thread.join()
+        monitor.close()
+        silent_node.close()
+        node.close()
+
+
+if __name__ == "__main__":
+    test_monitor()
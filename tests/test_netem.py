@@ -0,0 +1,131 @@
+import multiprocessing as mp
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils import netem
+from pylancom.utils.netem import LinkEmulator, LinkProfile, NetworkEmulator
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7890
+
+
+def test_link_profile():
+    profile = LinkProfile.from_string("delay=0.02, loss=0.05,bandwidth=1e6")
+    assert profile == LinkProfile(delay=0.02, loss=0.05, bandwidth=1e6)
+    assert LinkProfile.from_string("") == LinkProfile()
+
+
+def test_link_emulator():
+    link = LinkEmulator(LinkProfile(delay=0.01, jitter=0.005, loss=0.1), 1)
+    delays = [link.schedule(100) for _ in range(10000)]
+    assert 800 < link.dropped < 1200
+    assert link.dropped + link.delivered == 10000
+    kept = [delay for delay in delays if delay is not None]
+    assert 0.005 <= min(kept) and max(kept) <= 0.015
+    # the messages queue up behind each other on a slow link
+    link = LinkEmulator(LinkProfile(bandwidth=1000))
+    assert [round(link.schedule(100), 2) for _ in range(3)] == [
+        0.1,
+        0.2,
+        0.3,
+    ]
+    # the reordered messages overtake the delayed ones
+    link = LinkEmulator(LinkProfile(delay=1.0, reorder=0.5), 1)
+    delays = [link.schedule(100) for _ in range(1000)]
+    assert 400 < delays.count(0.0) < 600
+
+
+def test_discovery_under_loss():
+    netem.install(
+        NetworkEmulator(LinkProfile(delay=0.05, jitter=0.01, loss=0.2), 1)
+    )
+    # two unicast groups, the heartbeats go through the loopback
+    node_a = LanComNode(
+        "LossyNodeA",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    node_b = LanComNode(
+        "LossyNodeB",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT}"],
+        multicast_port=BASE_PORT + 1,
+    )
+    try:
+        start = time.monotonic()
+        assert wait_for(
+            lambda: node_a.nodes_map.count_nodes() == 2
+            and node_b.nodes_map.count_nodes() == 2
+        )
+        # at least one heartbeat crossed the delayed link
+        assert time.monotonic() - start >= 0.04
+        assert netem.active.default.delivered > 0
+    finally:
+        netem.uninstall()
+        node_a.close()
+        node_b.close()
+
+
+def run_publisher(count: int) -> None:
+    node = LanComNode(
+        "LossyPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 3}"],
+        multicast_port=BASE_PORT + 2,
+    )
+    publisher = Publisher("lossy", reliable=64, node=node)
+    # wait for the subscriber to connect
+    time.sleep(2.0)
+    for i in range(count):
+        publisher.publish_string(str(i))
+        time.sleep(0.005)
+    # the last messages need a later one to be found missing
+    for _ in range(10):
+        publisher.publish_string(str(count))
+        time.sleep(0.05)
+    time.sleep(1.0)
+    node.close()
+
+
+def test_reliable_topic_under_loss():
+    count = 200
+    ctx = mp.get_context("spawn")
+    process = ctx.Process(target=run_publisher, args=(count,))
+    process.start()
+    netem.install(NetworkEmulator(LinkProfile(delay=0.002, loss=0.05), 1))
+    node = LanComNode(
+        "LossySubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 3,
+    )
+    try:
+        received = []
+        subscriber = Subscriber(
+            "lossy", StrDecoder, received.append, node=node
+        )
+        assert wait_for(lambda: str(count) in received, 15.0)
+        values = [int(msg) for msg in received if msg != str(count)]
+        # the dropped messages are recovered in order, the few ones with
+        # a dropped NACK as well are reported lost
+        assert values == sorted(values)
+        assert subscriber.stats.recovered > 0
+        assert len(values) + subscriber.stats.lost >= count - values[0]
+    finally:
+        netem.uninstall()
+        process.join()
+        node.close()
+
+
+if __name__ == "__main__":
+    test_link_profile()
+    test_link_emulator()
+    test_discovery_under_loss()
+    test_reliable_topic_under_loss()
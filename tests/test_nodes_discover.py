@@ -6,6 +6,7 @@ from typing import List
 import pylancom
 import pylancom.nodes
 from pylancom.nodes.silent_node import SilentNode
+from pylancom.utils.msg import HEARTBEAT
 
 
 class TestDiscoverNodes(SilentNode):
@@ -17,7 +18,9 @@ class TestDiscoverNodes(SilentNode):
         return super().initialize_event_loop()
 
     def process_heartbeat(self, data, ip):
-        assert len(data) == 51, f"Data length: {len(data)}, expected 51"
+        assert (
+            len(data) >= HEARTBEAT.size
+        ), f"Data length: {len(data)}, expected {HEARTBEAT.size}"
         return super().process_heartbeat(data, ip)
 
 
@@ -0,0 +1,84 @@
+import msgpack
+from utils import wait_for
+
+from pylancom.errors import RequestTimeoutError
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.parameters import Parameters, ParameterServer
+
+
+def test_parameters():
+    owner = LanComNode("ParameterOwner", "127.0.0.1", multicast_port=7905)
+    node = LanComNode("ParameterReader", "127.0.0.1", multicast_port=7905)
+    server = ParameterServer("robot", {"arm/speed": 1.0}, node=owner)
+    server.set("arm/limits", [0, 90])
+    # a late joiner starts from the snapshot
+    params = Parameters("robot", node=node)
+    changes = []
+    params.watch("arm/**", lambda key, value: changes.append((key, value)))
+    try:
+        assert params.wait_synced(5.0)
+        assert params.version == server.version == 1
+        assert params["arm/limits"] == [0, 90]
+        assert sorted(changes) == [("arm/limits", [0, 90]), ("arm/speed", 1.0)]
+        changes.clear()
+        # the deltas only carry the changes
+        server.update({"arm/speed": 2.0, "arm/limits": [0, 90], "name": "r1"})
+        assert wait_for(lambda: params.version == 2)
+        assert params.get("arm/speed") == 2.0
+        assert params.items("*") == [("name", "r1")]
+        assert changes == [("arm/speed", 2.0)]
+        # the replica writes through the owner and reads back its change
+        assert params.set("arm/speed", 3.0) == 3
+        assert params["arm/speed"] == server["arm/speed"] == 3.0
+        params.delete("name")
+        assert "name" not in params and "name" not in server
+        # the deltas are held back as while syncing, the change is not
+        # applied to the replica in time
+        params.pending = []
+        try:
+            params.set("arm/speed", 4.0, timeout=0.2)
+            assert False, "the replica did not apply the change"
+        except RequestTimeoutError:
+            pass
+        assert server["arm/speed"] == 4.0 and params["arm/speed"] == 3.0
+    finally:
+        params.close()
+        server.close()
+        node.close()
+        owner.close()
+
+
+def test_missed_delta():
+    owner = LanComNode("GapOwner", "127.0.0.1", multicast_port=7906)
+    node = LanComNode("GapReader", "127.0.0.1", multicast_port=7906)
+    server = ParameterServer("gap", {"a": 1}, node=owner)
+    params = Parameters("gap", node=node)
+    try:
+        assert params.wait_synced(5.0)
+        # a change of the owner which never reached the replica
+        with server.lock:
+            server.apply(server.version + 1, {"a": 2}, [])
+        server.set("b", 3)
+        # the gap is found with the next delta and the snapshot refetched
+        assert wait_for(lambda: params.version == server.version)
+        assert params["a"] == 2 and params["b"] == 3
+        # the delta of another owner instance triggers a sync too
+        delta = [b"other epoch", 1, {"c": 4}, []]
+        node.submit_loop_task(receive(params, delta), True)
+        assert params.pending is not None
+        assert wait_for(lambda: params.pending is None)
+        assert params.epoch == server.epoch and "c" not in params
+    finally:
+        params.close()
+        server.close()
+        node.close()
+        owner.close()
+
+
+async def receive(params: Parameters, delta) -> None:
+    params.receive(msgpack.packb(delta))
+
+
+if __name__ == "__main__":
+    test_parameters()
+    test_missed_delta()
@@ -0,0 +1,88 @@
+import os
+import time
+from typing import Set
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.process_service import ProcessService
+from pylancom.nodes.process_worker import SHM_THRESHOLD
+from pylancom.utils.msg import send_bytes_request
+from pylancom.utils.serialization import BytesDecoder, BytesEncoder
+
+BASE_PORT = 7935
+SHM_DIR = "/dev/shm"
+
+
+def reverse(msg: bytes) -> bytes:
+    return msg[::-1]
+
+
+def slow_echo(msg: bytes) -> bytes:
+    time.sleep(float(msg))
+    return msg
+
+
+def shm_segments() -> Set[str]:
+    return {name for name in os.listdir(SHM_DIR) if name.startswith("psm_")}
+
+
+def test_process_service():
+    node = LanComNode("Processes", "127.0.0.1", multicast_port=BASE_PORT)
+    service = ProcessService(
+        "process/reverse",
+        BytesDecoder,
+        BytesEncoder,
+        reverse,
+        num_workers=1,
+        node=node,
+    )
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+    segments = shm_segments()
+    try:
+        # inline below the threshold, through shared memory above it
+        for size in (SHM_THRESHOLD // 2, SHM_THRESHOLD * 2):
+            request = os.urandom(size)
+            response = node.submit_loop_task(
+                send_bytes_request(
+                    addr, "process/reverse", request, timeout=10.0
+                ),
+                True,
+            )
+            assert response == request[::-1]
+        # the request and the response blocks are unlinked by their reader
+        assert shm_segments() == segments
+    finally:
+        service.shutdown()
+        node.close()
+
+
+def test_slow_request_and_close():
+    node = LanComNode("SlowProcesses", "127.0.0.1", multicast_port=BASE_PORT)
+    service = ProcessService(
+        "process/slow",
+        BytesDecoder,
+        BytesEncoder,
+        slow_echo,
+        num_workers=1,
+        node=node,
+    )
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+    try:
+        # longer than the timeout of the other services
+        response = node.submit_loop_task(
+            send_bytes_request(addr, "process/slow", b"2.5", timeout=10.0),
+            True,
+        )
+        assert response == b"2.5"
+        workers = list(service.pool._processes.values())
+        assert workers and all(w.is_alive() for w in workers)
+    finally:
+        node.close()
+    # the workers are stopped with the node
+    assert wait_for(lambda: not any(w.is_alive() for w in workers))
+
+
+if __name__ == "__main__":
+    test_process_service()
+    test_slow_request_and_close()
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import (
+    Publisher,
+    Service,
+    ServiceProxy,
+    Subscriber,
+)
+from pylancom.utils.profiler import (
+    CallbackTimings,
+    LoopLagMonitor,
+    SamplingProfiler,
+)
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+BASE_PORT = 7920
+
+
+def test_callback_timings():
+    timings = CallbackTimings()
+
+    async def handler(msg: str) -> str:
+        return msg
+
+    timed = timings.wrap("service:async", handler)
+    assert asyncio.iscoroutinefunction(timed)
+    assert asyncio.run(timed("x")) == "x"
+    sleep = timings.wrap("subscriber:sleep", time.sleep)
+    sleep(0.01)
+    sleep(0.02)
+    stats = timings.snapshot()
+    assert stats["service:async"][0] == 1
+    count, total, longest = stats["subscriber:sleep"]
+    assert count == 2
+    assert total >= 0.03 and longest >= 0.02
+
+
+def busy_spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_spin, args=(stop,), name="spin")
+    thread.start()
+    try:
+        profile = SamplingProfiler().run(0.2)
+    finally:
+        stop.set()
+        thread.join()
+    assert profile["samples"] > 10
+    stacks = [s for s in profile["stacks"] if s.startswith("spin;")]
+    assert stacks and all("busy_spin" in s for s in stacks)
+
+
+def test_loop_lag():
+    monitor = LoopLagMonitor(threshold=0.05, interval=0.01)
+
+    async def stall() -> None:
+        task = asyncio.ensure_future(monitor.run())
+        await asyncio.sleep(0.05)
+        # a blocking call on the loop thread
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(stall())
+    assert monitor.stalls == 1
+    assert monitor.max_lag >= 0.15
+
+
+def test_profile_request():
+    node = LanComNode("Profiled", "127.0.0.1", multicast_port=BASE_PORT)
+    received = []
+
+    def slow_upper(msg: str) -> str:
+        time.sleep(0.01)
+        return msg.upper()
+
+    try:
+        Service("profile/upper", StrDecoder, StrEncoder, slow_upper, node=node)
+        Subscriber("profile/topic", StrDecoder, received.append, node=node)
+        publisher = Publisher("profile/topic", node=node)
+        assert wait_for(lambda: publisher.publish_string("x") or received)
+        response = ServiceProxy.request(
+            "profile/upper", StrEncoder, StrDecoder, "hi", node=node
+        )
+        assert response == "HI"
+        profile = node.submit_loop_task(
+            node.request_profile("127.0.0.1", node.local_info["port"], 0.2),
+            True,
+        )
+        assert profile["samples"] > 10
+        assert profile["duration"] == 0.2
+        callbacks = profile["callbacks"]
+        assert callbacks["subscriber:profile/topic"][0] >= 1
+        assert callbacks["service:profile/upper"][2] >= 0.01
+        assert "stalls" in profile["loop"]
+    finally:
+        node.close()
+
+
+if __name__ == "__main__":
+    test_callback_timings()
+    test_sampling_profiler()
+    test_loop_lag()
+    test_profile_request()
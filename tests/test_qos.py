@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import zmq
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Service, Subscriber
+from pylancom.utils.msg import send_bytes_request
+from pylancom.utils.qos import QoS
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+
+def test_qos_sockets():
+    node = LanComNode("QoSNode", "127.0.0.1", multicast_port=7899)
+    try:
+        control = Publisher("control", qos=QoS.REALTIME, node=node)
+        camera = Publisher("camera", qos=QoS.BULK, node=node)
+        other = Publisher("other", node=node)
+        # one socket per class, shared by its publishers
+        ports = {control.info["port"], camera.info["port"]}
+        assert len(ports | {other.info["port"]}) == 3
+        assert (
+            Publisher("control2", qos=QoS.REALTIME, node=node).info["port"]
+            == control.info["port"]
+        )
+        assert control.info["qos"] == "realtime"
+        assert "qos" not in other.info
+        assert control.socket.getsockopt(zmq.SNDHWM) == 100
+        assert camera.socket.getsockopt(zmq.SNDHWM) == 10000
+        subscriber = Subscriber(
+            "control", StrDecoder, print, qos=QoS.REALTIME, node=node
+        )
+        assert subscriber.socket.getsockopt(zmq.RCVHWM) == 100
+    finally:
+        node.close()
+
+
+def test_service_priority():
+    node = LanComNode("QoSServer", "127.0.0.1", multicast_port=7899)
+
+    def slow(msg: str) -> str:
+        time.sleep(0.3)
+        return msg
+
+    services = {
+        qos: Service(
+            f"{qos.value}/slow",
+            StrDecoder,
+            StrEncoder,
+            slow,
+            qos=qos,
+            node=node,
+        )
+        for qos in QoS
+    }
+    Service(
+        "realtime/stop",
+        StrDecoder,
+        StrEncoder,
+        str.upper,
+        qos=QoS.REALTIME,
+        node=node,
+    )
+
+    def request(name: str, qos: QoS, msg: bytes = b"x"):
+        info = services[qos].info
+        addr = f"tcp://{info['ip']}:{info['port']}"
+        return send_bytes_request(addr, name, msg, timeout=2.0)
+
+    async def timed(coroutine) -> float:
+        start = time.monotonic()
+        await coroutine
+        return time.monotonic() - start
+
+    async def saturated_bulk() -> float:
+        # more bulk requests than bulk workers
+        bulk = [timed(request("bulk/slow", QoS.BULK)) for _ in range(4)]
+        tasks = [asyncio.ensure_future(c) for c in bulk]
+        await asyncio.sleep(0.05)
+        latency = await timed(request("realtime/stop", QoS.REALTIME))
+        await asyncio.gather(*tasks)
+        return latency
+
+    async def strict_priority() -> float:
+        task = asyncio.ensure_future(request("realtime/slow", QoS.REALTIME))
+        await asyncio.sleep(0.05)
+        # held back until the realtime request is handled
+        latency = await timed(request("normal/slow", QoS.NORMAL))
+        await task
+        return latency
+
+    try:
+        assert node.submit_loop_task(saturated_bulk(), True) < 0.1
+        assert node.submit_loop_task(strict_priority(), True) > 0.45
+    finally:
+        node.close()
+
+
+def test_sockets_before_start():
+    node = LanComNode(
+        "QoSLateStart", "127.0.0.1", autostart=False, multicast_port=7899
+    )
+    # the loops of these sockets only start with the node
+    services = [
+        Service(
+            f"{qos.value}/upper",
+            StrDecoder,
+            StrEncoder,
+            str.upper,
+            qos=qos,
+            node=node,
+        )
+        for qos in (QoS.NORMAL, QoS.REALTIME)
+    ]
+    publisher = Publisher("late/topic", qos=QoS.REALTIME, node=node)
+    sub_socket = zmq.Context.instance().socket(zmq.SUB)
+    try:
+        node.start()
+        for service in services:
+            info = service.info
+            response = node.submit_loop_task(
+                send_bytes_request(
+                    f"tcp://{info['ip']}:{info['port']}",
+                    service.name,
+                    b"hello",
+                    timeout=2.0,
+                ),
+                True,
+            )
+            assert response == b"HELLO"
+        sub_socket.connect(f"tcp://127.0.0.1:{publisher.info['port']}")
+        sub_socket.setsockopt(zmq.SUBSCRIBE, b"late/topic")
+        assert wait_for(lambda: node.has_subscriber(b"late/topic"))
+    finally:
+        sub_socket.close(linger=0)
+        node.close()
+
+
+if __name__ == "__main__":
+    test_qos_sockets()
+    test_service_priority()
+    test_sockets_before_start()
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from utils import wait_for
+
+from pylancom.errors import ReceiveTimeoutError
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+
+
+def test_recv_and_latest():
+    node = LanComNode("PullNode", "127.0.0.1", multicast_port=7895)
+    publisher = Publisher("pull", node=node)
+    subscriber = Subscriber("pull", StrDecoder, buffer_size=3, node=node)
+    try:
+        assert subscriber.latest() is None
+        start = time.monotonic()
+        try:
+            subscriber.recv(timeout=0.1)
+            assert False, "no message was published"
+        except ReceiveTimeoutError:
+            assert time.monotonic() - start >= 0.1
+        assert wait_for(lambda: subscriber.local_publishers)
+        for i in range(5):
+            publisher.publish_string(str(i))
+        assert subscriber.recv(timeout=1.0) == "2"
+        # the oldest messages were dropped from the full buffer
+        assert subscriber.buffer.dropped == 2
+        assert subscriber.recv() == "3"
+        assert subscriber.latest() == "4"
+        assert subscriber.recv() == "4"
+        assert subscriber.latest() == "4"
+    finally:
+        node.close()
+
+
+def test_async_iteration():
+    node = LanComNode("AsyncPullNode", "127.0.0.1", multicast_port=7896)
+    publisher = Publisher("async_pull", node=node)
+    subscriber = Subscriber("async_pull", StrDecoder, node=node)
+
+    async def consume(count: int):
+        received = []
+        async for msg in subscriber:
+            received.append(msg)
+            if len(received) == count:
+                break
+        return received
+
+    try:
+        assert wait_for(lambda: subscriber.local_publishers)
+        # on the loop of the node
+        future = node.submit_loop_task(consume(3))
+        for i in range(3):
+            publisher.publish_string(str(i))
+        assert future.result(timeout=1.0) == ["0", "1", "2"]
+
+        # on an event loop of another thread, until the subscriber stops
+        async def consume_until_shutdown():
+            task = asyncio.create_task(consume(10))
+            publisher.publish_string("last")
+            await asyncio.sleep(0.1)
+            subscriber.shutdown()
+            return await asyncio.wait_for(task, 1.0)
+
+        assert asyncio.run(consume_until_shutdown()) == ["last"]
+    finally:
+        node.close()
+
+
+if __name__ == "__main__":
+    test_recv_and_latest()
+    test_async_iteration()
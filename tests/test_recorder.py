@@ -0,0 +1,72 @@
+import tempfile
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.nodes.recorder import Player, Recorder
+from pylancom.utils.mmap_log import LogWriter
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7955
+
+
+def test_replay_local():
+    node = LanComNode("Replay", "127.0.0.1", multicast_port=BASE_PORT)
+    received = []
+    with tempfile.TemporaryDirectory() as directory:
+        writer = LogWriter(directory)
+        for i in range(10):
+            writer.write(float(i), "replay/topic", str(i).encode())
+        writer.close()
+        player = Player(directory, rate=0, node=node)
+        try:
+            player.advertise()
+            subscriber = Subscriber(
+                "replay/topic", StrDecoder, received.append, node=node
+            )
+            assert wait_for(lambda: subscriber.local_publishers)
+            player.play()
+            # the payloads are views into the log, the subscriber in the
+            # same process gets them copied
+            assert wait_for(lambda: len(received) == 10)
+            assert received == [str(i) for i in range(10)]
+        finally:
+            player.close()
+            node.close()
+
+
+def test_record_and_replay():
+    node = LanComNode("Recording", "127.0.0.1", multicast_port=BASE_PORT)
+    received = []
+    with tempfile.TemporaryDirectory() as directory:
+        publisher = Publisher("record/topic", node=node)
+        recorder = Recorder(directory, ["record/**"], node=node)
+        player = None
+        try:
+            (pattern_subscriber,) = recorder.subscribers
+            assert wait_for(lambda: pattern_subscriber.local_publishers)
+            for i in range(10):
+                publisher.publish_string(f"message {i}")
+            assert wait_for(lambda: recorder.count == 10)
+            recorder.close()
+            publisher.shutdown()
+            player = Player(directory, rate=0, node=node)
+            player.advertise()
+            subscriber = Subscriber(
+                "record/topic", StrDecoder, received.append, node=node
+            )
+            assert wait_for(lambda: subscriber.local_publishers)
+            player.play()
+            # the replayed messages are decoded like the recorded ones
+            assert wait_for(lambda: len(received) == 10)
+            assert received == [f"message {i}" for i in range(10)]
+        finally:
+            if player is not None:
+                player.close()
+            node.close()
+
+
+if __name__ == "__main__":
+    test_replay_local()
+    test_record_and_replay()
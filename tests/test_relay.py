@@ -0,0 +1,130 @@
+import multiprocessing as mp
+import time
+
+from utils import wait_for
+
+from pylancom.lancom_type import PublisherInfo
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.nodes.relay import TopicRelay
+from pylancom.utils.serialization import StrDecoder
+
+# the relay and the subscriber play another network than the publisher
+BASE_PORT = 7915
+NETWORK = "127.0.0.2/32"
+
+
+def publisher_info(**fields) -> PublisherInfo:
+    info = PublisherInfo(
+        name="relay/topic",
+        socketID="origin",
+        nodeID="origin-node",
+        type="publisher",
+        ip="127.0.0.1",
+        port=1,
+    )
+    info.update(fields)
+    return info
+
+
+def test_loop_prevention():
+    node = LanComNode("LoopRelay", "127.0.0.2", multicast_port=BASE_PORT + 3)
+    relay = TopicRelay(["relay/**"], NETWORK, node=node)
+    try:
+        assert relay.forwards(publisher_info())
+        # not back into the network of the publisher
+        assert not relay.forwards(publisher_info(ip="127.0.0.2"))
+        assert not relay.forwards(publisher_info(nodeID=node.node_id))
+        relayed = publisher_info(
+            socketID="copy",
+            ip="127.0.0.3",
+            relayOf="origin",
+            relayFrom="127.0.0.5",
+            relayNetwork="127.0.0.0/30",
+            relayPath=["other-relay"],
+        )
+        assert relay.forwards(relayed)
+        assert not relay.forwards({**relayed, "relayFrom": "127.0.0.2"})
+        assert not relay.forwards({**relayed, "relayPath": [node.node_id]})
+        assert not relay.forwards({**relayed, "relayPath": ["a"] * 4})
+        # a relay into another network is no upstream of this one
+        assert not relay.forwards({**relayed, "relayNetwork": "127.0.1.0/24"})
+    finally:
+        relay.close()
+        node.close()
+
+
+def run_publisher(stop: mp.Event) -> None:
+    node = LanComNode(
+        "RelayedPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.2:{BASE_PORT + 1}", f"127.0.0.2:{BASE_PORT + 2}"],
+        multicast_port=BASE_PORT,
+    )
+    publisher = Publisher("relay/topic", reliable=100, node=node)
+    i = 0
+    while not stop.is_set():
+        publisher.publish_string(str(i))
+        i += 1
+        time.sleep(0.01)
+    node.close()
+
+
+def test_relay():
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(stop,))
+    process.start()
+    # different discovery ports, the nodes do not share their map
+    relay_node = LanComNode(
+        "Relay",
+        "127.0.0.2",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+    node = LanComNode(
+        "RelaySubscriber",
+        "127.0.0.2",
+        multicast=False,
+        peers=[f"127.0.0.2:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT + 2,
+    )
+    relay = TopicRelay(["relay/**"], NETWORK, node=relay_node)
+    received = []
+    try:
+        subscriber = Subscriber(
+            "relay/topic",
+            StrDecoder,
+            lambda msg: received.append(int(msg)),
+            node=node,
+        )
+        assert wait_for(lambda: len(relay.forwarded) == 1, 10.0)
+        (info,) = relay.forwarded.values()
+        assert info["relayNetwork"] == NETWORK
+        assert info["relayFrom"] == "127.0.0.1"
+        assert info["relayPath"] == [relay_node.node_id]
+        assert info["reliable"] == 100
+        # the subscriber switches over to the relay of its network
+        assert wait_for(
+            lambda: [r["port"] for r in subscriber.routes.values()]
+            == [relay.port]
+        )
+        count = len(received)
+        assert wait_for(lambda: len(received) > count + 20)
+        # the sequence numbers go on through the relay
+        tail = received[count:]
+        assert tail == list(range(tail[0], tail[0] + len(tail)))
+        assert subscriber.stats.lost == 0
+        subscriber.shutdown()
+    finally:
+        stop.set()
+        process.join()
+        relay.close()
+        node.close()
+        relay_node.close()
+
+
+if __name__ == "__main__":
+    test_loop_prevention()
+    test_relay()
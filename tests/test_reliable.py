@@ -0,0 +1,94 @@
+import multiprocessing as mp
+from typing import Tuple
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7850
+
+
+def run_publisher(commands: mp.Queue, results: mp.Queue) -> None:
+    node = LanComNode(
+        "ReliablePublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    publisher = Publisher("reliable", reliable=4, node=node)
+
+    async def drop(count: int) -> None:
+        # sequenced messages which never reach the subscribers
+        for _ in range(count):
+            publisher.seq += 1
+            publisher.ring.append((publisher.seq, str(publisher.seq).encode()))
+
+    while True:
+        command, count = commands.get()
+        if command == "stop":
+            break
+        if command == "drop":
+            node.submit_loop_task(drop(count), True)
+        else:
+            publisher.publish_string(str(publisher.seq + 1))
+        results.put((publisher.seq, publisher.stats.retransmitted))
+    node.close()
+
+
+def test_reliable_topic():
+    # the publisher runs in another process to go through the sockets
+    ctx = mp.get_context("spawn")
+    commands, results = ctx.Queue(), ctx.Queue()
+    process = ctx.Process(target=run_publisher, args=(commands, results))
+    process.start()
+    node = LanComNode(
+        "ReliableSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+
+    def send(command: str, count: int = 0) -> Tuple[int, int]:
+        commands.put((command, count))
+        return results.get(timeout=5.0)
+
+    try:
+        received = []
+        subscriber = Subscriber(
+            "reliable", StrDecoder, received.append, node=node
+        )
+
+        def publish() -> bool:
+            send("publish")
+            return bool(received)
+
+        assert wait_for(publish, 10.0)
+        seq, _ = send("publish")
+        assert wait_for(lambda: received[-1] == str(seq))
+        # the missed messages are NACKed from the retransmit ring
+        send("drop", 3)
+        send("publish")
+        assert wait_for(lambda: received[-1] == str(seq + 4))
+        assert received[-5:] == [str(i) for i in range(seq, seq + 5)]
+        assert subscriber.stats.recovered == 3
+        assert subscriber.stats.lost == 0
+        _, retransmitted = send("drop", 0)
+        assert retransmitted == 3
+        # the ring only keeps the last 4 messages, with the live one
+        send("drop", 6)
+        send("publish")
+        assert wait_for(lambda: received[-1] == str(seq + 11))
+        assert received[-4:] == [str(i) for i in range(seq + 8, seq + 12)]
+        assert received[-5] == str(seq + 4)
+        assert subscriber.stats.lost == 3
+    finally:
+        commands.put(("stop", 0))
+        process.join(5.0)
+        node.close()
+
+
+if __name__ == "__main__":
+    test_reliable_topic()
@@ -0,0 +1,229 @@
+import asyncio
+import time
+from typing import List
+
+import zmq
+from utils import wait_for
+
+from pylancom.errors import (
+    DeadlineExceededError,
+    RequestTimeoutError,
+    ServiceError,
+)
+from pylancom.lancom_type import LanComMsg, ServiceInfo
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Service
+from pylancom.nodes.load_balancer import ServiceBalancer
+from pylancom.utils.msg import (
+    get_socket_port,
+    send_bytes_request,
+    split_envelope,
+    unpack_deadline,
+)
+from pylancom.utils.qos import QoS
+from pylancom.utils.serialization import StrDecoder, StrEncoder
+
+BASE_PORT = 7925
+
+
+class FakeReplica:
+    """A bare ROUTER socket recording the requests, answering or not."""
+
+    def __init__(self, node: LanComNode, name: str, reply: bool) -> None:
+        self.reply = reply
+        self.requests: List[List[bytes]] = []
+        self.socket = node.create_socket(zmq.ROUTER)
+        self.socket.bind("tcp://127.0.0.1:0")
+        self.info = ServiceInfo(
+            name="fake",
+            socketID=name,
+            nodeID=name,
+            type="service",
+            ip="127.0.0.1",
+            port=get_socket_port(self.socket),
+        )
+        node.submit_loop_task(self.serve())
+
+    async def serve(self) -> None:
+        while True:
+            envelope, body = split_envelope(await self.socket.recv_multipart())
+            self.requests.append(body)
+            if self.reply:
+                await self.socket.send_multipart(
+                    envelope + [b"SUCCESS", body[1]]
+                )
+
+
+def create_balancer(
+    node: LanComNode, replicas: List[FakeReplica]
+) -> ServiceBalancer:
+    balancer = ServiceBalancer(node, "fake")
+    # the replicas are not discovered, they are handed over as they are
+    balancer.get_replicas = lambda: [r.info for r in replicas]
+    # the first replica is tried first
+    balancer.counter = -1
+    return balancer
+
+
+def test_typed_errors():
+    node = LanComNode("Errors", "127.0.0.1", multicast_port=BASE_PORT)
+
+    def fail(msg: str) -> str:
+        raise ValueError("failed on purpose")
+
+    service = Service("fail", StrDecoder, StrEncoder, fail, node=node)
+    silent = FakeReplica(node, "silent", reply=False)
+    try:
+        addr = f"tcp://127.0.0.1:{service.info['port']}"
+        try:
+            node.submit_loop_task(send_bytes_request(addr, "fail", b""), True)
+            assert False, "the service failed"
+        except ServiceError as e:
+            assert "failed on purpose" in str(e)
+        # an exception, no b"TIMEOUT" response any more
+        try:
+            node.submit_loop_task(
+                send_bytes_request(
+                    f"tcp://127.0.0.1:{silent.info['port']}",
+                    "fake",
+                    b"",
+                    timeout=0.1,
+                ),
+                True,
+            )
+            assert False, "nobody answers"
+        except RequestTimeoutError as e:
+            assert type(e) is RequestTimeoutError
+        assert len(silent.requests) == 1
+    finally:
+        node.close()
+
+
+def test_malformed_request():
+    node = LanComNode("Malformed", "127.0.0.1", multicast_port=BASE_PORT)
+    service = Service("echo", StrDecoder, StrEncoder, str, node=node)
+    req_socket = zmq.Context.instance().socket(zmq.REQ)
+    req_socket.setsockopt(zmq.RCVTIMEO, 1000)
+    try:
+        req_socket.connect(f"tcp://127.0.0.1:{service.info['port']}")
+        # the payload frame is missing, answered right away
+        req_socket.send_multipart([b"echo"])
+        status, _ = req_socket.recv_multipart()
+        assert status == LanComMsg.ERROR.value.encode()
+    finally:
+        req_socket.close(linger=0)
+        node.close()
+
+
+def test_expired_requests_are_dropped():
+    node = LanComNode("Expired", "127.0.0.1", multicast_port=BASE_PORT)
+    handled = []
+
+    def slow(msg: str) -> str:
+        handled.append(msg)
+        time.sleep(0.3)
+        return msg
+
+    # two workers in the bulk class, the third request waits for them
+    service = Service(
+        "slow", StrDecoder, StrEncoder, slow, qos=QoS.BULK, node=node
+    )
+    addr = f"tcp://127.0.0.1:{service.info['port']}"
+
+    async def requests() -> List[object]:
+        return await asyncio.gather(
+            send_bytes_request(addr, "slow", b"a"),
+            send_bytes_request(addr, "slow", b"b"),
+            send_bytes_request(addr, "slow", b"late", deadline=0.1),
+            send_bytes_request(addr, "slow", b"gone", deadline=0.0),
+            return_exceptions=True,
+        )
+
+    try:
+        results = node.submit_loop_task(requests(), True)
+        assert results[:2] == [b"a", b"b"]
+        assert all(type(r) is DeadlineExceededError for r in results[2:])
+        time.sleep(0.4)
+        # the expired requests never reached the handler
+        assert sorted(handled) == ["a", "b"]
+    finally:
+        node.close()
+
+
+def test_retries():
+    node = LanComNode("Retries", "127.0.0.1", multicast_port=BASE_PORT)
+    silent = FakeReplica(node, "silent", reply=False)
+    balancer = create_balancer(node, [silent])
+    try:
+        start = time.monotonic()
+        try:
+            node.submit_loop_task(
+                balancer.request(b"x", timeout=0.1, retries=2), True
+            )
+            assert False, "nobody answers"
+        except RequestTimeoutError as e:
+            assert type(e) is RequestTimeoutError
+        # the first attempt and two retries after a backoff
+        assert len(silent.requests) == 3
+        assert time.monotonic() - start >= 0.3
+        # the retries stop at the deadline
+        silent.requests.clear()
+        try:
+            node.submit_loop_task(
+                balancer.request(b"x", timeout=0.1, retries=10, deadline=0.25),
+                True,
+            )
+            assert False, "nobody answers"
+        except DeadlineExceededError:
+            pass
+        assert 1 < len(silent.requests) <= 3
+    finally:
+        node.close()
+
+
+def test_deadline_propagation():
+    node = LanComNode("Deadline", "127.0.0.1", multicast_port=BASE_PORT)
+    replica = FakeReplica(node, "echo", reply=True)
+    balancer = create_balancer(node, [replica])
+    try:
+        response = node.submit_loop_task(
+            balancer.request(b"x", deadline=0.5), True
+        )
+        assert response == b"x"
+        (request,) = replica.requests
+        # the remaining budget is sent along with the request
+        assert 0.0 < unpack_deadline(request[2]) <= 0.5
+        node.submit_loop_task(balancer.request(b"x"), True)
+        assert len(replica.requests[1]) == 2
+    finally:
+        node.close()
+
+
+def test_hedged_request():
+    node = LanComNode("Hedged", "127.0.0.1", multicast_port=BASE_PORT)
+    slow = FakeReplica(node, "slow", reply=False)
+    fast = FakeReplica(node, "fast", reply=True)
+    balancer = create_balancer(node, [slow, fast])
+    try:
+        start = time.monotonic()
+        response = node.submit_loop_task(
+            balancer.request(b"x", timeout=1.0, hedge=True), True
+        )
+        latency = time.monotonic() - start
+        assert response == b"x"
+        # hedged after half the timeout, without latency samples
+        assert 0.5 <= latency < 0.9
+        assert balancer.hedges == 1
+        assert wait_for(lambda: len(slow.requests) == 1)
+        assert len(fast.requests) == 1
+    finally:
+        node.close()
+
+
+if __name__ == "__main__":
+    test_typed_errors()
+    test_malformed_request()
+    test_expired_requests_are_dropped()
+    test_retries()
+    test_deadline_propagation()
+    test_hedged_request()
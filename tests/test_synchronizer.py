@@ -0,0 +1,78 @@
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher
+from pylancom.nodes.synchronizer import TimeSynchronizer
+from pylancom.utils.serialization import MsgpackDecoder, MsgpackEncoder
+
+
+def get_stamp(msg: dict) -> float:
+    return msg["stamp"]
+
+
+def test_approximate_matching():
+    node = LanComNode("SyncNode", "127.0.0.1")
+    try:
+        matched = []
+        sync = TimeSynchronizer(
+            ["sync/rgb", "sync/depth"],
+            MsgpackDecoder,
+            lambda rgb, depth: matched.append((rgb["id"], depth["id"])),
+            get_stamp,
+            slop=0.02,
+            queue_size=5,
+            node=node,
+        )
+        # the messages are fed directly, nothing is published
+        for i, stamp in enumerate([0.0, 0.1, 0.2, 0.3]):
+            sync.receive(0, {"id": f"rgb{i}", "stamp": stamp})
+        # waits for a depth message which may fit better
+        sync.receive(1, {"id": "depth0", "stamp": 0.09})
+        assert matched == []
+        sync.receive(1, {"id": "depth1", "stamp": 0.21})
+        assert matched == [("rgb1", "depth0"), ("rgb2", "depth1")]
+        # rgb0 was too old, depth1 left rgb3 waiting
+        assert sync.dropped == [1, 0]
+        sync.receive(1, {"id": "depth2", "stamp": 0.5})
+        assert sync.dropped == [2, 0]
+        # the queues are bounded
+        for i in range(10):
+            sync.receive(0, {"id": f"late{i}", "stamp": 1.0 + i})
+        assert len(sync.queues[0]) == 5
+        assert sync.matched == 2
+        sync.shutdown()
+    finally:
+        node.close()
+
+
+def test_exact_matching():
+    node = LanComNode("ExactSyncNode", "127.0.0.1")
+    try:
+        matched = []
+        TimeSynchronizer(
+            ["exact/a", "exact/b", "exact/c"],
+            MsgpackDecoder,
+            lambda *msgs: matched.append([m["stamp"] for m in msgs]),
+            get_stamp,
+            node=node,
+        )
+        publishers = [
+            Publisher(topic, msg_encoder=MsgpackEncoder, node=node)
+            for topic in ["exact/a", "exact/b", "exact/c"]
+        ]
+        assert wait_for(lambda: all(p.local_inboxes for p in publishers))
+        for stamp in range(5):
+            for i, publisher in enumerate(publishers):
+                # b misses the stamp 2
+                if i != 1 or stamp != 2:
+                    publisher.publish({"stamp": float(stamp)})
+        assert wait_for(lambda: len(matched) == 4)
+        assert [stamps[0] for stamps in matched] == [0.0, 1.0, 3.0, 4.0]
+        assert all(len(set(stamps)) == 1 for stamps in matched)
+    finally:
+        node.close()
+
+
+if __name__ == "__main__":
+    test_approximate_matching()
+    test_exact_matching()
@@ -0,0 +1,166 @@
+import multiprocessing as mp
+import time
+
+import zmq
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+from pylancom.utils.throttle import Throttle
+
+BASE_PORT = 7870
+NUM_MESSAGES = 100
+
+
+def publish(publisher: Publisher) -> None:
+    # 100 messages at 200 Hz
+    for i in range(NUM_MESSAGES):
+        publisher.publish_string(str(i))
+        time.sleep(0.005)
+
+
+def subscribe(node: LanComNode, topic: str) -> dict:
+    received = {
+        "all": [],
+        "rate": [],
+        "nth": [],
+        "latest": [],
+    }
+    throttles = {
+        "all": None,
+        "rate": Throttle.max_rate(10.0),
+        "nth": Throttle.every_nth(10),
+        "latest": Throttle.latest(10.0),
+    }
+    for key, throttle in throttles.items():
+        Subscriber(
+            topic,
+            StrDecoder,
+            received[key].append,
+            throttle=throttle,
+            node=node,
+        )
+    return received
+
+
+def check(received: dict) -> None:
+    assert received["all"] == [str(i) for i in range(NUM_MESSAGES)]
+    # about 0.5 s of messages
+    assert 3 <= len(received["rate"]) <= 8
+    assert received["rate"][0] == "0"
+    assert received["nth"] == [str(i) for i in range(9, NUM_MESSAGES, 10)]
+    assert 3 <= len(received["latest"]) <= 8
+    assert received["latest"][-1] == str(NUM_MESSAGES - 1)
+
+
+def test_local_throttle():
+    node = LanComNode("ThrottleNode", "127.0.0.1")
+    try:
+        received = subscribe(node, "throttle/local")
+        publisher = Publisher("throttle/local", node=node)
+        assert wait_for(
+            lambda: len(publisher.local_inboxes) == 1
+            and len(publisher.schedules) == 3
+        )
+        publish(publisher)
+        assert wait_for(lambda: received["latest"][-1:] == ["99"])
+        check(received)
+    finally:
+        node.close()
+
+
+def run_publisher(ready: mp.Event, done: mp.Event) -> None:
+    node = LanComNode(
+        "ThrottlePublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    publisher = Publisher("throttle/remote", node=node)
+    ready.wait(10.0)
+    wait_for(lambda: len(publisher.schedules) == 3)
+    # the subscriptions come with the connections
+    time.sleep(0.5)
+    publish(publisher)
+    done.wait(5.0)
+    node.close()
+
+
+def test_remote_throttle():
+    ctx = mp.get_context("spawn")
+    ready, done = ctx.Event(), ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(ready, done))
+    process.start()
+    node = LanComNode(
+        "ThrottleSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+    try:
+        received = subscribe(node, "throttle/remote")
+        ready.set()
+        assert wait_for(lambda: received["latest"][-1:] == ["99"], 10.0)
+        time.sleep(0.1)
+        check(received)
+    finally:
+        done.set()
+        process.join(5.0)
+        node.close()
+
+
+def test_throttle_value():
+    for create in (Throttle.max_rate, Throttle.latest, Throttle.every_nth):
+        try:
+            create(0)
+            assert False, "a throttle needs a positive value"
+        except ValueError:
+            pass
+    assert Throttle.from_string("rate:2.5") == Throttle.max_rate(2.5)
+
+
+def test_drop_throttles():
+    node = LanComNode(
+        "ThrottleDrop", "127.0.0.1", multicast_port=BASE_PORT + 2
+    )
+    sub_socket = zmq.Context.instance().socket(zmq.SUB)
+    try:
+        publisher = Publisher("throttle/drop", node=node)
+        subscriber = Subscriber(
+            "throttle/drop",
+            StrDecoder,
+            print,
+            throttle=Throttle.latest(10.0),
+            node=node,
+        )
+        assert wait_for(lambda: len(publisher.schedules) == 1)
+        # a remote subscriber of another throttle class
+        throttle = Throttle.max_rate(5.0)
+        sub_socket.connect(f"tcp://127.0.0.1:{publisher.info['port']}")
+        topic_bytes = throttle.topic("throttle/drop").encode()
+        sub_socket.setsockopt(zmq.SUBSCRIBE, topic_bytes)
+        assert wait_for(lambda: node.has_subscriber(topic_bytes))
+        node.submit_loop_task(add_throttle(publisher, throttle), True)
+        assert len(publisher.schedules) == 2
+        # the last local subscriber of a class is gone
+        subscriber.shutdown()
+        assert wait_for(lambda: list(publisher.schedules) == [throttle])
+        # and the last remote one
+        sub_socket.close(linger=0)
+        assert wait_for(lambda: not publisher.schedules)
+    finally:
+        sub_socket.close(linger=0)
+        node.close()
+
+
+async def add_throttle(publisher: Publisher, throttle: Throttle) -> None:
+    publisher.add_throttle(throttle)
+
+
+if __name__ == "__main__":
+    test_local_throttle()
+    test_remote_throttle()
+    test_throttle_value()
+    test_drop_throttles()
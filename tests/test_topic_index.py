@@ -0,0 +1,58 @@
+from pylancom.lancom_type import SocketInfo
+from pylancom.utils.topic_index import TopicPattern, TopicTrie
+
+
+def create_info(name: str, socket_id: str) -> SocketInfo:
+    return SocketInfo(
+        name=name,
+        socketID=socket_id,
+        nodeID="node",
+        type="publisher",
+        ip="127.0.0.1",
+        port=0,
+    )
+
+
+def test_topic_pattern():
+    assert TopicPattern("robot1/*").matches("robot1/camera")
+    assert not TopicPattern("robot1/*").matches("robot1/camera/depth")
+    assert TopicPattern("robot1/**").matches("robot1/camera/depth")
+    assert TopicPattern("robot1/**/depth").matches("robot1/depth")
+    assert TopicPattern("robot?/cam*").matches("robot2/camera")
+    assert not TopicPattern("robot?/cam*").matches("robot10/camera")
+    assert TopicPattern("map").matches("map")
+    for pattern, prefix in [
+        ("robot1/cam*", "robot1/cam"),
+        ("robot1/**", "robot1"),
+        ("robot1/**/depth", "robot1"),
+        ("**", ""),
+    ]:
+        assert TopicPattern(pattern).prefix == prefix
+
+
+def test_topic_trie():
+    trie = TopicTrie()
+    names = ["robot1/camera", "robot1/camera/depth", "robot2/camera", "map"]
+    for i, name in enumerate(names):
+        trie.insert(create_info(name, str(i)))
+    assert [i["name"] for i in trie.get("robot1/camera")] == [names[0]]
+    assert trie.get("robot1") == []
+
+    def match(pattern: str):
+        return sorted(i["name"] for i in trie.match(TopicPattern(pattern)))
+
+    assert match("*/camera") == ["robot1/camera", "robot2/camera"]
+    assert match("robot1/**") == ["robot1/camera", "robot1/camera/depth"]
+    assert match("**") == sorted(names)
+    trie.remove(create_info("robot1/camera/depth", "1"))
+    assert match("robot1/**") == ["robot1/camera"]
+    # the emptied branch has been pruned
+    assert (
+        "depth" not in trie.root.children["robot1"].children["camera"].children
+    )
+
+
+if __name__ == "__main__":
+    test_topic_pattern()
+    test_topic_trie()
+    print("All tests passed.")
@@ -0,0 +1,55 @@
+import multiprocessing as mp
+import time
+
+from utils import wait_for
+
+from pylancom.nodes.lancom_node import LanComNode
+from pylancom.nodes.lancom_socket import Publisher, Subscriber
+from pylancom.utils.serialization import StrDecoder
+
+BASE_PORT = 7940
+
+
+def run_publisher(stop: mp.Event) -> None:
+    node = LanComNode(
+        "CameraPublisher",
+        "127.0.0.1",
+        multicast=False,
+        peers=[f"127.0.0.1:{BASE_PORT + 1}"],
+        multicast_port=BASE_PORT,
+    )
+    camera = Publisher("camera", node=node)
+    cam = Publisher("cam", node=node)
+    while not stop.is_set():
+        camera.publish_string("camera")
+        cam.publish_string("cam")
+        time.sleep(0.01)
+    node.close()
+
+
+def test_prefix_topic():
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    process = ctx.Process(target=run_publisher, args=(stop,))
+    process.start()
+    # another process, the messages go through the zmq prefix filter
+    node = LanComNode(
+        "CamSubscriber",
+        "127.0.0.1",
+        multicast=False,
+        multicast_port=BASE_PORT + 1,
+    )
+    received = []
+    try:
+        Subscriber("cam", StrDecoder, received.append, node=node)
+        assert wait_for(lambda: len(received) > 20, 10.0)
+        # "cam" is a prefix of "camera", only the exact topic is delivered
+        assert set(received) == {"cam"}
+    finally:
+        stop.set()
+        process.join(5.0)
+        node.close()
+
+
+if __name__ == "__main__":
+    test_prefix_topic()
@@ -1,7 +1,19 @@
 import importlib.metadata
+import os
+import subprocess
+import sys
+import uuid
 
 import pylancom
-from pylancom.utils.msg import create_hash_identifier, create_heartbeat_message
+from pylancom.utils.msg import (
+    LATCHED_FLAG,
+    create_hash_identifier,
+    create_heartbeat_message,
+    pack_message_header,
+    parse_heartbeat,
+    unpack_message_header,
+)
+from pylancom.utils.name_filter import NameFilter, service_key, topic_key
 
 
 def test_package_version():
@@ -12,6 +24,29 @@ def test_package_version():
     ), f"Version mismatch: {package_version} != {install_version}"
 
 
+LIGHT_IMPORT = """
+import sys
+import pylancom
+import pylancom.utils.serialization
+assert "zmq" not in sys.modules, "zmq was imported"
+assert pylancom.LanComNode.__name__ == "LanComNode"
+assert pylancom.logger.name
+assert "zmq" in sys.modules
+"""
+
+
+def test_lazy_imports():
+    # a fresh interpreter, the tests of this one already imported zmq
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", LIGHT_IMPORT],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
 def test_create_hash_identifier():
     identifier = create_hash_identifier()
     assert isinstance(identifier, str)
@@ -22,12 +57,55 @@ def test_create_heartbeat_message():
     node_id = create_hash_identifier()
     heartbeat_message = create_heartbeat_message(node_id, 0, 0)
     assert isinstance(heartbeat_message, bytes)
-    assert len(heartbeat_message) == 51  # 6 + 3 + 36 + 12 = 51
+    # 4 + 1 + 3 + 1 + 16 + 2 + 4 + 32 = 63
+    assert len(heartbeat_message) == 63
     print(f"Heartbeat message: {heartbeat_message}")
 
 
+def test_parse_heartbeat():
+    node_id = create_hash_identifier()
+    names = NameFilter()
+    names.add(topic_key("odom"))
+    message = create_heartbeat_message(
+        node_id, 7000, 3, names.to_bytes(), b"info"
+    )
+    heartbeat = parse_heartbeat(message)
+    assert heartbeat is not None
+    assert heartbeat.node_id == node_id
+    assert (heartbeat.port, heartbeat.info_id) == (7000, 3)
+    assert heartbeat.node_info == b"info"
+    assert topic_key("odom") in NameFilter(heartbeat.names)
+    # too large to be carried inline
+    message = create_heartbeat_message(node_id, 7000, 3, node_info=bytes(4096))
+    assert parse_heartbeat(message).node_info is None
+    assert parse_heartbeat(b"LANCOM" + bytes(45)) is None
+
+
+def test_name_filter():
+    names = NameFilter()
+    topics = [f"robot{i}/odom" for i in range(20)]
+    for topic in topics:
+        names.add(topic_key(topic))
+    assert all(topic_key(topic) in names for topic in topics)
+    # the same name as a service is another key
+    assert service_key("robot0/odom") not in names
+    others = [topic_key(f"other{i}") for i in range(1000)]
+    assert sum(key in names for key in others) < 50
+
+
+def test_message_header():
+    socket_id = uuid.uuid4().bytes
+    header = pack_message_header(LATCHED_FLAG, socket_id, 42)
+    assert len(header) == 25  # 1 + 16 + 8 = 25
+    assert unpack_message_header(header) == (LATCHED_FLAG, socket_id, 42)
+
+
 if __name__ == "__main__":
     test_package_version()
+    test_lazy_imports()
     test_create_hash_identifier()
     test_create_heartbeat_message()
+    test_parse_heartbeat()
+    test_name_filter()
+    test_message_header()
     print("All tests passed.")
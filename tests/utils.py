@@ -1,5 +1,16 @@
 import random
+import time
 
 
 def random_name(prefix: str) -> str:
     return f"{prefix}{str(random.randint(1000, 9999))}"
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    """Polls `condition` until it is true, False after `timeout` seconds."""
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout:
+            return False
+        time.sleep(0.05)
+    return True